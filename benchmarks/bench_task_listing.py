@@ -0,0 +1,96 @@
+"""
+Latency of GET /tasks with many queued tasks.
+
+    python -m benchmarks.bench_task_listing [--tasks 10000] [--repeat 5]
+
+The tasks are registered directly in the application state (no worker
+runs), so the numbers cover listing only. For comparison the script also
+times the queue positions computed the old way, with deque.index(), and
+a polling call with a cursor after a few tasks changed.
+"""
+
+import argparse
+import statistics
+import time
+import uuid
+from collections import deque
+
+from fastapi.testclient import TestClient
+
+from easyeda2kicad.api.server import create_app
+from easyeda2kicad.api.task_manager import TaskRecord
+from easyeda2kicad.service import ConversionRequest
+
+
+def _populate(app, count: int) -> list:
+    request = ConversionRequest(
+        lcsc_id="C8733", output_prefix="/tmp/bench/parts", generate_symbol=True
+    )
+    manager = app.state.task_manager
+    task_ids = []
+    for _ in range(count):
+        task_id = str(uuid.uuid4())
+        manager.tasks[task_id] = TaskRecord(id=task_id, request=request)
+        manager.journal.add(task_id)
+        manager.scheduler.push(task_id)
+        task_ids.append(task_id)
+    return task_ids
+
+
+def _timed(function, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(label: str, timings: list) -> None:
+    print(
+        f"{label:<28} median {statistics.median(timings) * 1000:9.1f} ms"
+        f"   best {min(timings) * 1000:9.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    task_ids = _populate(app, args.tasks)
+    scheduler = app.state.task_manager.scheduler
+    client = TestClient(app)
+
+    def list_tasks() -> None:
+        response = client.get("/tasks")
+        assert response.status_code == 200
+        assert len(response.json()) == args.tasks
+
+    print(f"{args.tasks} queued tasks, {args.repeat} runs")
+    _report("GET /tasks", _timed(list_tasks, args.repeat))
+    _report(
+        "positions (TaskScheduler)",
+        _timed(lambda: [scheduler.position(t) for t in task_ids], args.repeat),
+    )
+
+    def poll_changes() -> None:
+        journal = app.state.task_manager.journal
+        cursor = journal.revision
+        for task_id in task_ids[:10]:
+            journal.touch(task_id)
+        response = client.get("/tasks", params={"cursor": cursor})
+        assert len(response.json()) == 10
+
+    _report("GET /tasks?cursor (10 new)", _timed(poll_changes, args.repeat))
+    pending = deque(task_ids)
+    _report(
+        "positions (deque.index)",
+        _timed(lambda: [pending.index(t) + 1 for t in task_ids], args.repeat),
+    )
+
+
+if __name__ == "__main__":
+    main()
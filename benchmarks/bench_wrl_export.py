@@ -0,0 +1,155 @@
+"""
+Time of the OBJ to WRL conversion of a large mesh.
+
+    python -m benchmarks.bench_wrl_export [--rows 300] [--cols 300] [--repeat 3]
+
+The mesh is a set of cylindrical grids, one per material, where every
+vertex is shared by up to 6 triangles like in real part models. Parsing
+and writing are timed separately, with NumPy (when installed) and in
+pure Python. For comparison the script also times the previous exporter,
+which remapped vertices through dicts and built the WRL as one string.
+"""
+
+import argparse
+import io
+import math
+import re
+import statistics
+import time
+from unittest import mock
+
+from easyeda2kicad.easyeda import obj_model, obj_vertices
+from easyeda2kicad.easyeda.obj_model import ObjModel
+from easyeda2kicad.kicad.export_kicad_3d_model import write_wrl_model
+
+
+def _make_obj(rows: int, cols: int, materials: int) -> str:
+    lines = []
+    for material in range(materials):
+        lines += [
+            f"newmtl mtl{material}",
+            "Ka 0.2 0.2 0.2",
+            f"Kd 0.{material + 1} 0.5 0.5",
+            "Ks 0.1 0.1 0.1",
+            "d 1",
+            "endmtl",
+        ]
+    for material in range(materials):
+        radius = 10 + material
+        for row in range(rows):
+            for col in range(cols):
+                angle = 2 * math.pi * col / cols
+                lines.append(
+                    f"v {math.cos(angle) * radius:.6f} {math.sin(angle) * radius:.6f}"
+                    f" {row * 0.05:.6f}"
+                )
+    for material in range(materials):
+        lines.append(f"usemtl mtl{material}")
+        base = material * rows * cols + 1
+        for row in range(rows - 1):
+            for col in range(cols - 1):
+                v = base + row * cols + col
+                lines.append(f"f {v}// {v + 1}// {v + cols}//")
+                lines.append(f"f {v + 1}// {v + cols + 1}// {v + cols}//")
+    return "\n".join(lines) + "\n"
+
+
+def _previous_exporter(obj_data: str) -> str:
+    """The WRL exporter before vertex remapping used index buffers."""
+    materials = {}
+    for block in re.findall("newmtl .*?endmtl", obj_data, re.DOTALL):
+        material = {}
+        for value in block.splitlines():
+            if value.startswith("newmtl"):
+                material_id = value.split(" ")[1]
+            elif value.startswith("Kd"):
+                material["diffuse_color"] = value.split(" ")[1:]
+            elif value.startswith("Ks"):
+                material["specular_color"] = value.split(" ")[1:]
+        materials[material_id] = material
+    vertices = [
+        " ".join(str(round(float(coord) / 2.54, 4)) for coord in vertex.split(" "))
+        for vertex in re.findall("v (.*?)\n", obj_data, re.DOTALL)
+    ]
+    shapes = []
+    for shape in obj_data.split("usemtl")[1:]:
+        lines = shape.splitlines()
+        material = materials[lines[0].replace(" ", "")]
+        index_counter = 0
+        link = {}
+        coord_index = []
+        points = []
+        for line in lines[1:]:
+            if line:
+                face = [int(index) for index in line.replace("//", "").split(" ")[1:]]
+                face_index = []
+                for index in face:
+                    if index not in link:
+                        link[index] = index_counter
+                        face_index.append(str(index_counter))
+                        points.append(vertices[index - 1])
+                        index_counter += 1
+                    else:
+                        face_index.append(str(link[index]))
+                face_index.append("-1")
+                coord_index.append(",".join(face_index) + ",")
+        points.insert(-1, points[-1])
+        shapes.append(
+            f"Shape{{ {' '.join(material['diffuse_color'])}"
+            f" {', '.join(points)} {''.join(coord_index)} }}"
+        )
+    return "\n".join(shapes)
+
+
+def _timed(function, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(label: str, timings: list) -> None:
+    print(
+        f"{label:<28} median {statistics.median(timings) * 1000:9.1f} ms"
+        f"   best {min(timings) * 1000:9.1f} ms"
+    )
+
+
+def _run(label: str, obj_data: str, repeat: int) -> None:
+    parsed = ObjModel.parse(obj_data)
+    _report(f"parse ({label})", _timed(lambda: ObjModel.parse(obj_data), repeat))
+    _report(f"write ({label})", _timed(lambda: _write_parsed(parsed), repeat))
+
+
+def _write_parsed(parsed: ObjModel) -> None:
+    # Rounded coordinates are cached by the vertices: time them every run
+    parsed.vertices._rounded = None
+    write_wrl_model(parsed, io.StringIO())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=300)
+    parser.add_argument("--cols", type=int, default=300)
+    parser.add_argument("--materials", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    obj_data = _make_obj(args.rows, args.cols, args.materials)
+    print(
+        f"{len(obj_data) / 1e6:.1f} MB OBJ, {args.materials} shapes of"
+        f" {args.rows}x{args.cols} vertices, {args.repeat} runs"
+    )
+    if obj_vertices.np is not None:
+        _run("NumPy", obj_data, args.repeat)
+    with mock.patch.object(obj_vertices, "np", None), mock.patch.object(
+        obj_model, "np", None
+    ):
+        _run("pure Python", obj_data, args.repeat)
+    _report("previous exporter", _timed(lambda: _previous_exporter(obj_data), 1))
+
+
+if __name__ == "__main__":
+    main()
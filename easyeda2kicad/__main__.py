@@ -4,17 +4,21 @@ import logging
 import os
 import re
 import sys
+import uuid
+from functools import partial
 from textwrap import dedent
-from typing import List
+from typing import List, Optional
 
 from easyeda2kicad import __version__
 from easyeda2kicad.easyeda.easyeda_api import EasyedaApi
 from easyeda2kicad.easyeda.easyeda_importer import (
+    MODEL_PLACEMENTS,
     Easyeda3dModelImporter,
     EasyedaFootprintImporter,
     EasyedaSymbolImporter,
 )
-from easyeda2kicad.easyeda.parameters_easyeda import EeSymbol
+from easyeda2kicad.easyeda.model_store import LINK_MODES
+from easyeda2kicad.easyeda.parameters_easyeda import Ee3dModel, EeSymbol
 from easyeda2kicad.helpers import (
     add_component_in_symbol_lib_file,
     add_sub_components_in_symbol_lib_file,
@@ -23,10 +27,26 @@ from easyeda2kicad.helpers import (
     set_logger,
     update_component_in_symbol_lib_file,
 )
-from easyeda2kicad.kicad.export_kicad_3d_model import Exporter3dModelKicad
-from easyeda2kicad.kicad.export_kicad_footprint import ExporterFootprintKicad
+from easyeda2kicad.easyeda.obj_vertices import OBJ_PRECISION
+from easyeda2kicad.kicad.export_kicad_3d_model import (
+    WRL_PRECISIONS,
+    Exporter3dModelKicad,
+    WrlOptions,
+)
+from easyeda2kicad.kicad.export_kicad_footprint import (
+    ExporterFootprintKicad,
+    sanitize_model_filename,
+)
 from easyeda2kicad.kicad.export_kicad_symbol import ExporterSymbolKicad
 from easyeda2kicad.kicad.parameters_kicad_symbol import KicadVersion, sanitize_fields
+from easyeda2kicad.service.batch import (
+    BatchItemResult,
+    BatchReport,
+    read_bom,
+    run_batch,
+)
+from easyeda2kicad.service.conversion import ConversionRequest
+from easyeda2kicad.service.locks import library_lock
 
 
 def symbol_is_empty(symbol: EeSymbol) -> bool:
@@ -53,7 +73,35 @@ def get_parser() -> argparse.ArgumentParser:
         )
     )
 
-    parser.add_argument("--lcsc_id", help="LCSC id", required=True, type=str)
+    parser.add_argument(
+        "--lcsc_id",
+        help="LCSC id (several ids convert all of them in one run)",
+        required=False,
+        nargs="+",
+        type=str,
+    )
+
+    parser.add_argument(
+        "--bom",
+        help="CSV or JSON bill of materials listing the LCSC ids to convert",
+        required=False,
+        type=str,
+    )
+
+    parser.add_argument(
+        "--workers",
+        help="Number of parts converted in parallel in batch mode (default: 4)",
+        required=False,
+        type=int,
+        default=4,
+    )
+
+    parser.add_argument(
+        "--processes",
+        help="Use worker processes instead of threads in batch mode",
+        required=False,
+        action="store_true",
+    )
 
     parser.add_argument(
         "--symbol", help="Get symbol of this id", required=False, action="store_true"
@@ -112,6 +160,66 @@ def get_parser() -> argparse.ArgumentParser:
         action="store_true",
     )
 
+    parser.add_argument(
+        "--model-placement",
+        required=False,
+        choices=MODEL_PLACEMENTS,
+        help=(
+            "Place the footprint 3D model from the measured model mesh or from"
+            " the footprint metadata alone, which skips the model download"
+            " (default: geometry with --3d, else metadata)"
+        ),
+    )
+
+    parser.add_argument(
+        "--compress-model",
+        required=False,
+        help="Write the 3D model as gzipped VRML (.wrz), which KiCad reads too",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--model-precision",
+        required=False,
+        type=int,
+        choices=WRL_PRECISIONS,
+        default=OBJ_PRECISION,
+        metavar="DECIMALS",
+        help=f"Decimals of the 3D model coordinates (default: {OBJ_PRECISION})",
+    )
+
+    parser.add_argument(
+        "--merge-model-points",
+        required=False,
+        help="List the 3D model points that round to the same coordinates once",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        required=False,
+        help="Always download component data instead of using the local cache",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--offline",
+        required=False,
+        help="Only use component data already present in the local cache",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--link-models",
+        required=False,
+        choices=LINK_MODES,
+        default=None,
+        help=(
+            "How 3D models already in the local model store are placed in the"
+            " .3dshapes folder (default: copy)"
+        ),
+    )
+
     parser.add_argument(
         "--debug",
         help="set the logging level to debug",
@@ -125,13 +233,45 @@ def get_parser() -> argparse.ArgumentParser:
 
 def valid_arguments(arguments: dict) -> bool:
 
-    if not arguments["lcsc_id"].startswith("C"):
+    lcsc_ids = [
+        lcsc_id.strip()
+        for value in arguments["lcsc_id"] or []
+        for lcsc_id in value.split(",")
+        if lcsc_id.strip()
+    ]
+    if arguments["bom"]:
+        try:
+            bom_ids = read_bom(arguments["bom"])
+        except (OSError, ValueError) as err:
+            logging.error(f"Can't read the BOM file {arguments['bom']}: {err}")
+            return False
+        if not bom_ids:
+            logging.error(f"No LCSC id found in {arguments['bom']}")
+            return False
+        lcsc_ids += [lcsc_id for lcsc_id in bom_ids if lcsc_id not in lcsc_ids]
+
+    if not lcsc_ids:
+        logging.error("Missing component: use --lcsc_id=C2040 or --bom=my_bom.csv")
+        return False
+
+    if not all(lcsc_id.startswith("C") for lcsc_id in lcsc_ids):
         logging.error("lcsc_id should start by C....")
         return False
+    arguments["lcsc_ids"] = lcsc_ids
+    arguments["lcsc_id"] = lcsc_ids[0]
+    arguments["batch"] = len(lcsc_ids) > 1 or bool(arguments["bom"])
+
+    if arguments["workers"] < 1:
+        logging.error("--workers should be at least 1")
+        return False
 
     if arguments["full"]:
         arguments["symbol"], arguments["footprint"], arguments["3d"] = True, True, True
 
+    if arguments["model_placement"] is None:
+        # Measuring the mesh is only worth its download when the model is exported
+        arguments["model_placement"] = "geometry" if arguments["3d"] else "metadata"
+
     if not any([arguments["symbol"], arguments["footprint"], arguments["3d"]]):
         logging.error(
             "Missing action arguments\n"
@@ -236,6 +376,173 @@ def fp_already_in_footprint_lib(lib_path: str, package_name: str) -> bool:
     return False
 
 
+def get_model_3d_path(arguments: dict) -> str:
+    """Path of the .3dshapes folder as referenced from the footprints."""
+    model_3d_path = f"{arguments['output']}.3dshapes".replace("\\", "/").replace(
+        "./", "/"
+    )
+    if arguments.get("use_default_folder"):
+        model_3d_path = "${EASYEDA2KICAD}/easyeda2kicad.3dshapes"
+    if arguments["project_relative"]:
+        model_3d_path = "${KIPRJMOD}" + model_3d_path
+    return model_3d_path
+
+
+def run_batch_mode(arguments: dict, api: EasyedaApi) -> int:
+    model_path = None
+    if arguments.get("use_default_folder") or arguments["project_relative"]:
+        model_path = get_model_3d_path(arguments)
+
+    conversion_requests = [
+        ConversionRequest(
+            lcsc_id=lcsc_id,
+            output_prefix=arguments["output"],
+            overwrite=arguments["overwrite"],
+            generate_symbol=arguments["symbol"],
+            generate_footprint=arguments["footprint"],
+            generate_model=arguments["3d"],
+            kicad_version=arguments["kicad_version"],
+            model_path=model_path,
+            model_placement=arguments["model_placement"],
+            compress_model=arguments["compress_model"],
+            model_precision=arguments["model_precision"],
+            merge_model_points=arguments["merge_model_points"],
+        )
+        for lcsc_id in arguments["lcsc_ids"]
+    ]
+    if arguments["processes"]:
+        # Worker processes build their own client from the environment
+        if arguments["no_cache"]:
+            os.environ["EASYEDA2KICAD_CACHE"] = "0"
+        if arguments["offline"]:
+            os.environ["EASYEDA2KICAD_OFFLINE"] = "1"
+        if arguments["link_models"]:
+            os.environ["EASYEDA2KICAD_MODEL_LINK"] = arguments["link_models"]
+    logging.info(
+        f"Converting {len(conversion_requests)} parts with {arguments['workers']}"
+        f" {'process' if arguments['processes'] else 'thread'} worker(s)"
+    )
+
+    def log_item(item: BatchItemResult) -> None:
+        if item.ok:
+            logging.info(f"{item.lcsc_id}: done in {item.seconds:.2f}s")
+        else:
+            logging.error(f"{item.lcsc_id}: failed after {item.seconds:.2f}s")
+
+    report = run_batch(
+        conversion_requests,
+        workers=arguments["workers"],
+        use_processes=arguments["processes"],
+        api=api,
+        on_item=log_item,
+    )
+
+    logging.info(format_batch_summary(report))
+    return 0 if not report.failed else 1
+
+
+def format_batch_summary(report: BatchReport) -> str:
+    summary = ["Batch summary:"]
+    for item in report.items:
+        result = item.result
+        if item.ok and result is not None:
+            outputs = [
+                name
+                for name, path in (
+                    ("symbol", result.symbol_path),
+                    ("footprint", result.footprint_path),
+                )
+                if path
+            ] + [f"3D ({kind})" for kind in result.model_paths]
+            if result.model_stats:
+                outputs.append(f"{result.model_stats['saved_bytes']} bytes saved")
+            details = ", ".join(outputs + result.messages) or "nothing exported"
+            summary.append(f"  {item.lcsc_id:<12} OK      {item.seconds:6.2f}s  {details}")
+        else:
+            summary.append(
+                f"  {item.lcsc_id:<12} FAILED  {item.seconds:6.2f}s  {item.error}"
+            )
+    part_seconds = sum(item.seconds for item in report.items)
+    summary.append(
+        f"{len(report.succeeded)}/{len(report.items)} parts converted in"
+        f" {report.seconds:.2f}s ({part_seconds:.2f}s of conversion time,"
+        f" {part_seconds / report.seconds if report.seconds else 0:.1f}x parallel)"
+    )
+    return "\n".join(summary)
+
+
+def create_api(arguments: dict) -> Optional[EasyedaApi]:
+    """EasyEDA client set up from the cache options; None if they conflict."""
+    api = EasyedaApi(use_cache=not arguments["no_cache"])
+    if arguments["offline"]:
+        if api.cache is None:
+            logging.error("--offline requires the local cache to be enabled")
+            return None
+        api.cache.offline = True
+    if arguments["link_models"] and api.model_store is not None:
+        api.model_store.link_mode = arguments["link_models"]
+    return api
+
+
+def log_cache_stats(api: EasyedaApi) -> None:
+    if api.cache is not None:
+        stats = api.cache.stats
+        logging.debug(
+            f"Cache: {stats.hits} hit(s), {stats.misses} miss(es),"
+            f" ~{stats.saved_seconds:.2f}s of network time saved"
+        )
+
+
+def temporary_step_path(output: str, model_3d: Ee3dModel) -> str:
+    # The STEP file is streamed under a temporary name, then moved into
+    # place by place_streamed_step
+    return f"{output}.3dshapes/.easyeda2kicad-{uuid.uuid4().hex}.step"
+
+
+def place_streamed_step(model_3d: Optional[Ee3dModel], output: str) -> None:
+    streamed_step = model_3d.step_path if model_3d else None
+    if model_3d is not None and streamed_step:
+        model_3d.step_path = (
+            f"{output}.3dshapes/{sanitize_model_filename(model_3d.name)}.step"
+        )
+        os.replace(streamed_step, model_3d.step_path)
+
+
+def log_3d_model(
+    component_id: str, exporter: Exporter3dModelKicad, output: str
+) -> None:
+    model_base_name = os.path.splitext(exporter.input.name or "")[0] if exporter.input else ""
+    if not model_base_name:
+        model_base_name = "easyeda_model"
+    model_base_name = model_base_name.replace("\\", "_").replace("/", "_")
+    extension = exporter.options.extension
+    filename_wrl = f"{model_base_name}.{extension}"
+    filename_step = f"{model_base_name}.step"
+    lib_path = f"{output}.3dshapes"
+
+    logging.info(
+        f"Created 3D model for ID: {component_id}\n"
+        f"       3D model name: {model_base_name}\n"
+        + (
+            f"       3D model path ({extension}):"
+            f" {os.path.join(lib_path, filename_wrl)}\n"
+            if filename_wrl
+            else ""
+        )
+        + (
+            f"       3D model size: {exporter.stats.describe()}\n"
+            if exporter.stats
+            else ""
+        )
+        + (
+            "       3D model path (step):"
+            f" {os.path.join(lib_path, filename_step)}\n"
+            if filename_step
+            else ""
+        )
+    )
+
+
 def main(argv: List[str] = sys.argv[1:]) -> int:
     print(f"-- easyeda2kicad.py v{__version__} --")
 
@@ -262,8 +569,15 @@ def main(argv: List[str] = sys.argv[1:]) -> int:
     sym_lib_ext = "kicad_sym" if kicad_version == KicadVersion.v6 else "lib"
 
     # Get CAD data of the component using easyeda API
-    api = EasyedaApi()
+    api = create_api(arguments)
+    if api is None:
+        return 1
+
+    if arguments["batch"]:
+        return run_batch_mode(arguments=arguments, api=api)
+
     cad_data = api.get_cad_data_of_component(lcsc_id=component_id)
+    log_cache_stats(api)
 
     # API returned no data
     if not cad_data:
@@ -291,73 +605,89 @@ def main(argv: List[str] = sys.argv[1:]) -> int:
                 easyeda_sub_symbols.append(sub_importer.get_symbol())
 
         sanitized_component_name = sanitize_fields(easyeda_symbol.info.name)
-        is_id_already_in_symbol_lib = id_already_in_symbol_lib(
-            lib_path=f"{arguments['output']}.{sym_lib_ext}",
-            component_name=sanitized_component_name,
-            kicad_version=kicad_version,
-        )
-
-        if not arguments["overwrite"] and is_id_already_in_symbol_lib:
-            logging.error("Use --overwrite to update the older symbol lib")
-            return 1
-
-        exporter = ExporterSymbolKicad(
-            symbol=easyeda_symbol, kicad_version=kicad_version
-        )
-        # print(exporter.output)
-        kicad_symbol_lib = exporter.export(
-            footprint_lib_name=arguments["output"].split("/")[-1].split(".")[0],
-        )
-
-        kicad_sub_symbols_lib: List[str] = []
-        for sub_symbol in easyeda_sub_symbols:
-            sub_exporter = ExporterSymbolKicad(
-                symbol=sub_symbol, kicad_version=kicad_version
-            )
-            exported_content = sub_exporter.export(
-                footprint_lib_name=arguments["output"].split("/")[-1].split(".")[0]
-            )
-            if exported_content and exported_content != kicad_symbol_lib:
-                kicad_sub_symbols_lib.append(exported_content)
-
-        if is_id_already_in_symbol_lib:
-            update_component_in_symbol_lib_file(
-                lib_path=f"{arguments['output']}.{sym_lib_ext}",
+        symbol_lib_path = f"{arguments['output']}.{sym_lib_ext}"
+        # Other runs may update the same library: keep the whole update atomic
+        with library_lock(symbol_lib_path):
+            is_id_already_in_symbol_lib = id_already_in_symbol_lib(
+                lib_path=symbol_lib_path,
                 component_name=sanitized_component_name,
-                component_content=kicad_symbol_lib,
                 kicad_version=kicad_version,
             )
-        else:
-            add_component_in_symbol_lib_file(
-                lib_path=f"{arguments['output']}.{sym_lib_ext}",
-                component_content=kicad_symbol_lib,
-                kicad_version=kicad_version,
-            )
-        if kicad_sub_symbols_lib and kicad_version == KicadVersion.v6:
-            add_sub_components_in_symbol_lib_file(
-                lib_path=f"{arguments['output']}.{sym_lib_ext}",
-                component_name=sanitized_component_name,
-                sub_components_content=kicad_sub_symbols_lib,
-                kicad_version=kicad_version,
+
+            if not arguments["overwrite"] and is_id_already_in_symbol_lib:
+                logging.error("Use --overwrite to update the older symbol lib")
+                return 1
+
+            exporter = ExporterSymbolKicad(
+                symbol=easyeda_symbol, kicad_version=kicad_version
             )
-        elif kicad_sub_symbols_lib:
-            logging.warning(
-                "Multi-unit symbols are only supported for KiCad v6 libraries; "
-                "skipping additional units."
+            # print(exporter.output)
+            kicad_symbol_lib = exporter.export(
+                footprint_lib_name=arguments["output"].split("/")[-1].split(".")[0],
             )
 
+            kicad_sub_symbols_lib: List[str] = []
+            for sub_symbol in easyeda_sub_symbols:
+                sub_exporter = ExporterSymbolKicad(
+                    symbol=sub_symbol, kicad_version=kicad_version
+                )
+                exported_content = sub_exporter.export(
+                    footprint_lib_name=arguments["output"].split("/")[-1].split(".")[0]
+                )
+                if exported_content and exported_content != kicad_symbol_lib:
+                    kicad_sub_symbols_lib.append(exported_content)
+
+            if is_id_already_in_symbol_lib:
+                update_component_in_symbol_lib_file(
+                    lib_path=symbol_lib_path,
+                    component_name=sanitized_component_name,
+                    component_content=kicad_symbol_lib,
+                    kicad_version=kicad_version,
+                )
+            else:
+                add_component_in_symbol_lib_file(
+                    lib_path=symbol_lib_path,
+                    component_content=kicad_symbol_lib,
+                    kicad_version=kicad_version,
+                )
+            if kicad_sub_symbols_lib and kicad_version == KicadVersion.v6:
+                add_sub_components_in_symbol_lib_file(
+                    lib_path=symbol_lib_path,
+                    component_name=sanitized_component_name,
+                    sub_components_content=kicad_sub_symbols_lib,
+                    kicad_version=kicad_version,
+                )
+            elif kicad_sub_symbols_lib:
+                logging.warning(
+                    "Multi-unit symbols are only supported for KiCad v6 libraries; "
+                    "skipping additional units."
+                )
+
         logging.info(
             f"Created Kicad symbol for ID : {component_id}\n"
             f"       Symbol name : {easyeda_symbol.info.name}\n"
             f"       Library path : {arguments['output']}.{sym_lib_ext}"
         )
 
+    wrl_options = WrlOptions(
+        compress=arguments["compress_model"],
+        precision=arguments["model_precision"],
+        merge_points=arguments["merge_model_points"],
+    )
+
     # ---------------- FOOTPRINT ----------------
     easyeda_footprint = None
 
+    step_destination = partial(temporary_step_path, arguments["output"])
+
     if arguments["footprint"]:
-        importer = EasyedaFootprintImporter(easyeda_cp_cad_data=cad_data)
-        easyeda_footprint = importer.get_footprint()
+        footprint_importer = EasyedaFootprintImporter(
+            easyeda_cp_cad_data=cad_data,
+            api=api,
+            step_destination=step_destination if arguments["3d"] else None,
+            model_placement=arguments["model_placement"],
+        )
+        easyeda_footprint = footprint_importer.get_footprint()
 
         is_id_already_in_footprint_lib = fp_already_in_footprint_lib(
             lib_path=f"{arguments['output']}.pretty",
@@ -366,22 +696,17 @@ def main(argv: List[str] = sys.argv[1:]) -> int:
         if not arguments["overwrite"] and is_id_already_in_footprint_lib:
             logging.error("Use --overwrite to replace the older footprint lib")
             return 1
+        if arguments["3d"] and easyeda_footprint.model_3d:
+            # Download the 3D model while the footprint is written
+            easyeda_footprint.model_3d.payload.prefetch()
 
         ki_footprint = ExporterFootprintKicad(footprint=easyeda_footprint)
         footprint_filename = f"{easyeda_footprint.info.name}.kicad_mod"
         footprint_path = f"{arguments['output']}.pretty"
-        model_3d_path = f"{arguments['output']}.3dshapes".replace("\\", "/").replace(
-            "./", "/"
-        )
-
-        if arguments.get("use_default_folder"):
-            model_3d_path = "${EASYEDA2KICAD}/easyeda2kicad.3dshapes"
-        if arguments["project_relative"]:
-            model_3d_path = "${KIPRJMOD}" + model_3d_path
-
         ki_footprint.export(
             footprint_full_path=f"{footprint_path}/{footprint_filename}",
-            model_3d_path=model_3d_path,
+            model_3d_path=get_model_3d_path(arguments),
+            model_3d_extension=wrl_options.extension,
         )
 
         logging.info(
@@ -397,36 +722,20 @@ def main(argv: List[str] = sys.argv[1:]) -> int:
             model_3d_data = easyeda_footprint.model_3d
         if model_3d_data is None:
             model_3d_data = Easyeda3dModelImporter(
-                easyeda_cp_cad_data=cad_data, download_raw_3d_model=True
+                easyeda_cp_cad_data=cad_data,
+                download_raw_3d_model=True,
+                api=api,
+                step_destination=step_destination,
             ).output
 
-        exporter = Exporter3dModelKicad(model_3d=model_3d_data)
-        exporter.export(lib_path=arguments["output"])
-        if exporter.output or exporter.output_step:
-            model_base_name = os.path.splitext(exporter.input.name or "")[0] if exporter.input else ""
-            if not model_base_name:
-                model_base_name = "easyeda_model"
-            model_base_name = model_base_name.replace("\\", "_").replace("/", "_")
-            filename_wrl = f"{model_base_name}.wrl"
-            filename_step = f"{model_base_name}.step"
-            lib_path = f"{arguments['output']}.3dshapes"
-
-            logging.info(
-                f"Created 3D model for ID: {component_id}\n"
-                f"       3D model name: {model_base_name}\n"
-                + (
-                    "       3D model path (wrl):"
-                    f" {os.path.join(lib_path, filename_wrl)}\n"
-                    if filename_wrl
-                    else ""
-                )
-                + (
-                    "       3D model path (step):"
-                    f" {os.path.join(lib_path, filename_step)}\n"
-                    if filename_step
-                    else ""
-                )
-            )
+        place_streamed_step(model_3d_data, arguments["output"])
+
+        model_exporter = Exporter3dModelKicad(
+            model_3d=model_3d_data, model_store=api.model_store, options=wrl_options
+        )
+        model_exporter.export(lib_path=arguments["output"])
+        if model_exporter.output or model_exporter.has_step:
+            log_3d_model(component_id, model_exporter, arguments["output"])
 
         # logging.info(f"3D model: {os.path.join(lib_path, filename)}")
 
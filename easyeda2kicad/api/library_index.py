@@ -0,0 +1,378 @@
+"""In-memory LCSC index of KiCad libraries for the API's lookup endpoints."""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from easyeda2kicad.api.watcher import LibraryWatcher, create_library_watcher
+from easyeda2kicad.kicad.parameters_kicad_symbol import KicadVersion
+from easyeda2kicad.kicad.symbol_library import iter_library_symbols
+
+DEFAULT_MAX_LIBRARIES = 32
+
+_MODEL_PATTERN = re.compile(r'\(model\s+(?:"([^"]+)"|([^\s\)]+))')
+
+Signature = Optional[Tuple[int, int]]
+
+
+def _signature(path: Path) -> Signature:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def extract_model_refs(footprint_path: Path) -> List[str]:
+    """Return the paths of the (model ...) entries of a .kicad_mod file."""
+    try:
+        content = footprint_path.read_text(encoding="utf-8", errors="ignore")
+    except OSError:
+        return []
+    refs = []
+    for match in _MODEL_PATTERN.finditer(content):
+        raw_path = (match.group(1) or match.group(2) or "").strip()
+        if raw_path:
+            refs.append(raw_path)
+    return refs
+
+
+def resolve_model_paths(model_refs: List[str], model_dir: Path) -> Dict[str, str]:
+    model_paths: Dict[str, str] = {}
+    for raw_path in model_refs:
+        resolved = resolve_model_candidate(raw_path, model_dir)
+        if resolved:
+            model_paths[resolved.name] = str(resolved)
+    return model_paths
+
+
+def extract_model_paths(footprint_path: Path, model_dir: Path) -> Dict[str, str]:
+    return resolve_model_paths(extract_model_refs(footprint_path), model_dir)
+
+
+def resolve_model_candidate(raw_path: str, model_dir: Path) -> Optional[Path]:
+    cleaned = raw_path.strip().replace("\\", "/")
+    if cleaned.startswith("${KIPRJMOD}"):
+        cleaned = cleaned[len("${KIPRJMOD}") :]
+    cleaned = cleaned.lstrip("/")
+
+    candidate = Path(cleaned)
+    if candidate.is_absolute():
+        if candidate.is_file():
+            return candidate
+        return None
+
+    for base in (model_dir, model_dir.parent):
+        resolved = (base / cleaned).resolve(strict=False)
+        if resolved.is_file():
+            return resolved
+
+    basename = Path(raw_path).name
+    if basename:
+        fallback = model_dir / basename
+        if fallback.is_file():
+            return fallback
+
+    return None
+
+
+@dataclass
+class IndexedComponent:
+    """Where the parts of one LCSC component live in a library."""
+
+    lcsc_id: str
+    symbol_name: str
+    footprint_ref: Optional[str] = None
+    footprint_path: Optional[str] = None
+    model_paths: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class _FootprintEntry:
+    signature: Signature
+    path: Optional[str]
+    model_refs: List[str]
+    model_paths: Dict[str, str]
+
+
+class LibraryIndex:
+    """
+    LCSC ID -> symbol, footprint and 3D model paths for one library.
+
+    The symbol file is parsed once and footprints are read the first time
+    one of their components is looked up. `refresh` compares the
+    mtime/size of the .kicad_sym/.lib file and of the .pretty and
+    .3dshapes directories with the indexed state and only redoes the work
+    for what changed.
+
+    A `watched` index is kept current by a LibraryWatcher instead (see
+    LibraryIndexCache.watch_library): lookups then trust the index and do
+    not touch the filesystem at all.
+    """
+
+    def __init__(self, symbol_path: Path, library_root: Path) -> None:
+        self.symbol_path = symbol_path
+        self.library_root = library_root
+        self.footprint_dir = library_root.with_suffix(".pretty")
+        self.model_dir = library_root.with_suffix(".3dshapes")
+        self._lock = threading.RLock()
+        self._symbol_signature: Signature = None
+        self._directory_signatures: Tuple[Signature, Signature] = (None, None)
+        self._symbols: Dict[str, Tuple[str, Optional[str]]] = {}
+        self._footprints: Dict[str, _FootprintEntry] = {}
+        self.loaded = False
+        self.watched = False
+
+    @property
+    def kicad_version(self) -> KicadVersion:
+        if self.symbol_path.suffix.lower() == ".kicad_sym":
+            return KicadVersion.v6
+        return KicadVersion.v5
+
+    def refresh(self) -> None:
+        """Bring the index up to date with the files on disk."""
+        with self._lock:
+            symbol_signature = _signature(self.symbol_path)
+            if not self.loaded or symbol_signature != self._symbol_signature:
+                self.reindex_symbols(symbol_signature)
+            directory_signatures = (
+                _signature(self.footprint_dir),
+                _signature(self.model_dir),
+            )
+            if directory_signatures != self._directory_signatures:
+                self._directory_signatures = directory_signatures
+                self._footprints.clear()
+
+    def reindex_symbols(self, signature: Signature = None) -> None:
+        """Parse the symbol file again; raises OSError when unreadable."""
+        with self._lock:
+            content = self.symbol_path.read_text(encoding="utf-8", errors="ignore")
+            symbols: Dict[str, Tuple[str, Optional[str]]] = {}
+            for block in iter_library_symbols(content, self.kicad_version):
+                lcsc_id = block.get_property("LCSC Part")
+                if not lcsc_id or not lcsc_id.strip():
+                    continue
+                footprint_ref = block.get_property("Footprint")
+                # The first symbol of a duplicated LCSC ID wins, like a lookup
+                symbols.setdefault(
+                    lcsc_id.strip().upper(),
+                    (block.name, footprint_ref.strip() if footprint_ref else None),
+                )
+            self._symbols = symbols
+            self._symbol_signature = signature or _signature(self.symbol_path)
+            self.loaded = True
+
+    def _load_footprint(self, footprint_name: str, signature: Signature) -> _FootprintEntry:
+        footprint_path = self.footprint_dir / f"{footprint_name}.kicad_mod"
+        if signature is None:
+            entry = _FootprintEntry(signature=None, path=None, model_refs=[], model_paths={})
+        else:
+            model_refs = extract_model_refs(footprint_path)
+            entry = _FootprintEntry(
+                signature=signature,
+                path=str(footprint_path),
+                model_refs=model_refs,
+                model_paths=resolve_model_paths(model_refs, self.model_dir),
+            )
+        self._footprints[footprint_name] = entry
+        return entry
+
+    def _footprint(self, footprint_name: str) -> _FootprintEntry:
+        entry = self._footprints.get(footprint_name)
+        if entry is not None and self.watched:
+            return entry
+        signature = _signature(self.footprint_dir / f"{footprint_name}.kicad_mod")
+        if entry is None or entry.signature != signature:
+            entry = self._load_footprint(footprint_name, signature)
+        return entry
+
+    def known_footprints(self) -> Set[str]:
+        with self._lock:
+            return set(self._footprints)
+
+    def forget_footprints(self) -> None:
+        with self._lock:
+            self._footprints.clear()
+
+    def footprint_names(self) -> Set[str]:
+        with self._lock:
+            return {
+                footprint_ref.split(":")[-1].strip()
+                for _, footprint_ref in self._symbols.values()
+                if footprint_ref and footprint_ref.split(":")[-1].strip()
+            }
+
+    def warm(self) -> None:
+        """Resolve the footprint and models of every indexed component."""
+        for footprint_name in self.footprint_names():
+            self.update_footprint(footprint_name)
+
+    def update_footprint(self, footprint_name: str) -> None:
+        """Re-read one footprint after it was created, changed or removed."""
+        footprint_path = self.footprint_dir / f"{footprint_name}.kicad_mod"
+        signature = _signature(footprint_path)
+        with self._lock:
+            self._load_footprint(footprint_name, signature)
+
+    def update_models(self, model_name: Optional[str] = None) -> None:
+        """
+        Resolve model paths again for the footprints referencing
+        `model_name`, or for all footprints when it is None.
+        """
+        with self._lock:
+            for entry in self._footprints.values():
+                if model_name is None or any(
+                    Path(raw_path.replace("\\", "/")).name == model_name
+                    for raw_path in entry.model_refs
+                ):
+                    entry.model_paths = resolve_model_paths(entry.model_refs, self.model_dir)
+
+    def lookup(self, lcsc_id: str) -> Optional[IndexedComponent]:
+        with self._lock:
+            symbol = self._symbols.get(lcsc_id.strip().upper())
+            if symbol is None:
+                return None
+            symbol_name, footprint_ref = symbol
+            component = IndexedComponent(
+                lcsc_id=lcsc_id, symbol_name=symbol_name, footprint_ref=footprint_ref
+            )
+            footprint_name = footprint_ref.split(":")[-1].strip() if footprint_ref else ""
+            if footprint_name:
+                entry = self._footprint(footprint_name)
+                component.footprint_path = entry.path
+                component.model_paths = dict(entry.model_paths)
+            return component
+
+
+class LibraryIndexCache:
+    """
+    The most recently used LibraryIndex objects, keyed by symbol file.
+
+    With `watch` enabled, libraries registered through `watch_library` are
+    kept current from a background LibraryWatcher (inotify or polling) and
+    are never evicted; everything else is checked on access.
+    """
+
+    def __init__(
+        self,
+        max_libraries: int = DEFAULT_MAX_LIBRARIES,
+        watch: bool = False,
+        poll_interval: Optional[float] = None,
+    ) -> None:
+        self.max_libraries = max(1, max_libraries)
+        self.watch = watch
+        self.poll_interval = poll_interval
+        self.watcher: Optional[LibraryWatcher] = None
+        self._indexes: "OrderedDict[str, LibraryIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _index(self, symbol_path: Path, library_root: Path) -> LibraryIndex:
+        key = str(symbol_path)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None or index.library_root != library_root:
+                index = LibraryIndex(symbol_path, library_root)
+                self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            evictable = [
+                name for name, candidate in self._indexes.items() if not candidate.watched
+            ]
+            while len(self._indexes) > self.max_libraries and evictable:
+                self._indexes.pop(evictable.pop(0))
+        return index
+
+    def get(self, symbol_path: Path, library_root: Path) -> LibraryIndex:
+        """Return the up-to-date index; raises OSError when unreadable."""
+        index = self._index(symbol_path, library_root)
+        if not (index.watched and index.loaded):
+            index.refresh()
+        return index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    # ------------------------------------------------------------ watching
+    def start(self) -> None:
+        if not self.watch or self.watcher is not None:
+            return
+        kwargs = {} if self.poll_interval is None else {"poll_interval": self.poll_interval}
+        self.watcher = create_library_watcher(self._on_change, **kwargs)
+        self.watcher.start()
+        logging.info("Watching KiCad libraries (%s)", self.watcher.backend)
+
+    def stop(self) -> None:
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        with self._lock:
+            for index in self._indexes.values():
+                index.watched = False
+
+    def watch_library(self, symbol_path: Path, library_root: Path) -> None:
+        """Index `symbol_path` now and keep it current from the watcher."""
+        if self.watcher is None:
+            return
+        try:
+            index = self.get(symbol_path, library_root)
+        except OSError:
+            return
+        if index.watched:
+            return
+        for directory in (symbol_path.parent, index.footprint_dir, index.model_dir):
+            if directory.is_dir():
+                self.watcher.watch(directory)
+        index.watched = True
+        # Resolve footprints off the request path
+        threading.Thread(target=index.warm, name="easyeda-index-warm", daemon=True).start()
+
+    def _watched_indexes(self) -> List[LibraryIndex]:
+        with self._lock:
+            return [index for index in self._indexes.values() if index.watched]
+
+    def _on_change(self, changes: Set[Optional[Path]]) -> None:
+        for index in self._watched_indexes():
+            try:
+                self._apply_changes(index, changes)
+            except OSError as exc:
+                # Unreadable for now: fall back to checking on access
+                logging.debug("Unable to update index of %s: %s", index.symbol_path, exc)
+                index.watched = False
+
+    def _apply_changes(self, index: LibraryIndex, changes: Set[Optional[Path]]) -> None:
+        if None in changes:
+            index.reindex_symbols()
+            index.forget_footprints()
+            index.warm()
+            return
+
+        if index.symbol_path in changes:
+            index.reindex_symbols()
+            # Footprints of newly added components
+            for footprint_name in index.footprint_names() - index.known_footprints():
+                index.update_footprint(footprint_name)
+
+        for directory in (index.footprint_dir, index.model_dir):
+            if directory in changes and directory.is_dir() and self.watcher is not None:
+                # Created (or re-created) since the library was first seen
+                self.watcher.watch(directory)
+        if index.footprint_dir in changes:
+            index.forget_footprints()
+            index.warm()
+        elif index.model_dir in changes:
+            index.update_models()
+
+        for path in changes:
+            if path is None:
+                continue
+            if path.parent == index.footprint_dir and path.suffix == ".kicad_mod":
+                index.update_footprint(path.stem)
+            elif path.parent == index.model_dir:
+                index.update_models(path.name)
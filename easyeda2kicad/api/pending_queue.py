@@ -0,0 +1,84 @@
+"""FIFO of queued task ids with constant-time position lookup."""
+
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+
+class PendingQueue:
+    """
+    Task ids in queue order, answering "what is my position?" cheaply.
+
+    Every id gets an increasing ticket when appended. The queue only keeps
+    the ticket of its head, so the position of a task is its distance to
+    the head; dequeuing the head just moves it forward and no other entry
+    is touched. Ids removed out of order (e.g. a task dropped while still
+    queued) are remembered as gaps and subtracted from the distance; the
+    gaps are consumed once the head passes them.
+    """
+
+    def __init__(self) -> None:
+        self._tickets: Dict[str, int] = {}
+        self._head = 0
+        self._next = 0
+        self._gaps: List[int] = []
+        # (ticket, id) in queue order; entries of removed ids are skipped
+        self._order: Deque[Tuple[int, str]] = deque()
+
+    def append(self, task_id: str) -> None:
+        if task_id in self._tickets:
+            return
+        self._tickets[task_id] = self._next
+        self._order.append((self._next, task_id))
+        self._next += 1
+
+    def remove(self, task_id: str) -> bool:
+        """Drop `task_id` wherever it is; returns False if it was not queued."""
+        ticket = self._tickets.pop(task_id, None)
+        if ticket is None:
+            return False
+        if not self._tickets:
+            self._head = self._next
+            self._gaps.clear()
+            self._order.clear()
+        elif ticket == self._head:
+            self._head += 1
+            skipped = 0
+            while skipped < len(self._gaps) and self._gaps[skipped] == self._head:
+                self._head += 1
+                skipped += 1
+            if skipped:
+                del self._gaps[:skipped]
+        else:
+            insort(self._gaps, ticket)
+        return True
+
+    def popleft(self) -> Optional[str]:
+        """Remove and return the first id, or None when the queue is empty."""
+        while self._order:
+            ticket, task_id = self._order.popleft()
+            if self._tickets.get(task_id) == ticket:
+                self.remove(task_id)
+                return task_id
+        return None
+
+    def position(self, task_id: str) -> Optional[int]:
+        """1-based position of `task_id`, or None when it is not queued."""
+        ticket = self._tickets.get(task_id)
+        if ticket is None:
+            return None
+        position = ticket - self._head + 1
+        if self._gaps:
+            position -= bisect_left(self._gaps, ticket)
+        return position
+
+    def __contains__(self, task_id: object) -> bool:
+        return task_id in self._tickets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tickets)
+
+    def __len__(self) -> int:
+        return len(self._tickets)
@@ -0,0 +1,159 @@
+"""Priority classes and per-client fair queuing in front of the conversion workers."""
+
+from __future__ import annotations
+
+import math
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Tuple
+
+from easyeda2kicad.api.pending_queue import PendingQueue
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+# Consecutive dispatches each class gets per round, in round order
+PRIORITY_WEIGHTS: Dict[str, int] = {PRIORITY_INTERACTIVE: 4, PRIORITY_BULK: 1}
+DEFAULT_CLIENT = "anonymous"
+
+
+class TaskScheduler:
+    """
+    Decides which queued task a free worker runs next.
+
+    Tasks belong to a priority class and a client. Classes are served by
+    weighted round robin (PRIORITY_WEIGHTS): up to 4 interactive tasks,
+    then one bulk task, so a single part clicked in the browser overtakes
+    a long BOM without starving it. Inside a class, clients take turns,
+    so one client's 500 queued parts do not delay another client's first
+    one. Each client keeps its tasks in FIFO order.
+
+    `position` estimates the dispatch order if no other task arrives, in
+    O(clients) time. Not thread-safe; the server calls it under its task
+    lock.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None) -> None:
+        self.weights = dict(weights or PRIORITY_WEIGHTS)
+        self._classes = list(self.weights)
+        # Per class: client -> its queue, in round-robin order
+        self._queues: Dict[str, "OrderedDict[str, PendingQueue]"] = {
+            priority: OrderedDict() for priority in self._classes
+        }
+        self._sizes: Dict[str, int] = {priority: 0 for priority in self._classes}
+        self._entries: Dict[str, Tuple[str, str]] = {}
+        self._class_index = 0
+        self._served = 0
+
+    def push(
+        self,
+        task_id: str,
+        priority: str = PRIORITY_INTERACTIVE,
+        client: Optional[str] = None,
+    ) -> None:
+        if priority not in self.weights:
+            raise ValueError(f"Unknown priority class: {priority}")
+        if task_id in self._entries:
+            return
+        client = client or DEFAULT_CLIENT
+        queues = self._queues[priority]
+        queue = queues.get(client)
+        if queue is None:
+            queue = queues[client] = PendingQueue()
+        queue.append(task_id)
+        self._sizes[priority] += 1
+        self._entries[task_id] = (priority, client)
+
+    def pop(self) -> Optional[str]:
+        """Remove and return the task to run next, or None when empty."""
+        if not self._entries:
+            return None
+        while True:
+            priority = self._classes[self._class_index]
+            if self._sizes[priority] and self._served < self.weights[priority]:
+                self._served += 1
+                return self._pop_class(priority)
+            self._class_index = (self._class_index + 1) % len(self._classes)
+            self._served = 0
+
+    def _pop_class(self, priority: str) -> str:
+        queues = self._queues[priority]
+        client, queue = next(iter(queues.items()))
+        task_id = queue.popleft()
+        # Empty client queues are dropped, so the first one has a task
+        assert task_id is not None
+        if queue:
+            queues.move_to_end(client)
+        else:
+            del queues[client]
+        self._sizes[priority] -= 1
+        del self._entries[task_id]
+        return task_id
+
+    def remove(self, task_id: str) -> bool:
+        entry = self._entries.pop(task_id, None)
+        if entry is None:
+            return False
+        priority, client = entry
+        queues = self._queues[priority]
+        queue = queues[client]
+        queue.remove(task_id)
+        if not queue:
+            del queues[client]
+        self._sizes[priority] -= 1
+        return True
+
+    def position(self, task_id: str) -> Optional[int]:
+        """Estimated 1-based dispatch position of `task_id`, None if not queued."""
+        entry = self._entries.get(task_id)
+        if entry is None:
+            return None
+        priority, client = entry
+        rank = self._queues[priority][client].position(task_id)
+        assert rank is not None
+
+        # Round robin: every client ahead of ours in the rotation gets as
+        # many turns as we need, the ones behind it one turn less
+        in_class = rank
+        ahead = True
+        for other, queue in self._queues[priority].items():
+            if other == client:
+                ahead = False
+                continue
+            in_class += min(len(queue), rank if ahead else rank - 1)
+
+        # Weighted round robin between classes, starting from the current
+        # one, which already used `_served` of its turns in this round
+        weight = self.weights[priority]
+        first_turns = self._turns_left(priority)
+        rounds = 1 + max(0, math.ceil((in_class - first_turns) / weight))
+        position = in_class
+        for other in self._classes:
+            if other == priority:
+                continue
+            # Classes served after ours in a round get one round less
+            turns = (rounds - 1) * self.weights[other]
+            if self._round_order(other) < self._round_order(priority):
+                turns += self._turns_left(other)
+            position += min(self._sizes[other], turns)
+        return position
+
+    def _turns_left(self, priority: str) -> int:
+        """Dispatches `priority` still gets in the current round."""
+        if priority == self._classes[self._class_index]:
+            return self.weights[priority] - self._served
+        return self.weights[priority]
+
+    def _round_order(self, priority: str) -> int:
+        index = self._classes.index(priority)
+        return (index - self._class_index) % len(self._classes)
+
+    def size(self, priority: str) -> int:
+        return self._sizes[priority]
+
+    def __contains__(self, task_id: object) -> bool:
+        return task_id in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,22 +1,21 @@
 from __future__ import annotations
 
-import asyncio
 import os
 import platform
 import re
 import uuid
-from collections import defaultdict, deque
-from contextlib import asynccontextmanager, suppress
-from dataclasses import dataclass, field
-from datetime import UTC, datetime
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 
 from fastapi import (
     APIRouter,
     Depends,
     FastAPI,
     HTTPException,
+    Query,
+    Request,
+    Response,
     WebSocket,
     WebSocketDisconnect,
     status,
@@ -24,37 +23,36 @@ from fastapi import (
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, field_validator, model_validator
 
+from easyeda2kicad.easyeda.cache import get_default_response_cache
+from easyeda2kicad.easyeda.model_store import get_default_model_store
+from easyeda2kicad.easyeda.obj_vertices import OBJ_PRECISION
+from easyeda2kicad.api.library_index import IndexedComponent, LibraryIndexCache
+from easyeda2kicad.api.scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE
+from easyeda2kicad.api.task_manager import (
+    _TASK_STATUSES,
+    ConversionRunner,
+    TaskBatch,
+    TaskBatchDetail,
+    TaskBatchSummary,
+    TaskDetail,
+    TaskManager,
+    TaskRecord,
+    TaskSummary,
+)
+from easyeda2kicad.api.task_registry import TaskRetention
+from easyeda2kicad.api.task_store import TaskStore, resolve_task_store_path
+from easyeda2kicad.kicad.export_kicad_3d_model import WRL_PRECISIONS
 from easyeda2kicad.kicad.parameters_kicad_symbol import KicadVersion
+from easyeda2kicad.kicad.sexpr import SymbolBlock
+from easyeda2kicad.kicad.symbol_library import iter_library_symbols
 from easyeda2kicad.service import (
     ConversionError,
     ConversionRequest,
-    ConversionResult,
-    ConversionStage,
     run_conversion,
 )
 
-
-class TaskStatus(str):
-    QUEUED = "queued"
-    RUNNING = "running"
-    COMPLETED = "completed"
-    FAILED = "failed"
-
-
-@dataclass
-class TaskRecord:
-    id: str
-    request: ConversionRequest
-    status: str = TaskStatus.QUEUED
-    progress: int = 0
-    message: Optional[str] = None
-    error: Optional[str] = None
-    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
-    started_at: Optional[datetime] = None
-    finished_at: Optional[datetime] = None
-    updated_at: datetime = field(default_factory=lambda: datetime.now(UTC))
-    result: Optional[ConversionResult] = None
-    log: List[dict[str, Any]] = field(default_factory=list)
+MAX_TASK_PAGE_SIZE = 1000
+MAX_TASK_BATCH_SIZE = 1000
 
 
 class TaskCreatePayload(BaseModel):
@@ -79,6 +77,36 @@ class TaskCreatePayload(BaseModel):
     model_path: Optional[str] = Field(
         None, description="Explicit 3D model base path to use as-is."
     )
+    model_placement: Optional[str] = Field(
+        None,
+        pattern=r"^(geometry|metadata)$",
+        description=(
+            "Place the footprint 3D model from the measured mesh (geometry) or"
+            " from the footprint data alone (metadata, no model download);"
+            " defaults to geometry when the 3D model is requested, else metadata"
+        ),
+    )
+    compress_model: bool = Field(
+        False, description="Write the 3D model as gzipped VRML (.wrz)"
+    )
+    model_precision: int = Field(
+        OBJ_PRECISION,
+        ge=WRL_PRECISIONS.start,
+        le=WRL_PRECISIONS.stop - 1,
+        description="Decimals of the 3D model coordinates",
+    )
+    merge_model_points: bool = Field(
+        False,
+        description="List the 3D model points that round to the same coordinates once",
+    )
+    priority: Optional[str] = Field(
+        None,
+        pattern=r"^(interactive|bulk)$",
+        description=(
+            "Scheduling class; defaults to interactive for single tasks and"
+            " to bulk inside a batch"
+        ),
+    )
 
     @field_validator("lcsc_id")
     @classmethod
@@ -93,28 +121,10 @@ class TaskCreatePayload(BaseModel):
         return payload
 
 
-class ConversionResultModel(BaseModel):
-    symbol_path: Optional[str] = None
-    footprint_path: Optional[str] = None
-    model_paths: Dict[str, str] = Field(default_factory=dict)
-    messages: List[str] = Field(default_factory=list)
-
-
-class TaskSummary(BaseModel):
-    id: str
-    status: str
-    progress: int
-    message: Optional[str]
-    queue_position: Optional[int]
-    error: Optional[str]
-    created_at: datetime
-    started_at: Optional[datetime]
-    finished_at: Optional[datetime]
-    result: Optional[ConversionResultModel]
-
-
-class TaskDetail(TaskSummary):
-    log: List[dict[str, Any]]
+class TaskBatchPayload(BaseModel):
+    tasks: List[TaskCreatePayload] = Field(
+        ..., min_length=1, max_length=MAX_TASK_BATCH_SIZE
+    )
 
 
 class PathRequest(BaseModel):
@@ -325,7 +335,7 @@ def _inspect_library(path: str) -> LibraryValidateResponse:
     model_exists = model_dir.is_dir()
     if model_exists:
         assets["model"] = True
-        counts["model"] = sum(1 for item in model_dir.iterdir() if item.is_file() and item.suffix.lower() == ".wrl")
+        counts["model"] = sum(1 for item in model_dir.iterdir() if item.is_file() and item.suffix.lower() in (".wrl", ".wrz"))
 
     exists = resolved.exists() or bool(symbol_exists) or footprint_exists or model_exists
 
@@ -383,124 +393,12 @@ def _extract_model_path(footprint_dir: Path) -> Optional[str]:
     return None
 
 
-def _extract_model_paths(footprint_path: Path, model_dir: Path) -> Dict[str, str]:
-    try:
-        content = footprint_path.read_text(encoding="utf-8", errors="ignore")
-    except OSError:
-        return {}
-
-    model_paths: Dict[str, str] = {}
-    for match in re.finditer(r'\(model\s+(?:"([^"]+)"|([^\s\)]+))', content):
-        raw_path = (match.group(1) or match.group(2) or "").strip()
-        if not raw_path:
-            continue
-        resolved = _resolve_model_candidate(raw_path, model_dir)
-        if resolved:
-            model_paths[resolved.name] = str(resolved)
-    return model_paths
-
-
-def _resolve_model_candidate(raw_path: str, model_dir: Path) -> Optional[Path]:
-    cleaned = raw_path.strip().replace("\\", "/")
-    if cleaned.startswith("${KIPRJMOD}"):
-        cleaned = cleaned[len("${KIPRJMOD}") :]
-    cleaned = cleaned.lstrip("/")
-
-    candidate = Path(cleaned)
-    if candidate.is_absolute():
-        if candidate.is_file():
-            return candidate
-        return None
-
-    for base in (model_dir, model_dir.parent):
-        resolved = (base / cleaned).resolve(strict=False)
-        if resolved.is_file():
-            return resolved
-
-    basename = Path(raw_path).name
-    if basename:
-        fallback = model_dir / basename
-        if fallback.is_file():
-            return fallback
-
-    return None
-
-
-def _iter_symbol_blocks_v6(content: str) -> List[str]:
-    blocks: List[str] = []
-    depth = 0
-    in_block = False
-    block_lines: List[str] = []
-    for line in content.splitlines():
-        if not in_block:
-            if line.lstrip().startswith("(symbol "):
-                in_block = True
-                depth = line.count("(") - line.count(")")
-                block_lines = [line]
-                if depth <= 0:
-                    blocks.append("\n".join(block_lines))
-                    in_block = False
-            continue
-        block_lines.append(line)
-        depth += line.count("(") - line.count(")")
-        if depth <= 0:
-            blocks.append("\n".join(block_lines))
-            in_block = False
-    return blocks
-
-
-def _iter_symbol_blocks_v5(content: str) -> List[str]:
-    blocks: List[str] = []
-    block_lines: List[str] = []
-    in_block = False
-    for line in content.splitlines():
-        if not in_block:
-            if line.startswith("DEF "):
-                in_block = True
-                block_lines = [line]
-            continue
-        block_lines.append(line)
-        if line.strip() == "ENDDEF":
-            blocks.append("\n".join(block_lines))
-            in_block = False
-    return blocks
+def _iter_symbol_blocks(content: str, suffix: str) -> Iterator[SymbolBlock]:
+    kicad_version = KicadVersion.v6 if suffix == ".kicad_sym" else KicadVersion.v5
+    return iter_library_symbols(content, kicad_version)
 
 
-def _find_component_block(content: str, lcsc_id: str, suffix: str) -> Optional[Tuple[str, Optional[str]]]:
-    lcsc = lcsc_id.strip()
-    if not lcsc:
-        return None
-
-    blocks = _iter_symbol_blocks_v6(content) if suffix == ".kicad_sym" else _iter_symbol_blocks_v5(content)
-    if not blocks:
-        return None
-
-    if suffix == ".kicad_sym":
-        lcsc_pattern = re.compile(
-            rf'\(property\s+"LCSC Part"\s+"{re.escape(lcsc)}"',
-            re.IGNORECASE | re.DOTALL,
-        )
-        footprint_pattern = re.compile(
-            r'\(property\s+"Footprint"\s+"([^"]+)"',
-            re.IGNORECASE | re.DOTALL,
-        )
-    else:
-        lcsc_pattern = re.compile(
-            rf'^\s*F6\s+"{re.escape(lcsc)}".*LCSC Part',
-            re.IGNORECASE | re.MULTILINE,
-        )
-        footprint_pattern = re.compile(r'^\s*F2\s+"([^"]*)"', re.MULTILINE)
-
-    for block in blocks:
-        if not lcsc_pattern.search(block):
-            continue
-        footprint_match = footprint_pattern.search(block)
-        footprint_ref = footprint_match.group(1).strip() if footprint_match else None
-        return block, footprint_ref
-    return None
-
-
-def _check_component_in_library(path: str, lcsc_id: str) -> ComponentCheckResponse:
+def _resolve_symbol_library(path: str) -> Tuple[Optional[Path], Path]:
     try:
         target = Path(path).expanduser()
     except OSError as exc:
@@ -516,90 +414,40 @@ def _check_component_in_library(path: str, lcsc_id: str) -> ComponentCheckRespon
         library_root = resolved
 
     symbol_path = next((candidate for candidate in symbol_candidates if candidate.is_file()), None)
-    if not symbol_path:
-        return ComponentCheckResponse(messages=["Symbol library not found."])
-
-    try:
-        content = symbol_path.read_text(encoding="utf-8", errors="ignore")
-    except OSError:
-        return ComponentCheckResponse(messages=["Unable to read symbol library."])
+    return symbol_path, library_root
 
-    match = _find_component_block(content, lcsc_id, symbol_path.suffix.lower())
-    if not match:
-        return ComponentCheckResponse(messages=["Component not found in library."])
-
-    _block, footprint_ref = match
-    footprint_path: Optional[Path] = None
-    if footprint_ref:
-        footprint_name = footprint_ref.split(":")[-1].strip()
-        if footprint_name:
-            footprint_path = library_root.with_suffix(".pretty") / f"{footprint_name}.kicad_mod"
-
-    model_paths: Dict[str, str] = {}
-    if footprint_path and footprint_path.is_file():
-        model_dir = library_root.with_suffix(".3dshapes")
-        model_paths = _extract_model_paths(footprint_path, model_dir)
 
+def _component_response(symbol_path: Path, component: IndexedComponent) -> ComponentCheckResponse:
     return ComponentCheckResponse(
         symbol_path=str(symbol_path),
-        footprint_path=str(footprint_path) if footprint_path and footprint_path.is_file() else None,
-        model_paths=model_paths,
+        footprint_path=component.footprint_path,
+        model_paths=component.model_paths,
         messages=[],
     )
 
 
-def _index_symbols_by_lcsc(content: str, suffix: str) -> Dict[str, Optional[str]]:
-    mapping: Dict[str, Optional[str]] = {}
-    if suffix == ".kicad_sym":
-        for block in _iter_symbol_blocks_v6(content):
-            lcsc_match = re.search(
-                r'\(property\s+"LCSC Part"\s+"([^"]+)"',
-                block,
-                re.IGNORECASE | re.DOTALL,
-            )
-            if not lcsc_match:
-                continue
-            lcsc_id = lcsc_match.group(1).strip().upper()
-            footprint_match = re.search(
-                r'\(property\s+"Footprint"\s+"([^"]+)"',
-                block,
-                re.IGNORECASE | re.DOTALL,
-            )
-            footprint_ref = footprint_match.group(1).strip() if footprint_match else None
-            mapping[lcsc_id] = footprint_ref
-        return mapping
-
-    for block in _iter_symbol_blocks_v5(content):
-        lcsc_match = re.search(
-            r'^\s*F6\s+"([^"]+)".*LCSC Part',
-            block,
-            re.IGNORECASE | re.MULTILINE,
-        )
-        if not lcsc_match:
-            continue
-        lcsc_id = lcsc_match.group(1).strip().upper()
-        footprint_match = re.search(r'^\s*F2\s+"([^"]*)"', block, re.MULTILINE)
-        footprint_ref = footprint_match.group(1).strip() if footprint_match else None
-        mapping[lcsc_id] = footprint_ref
-    return mapping
-
+def _check_component_in_library(
+    path: str, lcsc_id: str, indexes: LibraryIndexCache
+) -> ComponentCheckResponse:
+    symbol_path, library_root = _resolve_symbol_library(path)
+    if not symbol_path:
+        return ComponentCheckResponse(messages=["Symbol library not found."])
 
-def _check_components_in_library(path: str, lcsc_ids: List[str]) -> ComponentBatchResponse:
     try:
-        target = Path(path).expanduser()
-    except OSError as exc:
-        raise HTTPException(status_code=400, detail=f"Invalid path: {path}") from exc
+        index = indexes.get(symbol_path, library_root)
+    except OSError:
+        return ComponentCheckResponse(messages=["Unable to read symbol library."])
 
-    resolved = target.resolve(strict=False)
-    lower_suffix = resolved.suffix.lower()
-    if lower_suffix in {".kicad_sym", ".lib"}:
-        symbol_candidates = [resolved]
-        library_root = resolved.with_suffix("")
-    else:
-        symbol_candidates = [resolved.with_suffix(".kicad_sym"), resolved.with_suffix(".lib")]
-        library_root = resolved
+    component = index.lookup(lcsc_id)
+    if not component:
+        return ComponentCheckResponse(messages=["Component not found in library."])
+    return _component_response(symbol_path, component)
 
-    symbol_path = next((candidate for candidate in symbol_candidates if candidate.is_file()), None)
+
+def _check_components_in_library(
+    path: str, lcsc_ids: List[str], indexes: LibraryIndexCache
+) -> ComponentBatchResponse:
+    symbol_path, library_root = _resolve_symbol_library(path)
     results: Dict[str, ComponentCheckResponse] = {}
     if not symbol_path:
         for lcsc_id in lcsc_ids:
@@ -607,35 +455,18 @@ def _check_components_in_library(path: str, lcsc_ids: List[str]) -> ComponentBat
         return ComponentBatchResponse(results=results)
 
     try:
-        content = symbol_path.read_text(encoding="utf-8", errors="ignore")
+        index = indexes.get(symbol_path, library_root)
     except OSError:
         for lcsc_id in lcsc_ids:
             results[lcsc_id] = ComponentCheckResponse(messages=["Unable to read symbol library."])
         return ComponentBatchResponse(results=results)
 
-    index = _index_symbols_by_lcsc(content, symbol_path.suffix.lower())
-
     for lcsc_id in lcsc_ids:
-        footprint_ref = index.get(lcsc_id)
-        if not footprint_ref:
+        component = index.lookup(lcsc_id)
+        if not component or not component.footprint_ref:
             results[lcsc_id] = ComponentCheckResponse(messages=["Component not found in library."])
             continue
-        footprint_name = footprint_ref.split(":")[-1].strip()
-        footprint_path = (
-            library_root.with_suffix(".pretty") / f"{footprint_name}.kicad_mod"
-            if footprint_name
-            else None
-        )
-        model_paths: Dict[str, str] = {}
-        if footprint_path and footprint_path.is_file():
-            model_dir = library_root.with_suffix(".3dshapes")
-            model_paths = _extract_model_paths(footprint_path, model_dir)
-        results[lcsc_id] = ComponentCheckResponse(
-            symbol_path=str(symbol_path),
-            footprint_path=str(footprint_path) if footprint_path and footprint_path.is_file() else None,
-            model_paths=model_paths,
-            messages=[],
-        )
+        results[lcsc_id] = _component_response(symbol_path, component)
     return ComponentBatchResponse(results=results)
 
 
@@ -643,10 +474,9 @@ def _count_symbols_in_file(path: Path) -> int:
     try:
         content = path.read_text(encoding="utf-8", errors="ignore")
     except OSError:
-        return 1
+        return 0
 
-    matches = re.findall(r"\(\s*symbol\b", content)
-    return len(matches) or 1
+    return sum(1 for _ in _iter_symbol_blocks(content, path.suffix.lower()))
 
 
 def _fs_roots() -> List[dict[str, str]]:
@@ -759,244 +589,186 @@ def _fs_check(path: str) -> dict[str, Any]:
     }
 
 
-def create_app(
-    conversion_runner: Callable[[ConversionRequest, Optional[Callable]], ConversionResult]
-    = run_conversion,
-) -> FastAPI:
-    router = APIRouter()
-    app = FastAPI(
-        title="easyeda2kicad API",
-        description="REST/WebSocket interface for easyeda2kicad conversions.",
-        version="0.1.0",
+def _client_id(request: Request) -> Optional[str]:
+    """Client used for fair queuing: the X-Client-Id header, else the peer address."""
+    client_id = request.headers.get("X-Client-Id", "").strip()
+    if client_id:
+        return client_id[:128]
+    return request.client.host if request.client else None
+
+
+def _conversion_request(payload: TaskCreatePayload) -> ConversionRequest:
+    version = KicadVersion.v6 if payload.kicad_version == "v6" else KicadVersion.v5
+    return ConversionRequest(
+        lcsc_id=payload.lcsc_id,
+        output_prefix=payload.output_path,
+        overwrite=payload.overwrite,
+        overwrite_model=payload.overwrite_model,
+        generate_symbol=payload.symbol,
+        generate_footprint=payload.footprint,
+        generate_model=payload.model,
+        kicad_version=version,
+        project_relative=payload.project_relative,
+        project_relative_path=payload.project_relative_path,
+        model_path=payload.model_path,
+        model_placement=payload.model_placement or "",
+        compress_model=payload.compress_model,
+        model_precision=payload.model_precision,
+        merge_model_points=payload.merge_model_points,
     )
 
-    app.state.conversion_runner = conversion_runner
-    app.state.queue: asyncio.Queue[TaskRecord] = asyncio.Queue()
-    app.state.pending: Deque[str] = deque()
-    app.state.tasks: Dict[str, TaskRecord] = {}
-    app.state.task_lock = asyncio.Lock()
-    app.state.subscribers: Dict[str, Set[WebSocket]] = defaultdict(set)
-    app.state.worker_task: Optional[asyncio.Task[Any]] = None
 
-    async def get_task(task_id: str) -> TaskRecord:
-        async with app.state.task_lock:
-            record = app.state.tasks.get(task_id)
-        if not record:
-            raise HTTPException(status_code=404, detail="Task not found.")
-        return record
+DEFAULT_CONVERSION_WORKERS = 4
 
-    def queue_position(task_id: str) -> Optional[int]:
+
+def resolve_worker_count(workers: Optional[int] = None) -> int:
+    """Number of conversion workers: `workers`, EASYEDA2KICAD_WORKERS or the default."""
+    if workers is None:
+        value = os.getenv("EASYEDA2KICAD_WORKERS", "")
         try:
-            return app.state.pending.index(task_id) + 1
+            workers = int(value) if value else DEFAULT_CONVERSION_WORKERS
         except ValueError:
-            return None
+            workers = DEFAULT_CONVERSION_WORKERS
+    return max(1, workers)
 
-    def as_summary(record: TaskRecord) -> TaskSummary:
-        return TaskSummary(
-            id=record.id,
-            status=record.status,
-            progress=record.progress,
-            message=record.message,
-            queue_position=queue_position(record.id),
-            error=record.error,
-            created_at=record.created_at,
-            started_at=record.started_at,
-            finished_at=record.finished_at,
-            result=ConversionResultModel(
-                symbol_path=record.result.symbol_path if record.result else None,
-                footprint_path=record.result.footprint_path if record.result else None,
-                model_paths=record.result.model_paths if record.result else {},
-                messages=record.result.messages if record.result else [],
-            )
-            if record.result
-            else None,
-        )
 
-    def as_detail(record: TaskRecord) -> TaskDetail:
-        summary = as_summary(record)
-        return TaskDetail(**summary.model_dump(), log=record.log)
+def resolve_watch_libraries(watch_libraries: Optional[bool] = None) -> bool:
+    """Whether to watch libraries: `watch_libraries` or EASYEDA2KICAD_WATCH_LIBRARIES."""
+    if watch_libraries is None:
+        value = os.getenv("EASYEDA2KICAD_WATCH_LIBRARIES", "")
+        return value.strip().lower() in {"1", "true", "yes", "on"}
+    return watch_libraries
 
-    async def broadcast(task_id: str) -> None:
-        async with app.state.task_lock:
-            record = app.state.tasks.get(task_id)
-            subscribers = list(app.state.subscribers.get(task_id, set()))
-        if not record:
-            return
-        payload = as_summary(record).model_dump()
-        disconnects: List[WebSocket] = []
-        for websocket in subscribers:
-            try:
-                await websocket.send_json(payload)
-            except WebSocketDisconnect:
-                disconnects.append(websocket)
-            except RuntimeError:
-                disconnects.append(websocket)
-        if disconnects:
-            async with app.state.task_lock:
-                for websocket in disconnects:
-                    app.state.subscribers[task_id].discard(websocket)
-
-    async def broadcast_queue_changes() -> None:
-        async with app.state.task_lock:
-            pending_ids = list(app.state.pending)
-        for task_id in pending_ids:
-            await broadcast(task_id)
-
-    async def update_progress(
-        task_id: str, stage: ConversionStage, percent: int, message: Optional[str]
-    ) -> None:
-        async with app.state.task_lock:
-            record = app.state.tasks.get(task_id)
-            if not record:
-                return
-            record.progress = max(0, min(100, percent))
-            record.message = message
-            record.updated_at = datetime.now(UTC)
-            record.log.append(
-                {
-                    "timestamp": record.updated_at.isoformat(),
-                    "stage": stage.name,
-                    "message": message,
-                    "progress": record.progress,
-                }
-            )
-            if stage == ConversionStage.COMPLETED:
-                record.status = TaskStatus.COMPLETED
-                record.finished_at = datetime.now(UTC)
-            elif stage == ConversionStage.FAILED:
-                record.status = TaskStatus.FAILED
-                record.finished_at = datetime.now(UTC)
-            else:
-                record.status = TaskStatus.RUNNING
-        await broadcast(task_id)
-
-    async def worker() -> None:
-        loop = asyncio.get_running_loop()
-        while True:
-            task = await app.state.queue.get()
-            async with app.state.task_lock:
-                if app.state.pending and app.state.pending[0] == task.id:
-                    app.state.pending.popleft()
-                task.status = TaskStatus.RUNNING
-                task.started_at = datetime.now(UTC)
-                task.updated_at = task.started_at
-            await broadcast(task.id)
-            await broadcast_queue_changes()
-
-            def progress_callback(
-                stage: ConversionStage, percent: int, message: Optional[str]
-            ) -> None:
-                asyncio.run_coroutine_threadsafe(
-                    update_progress(task.id, stage, percent, message), loop
-                )
 
-            try:
-                result = await asyncio.to_thread(
-                    app.state.conversion_runner, task.request, progress_callback
-                )
-            except Exception as exc:  # pragma: no cover - defensive catch
-                async with app.state.task_lock:
-                    task.status = TaskStatus.FAILED
-                    task.error = str(exc)
-                    task.message = str(exc)
-                    task.progress = task.progress or 0
-                    task.finished_at = datetime.now(UTC)
-                    task.updated_at = task.finished_at
-                    task.log.append(
-                        {
-                            "timestamp": task.updated_at.isoformat(),
-                            "stage": ConversionStage.FAILED.name,
-                            "message": task.error,
-                            "progress": task.progress,
-                        }
-                    )
-                await broadcast(task.id)
-            else:
-                async with app.state.task_lock:
-                    task.status = TaskStatus.COMPLETED
-                    task.result = result
-                    task.progress = max(task.progress, 100)
-                    task.message = "Conversion finished."
-                    task.finished_at = datetime.now(UTC)
-                    task.updated_at = task.finished_at
-                    task.log.append(
-                        {
-                            "timestamp": task.updated_at.isoformat(),
-                            "stage": ConversionStage.COMPLETED.name,
-                            "message": task.message,
-                            "progress": task.progress,
-                        }
-                    )
-                await broadcast(task.id)
-
-            app.state.queue.task_done()
+def _cache_stats() -> Dict[str, Any]:
+    cache = get_default_response_cache()
+    model_store = get_default_model_store()
+    stats: Dict[str, Any] = {"enabled": cache is not None}
+    if cache is not None:
+        stats.update(offline=cache.offline, **cache.stats.as_dict())
+    if model_store is not None:
+        stats["models"] = {
+            "link_mode": model_store.link_mode,
+            **model_store.stats.as_dict(),
+        }
+    return stats
 
-    async def start_worker() -> None:
-        if app.state.worker_task is None or app.state.worker_task.done():
-            app.state.worker_task = asyncio.create_task(worker())
 
-    async def stop_worker() -> None:
-        worker_task = app.state.worker_task
-        if not worker_task:
-            return
-        await app.state.queue.join()
-        worker_task.cancel()
-        with suppress(asyncio.CancelledError):
-            await worker_task
-        app.state.worker_task = None
+def _add_task_routes(router: APIRouter, manager: TaskManager) -> None:
+    """Queueing and lookup of conversion tasks and batches."""
 
-    @asynccontextmanager
-    async def lifespan(_: FastAPI):
-        await start_worker()
-        try:
-            yield
-        finally:
-            await stop_worker()
-
-    app.router.lifespan_context = lifespan
-    app.state.start_worker = start_worker
-    app.state.stop_worker = stop_worker
+    async def get_task(task_id: str) -> TaskRecord:
+        record = await manager.get(task_id)
+        if not record:
+            raise HTTPException(status_code=404, detail="Task not found.")
+        return record
 
     @router.post(
         "/tasks", status_code=status.HTTP_202_ACCEPTED, response_model=TaskSummary
     )
-    async def enqueue_task(payload: TaskCreatePayload) -> TaskSummary:
-        version = KicadVersion.v6 if payload.kicad_version == "v6" else KicadVersion.v5
+    async def enqueue_task(
+        payload: TaskCreatePayload, http_request: Request
+    ) -> TaskSummary:
         try:
-            request = ConversionRequest(
-                lcsc_id=payload.lcsc_id,
-                output_prefix=payload.output_path,
-                overwrite=payload.overwrite,
-                overwrite_model=payload.overwrite_model,
-                generate_symbol=payload.symbol,
-                generate_footprint=payload.footprint,
-                generate_model=payload.model,
-                kicad_version=version,
-                project_relative=payload.project_relative,
-                project_relative_path=payload.project_relative_path,
-                model_path=payload.model_path,
-            )
+            request = _conversion_request(payload)
         except ConversionError as exc:
             raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-        task_id = str(uuid.uuid4())
-        record = TaskRecord(id=task_id, request=request)
-
-        async with app.state.task_lock:
-            app.state.tasks[task_id] = record
-            app.state.pending.append(task_id)
-            await app.state.queue.put(record)
+        record = manager.new_record(
+            request,
+            payload.priority or PRIORITY_INTERACTIVE,
+            _client_id(http_request),
+        )
+        await manager.enqueue([record])
+        return manager.summary(record)
 
-        await broadcast_queue_changes()
-        await broadcast(task_id)
+    @router.post(
+        "/tasks/batch",
+        status_code=status.HTTP_202_ACCEPTED,
+        response_model=TaskBatchDetail,
+    )
+    async def enqueue_batch(
+        payload: TaskBatchPayload, http_request: Request
+    ) -> TaskBatchDetail:
+        """
+        Queue several conversions (e.g. a whole BOM) at once.
+
+        Every entry is validated first; if any is rejected nothing is
+        queued and the errors of all entries are returned. The returned
+        batch id gives the aggregate progress through
+        GET /tasks/batch/{batch_id} and /ws/tasks/batch/{batch_id}.
+        Entries are scheduled as bulk work unless they set a priority.
+        """
+        requests: List[ConversionRequest] = []
+        errors: List[dict[str, Any]] = []
+        for index, item in enumerate(payload.tasks):
+            try:
+                requests.append(_conversion_request(item))
+            except ConversionError as exc:
+                errors.append(
+                    {"index": index, "lcsc_id": item.lcsc_id, "error": str(exc)}
+                )
+        if errors:
+            raise HTTPException(status_code=400, detail=errors)
+
+        batch = TaskBatch(id=str(uuid.uuid4()), task_ids=[])
+        client_id = _client_id(http_request)
+        records = [
+            manager.new_record(
+                request, item.priority or PRIORITY_BULK, client_id, batch.id
+            )
+            for request, item in zip(requests, payload.tasks)
+        ]
+        batch.task_ids = [record.id for record in records]
+        await manager.enqueue(records, batch)
+        async with manager.lock:
+            summary = manager.batch_summary(batch)
+        return TaskBatchDetail(
+            **summary.model_dump(),
+            tasks=[manager.summary(record) for record in records],
+        )
 
-        return as_summary(record)
+    @router.get("/tasks/batch/{batch_id}", response_model=TaskBatchSummary)
+    async def retrieve_batch(batch_id: str) -> TaskBatchSummary:
+        summary = await manager.get_batch(batch_id)
+        if summary is None:
+            raise HTTPException(status_code=404, detail="Batch not found.")
+        return summary
 
     @router.get("/tasks", response_model=List[TaskSummary])
-    async def list_tasks() -> List[TaskSummary]:
-        async with app.state.task_lock:
-            records = list(app.state.tasks.values())
-        return [as_summary(record) for record in records]
+    async def list_tasks(
+        response: Response,
+        task_status: Optional[List[str]] = Query(None, alias="status"),
+        cursor: int = Query(0, ge=0),
+        limit: Optional[int] = Query(None, ge=1, le=MAX_TASK_PAGE_SIZE),
+    ) -> List[TaskSummary]:
+        """
+        Tasks ordered by their last change, oldest first.
+
+        Only tasks changed after `cursor` are returned, optionally limited
+        to the given `status` values (repeatable) and to `limit` tasks.
+        The X-Next-Cursor header holds the cursor for the next call: the
+        next page when the limit was reached, otherwise the current state,
+        so polling with it returns only the tasks that changed meanwhile.
+        """
+        statuses = set(task_status or ())
+        unknown = statuses - _TASK_STATUSES
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown task status: {', '.join(sorted(unknown))}",
+            )
+        records, next_cursor = await manager.changed_since(statuses, cursor, limit)
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+        return [manager.summary(record) for record in records]
+
+    @router.get("/tasks/{task_id}", response_model=TaskDetail)
+    async def retrieve_task(task: TaskRecord = Depends(get_task)) -> TaskDetail:
+        return manager.detail(task)
+
+
+def _add_library_routes(router: APIRouter, indexes: LibraryIndexCache) -> None:
+    """File system browsing, library checks and service status."""
 
     @router.get("/fs/roots")
     async def fs_roots() -> List[dict[str, str]]:
@@ -1015,6 +787,9 @@ def create_app(
     )
     async def libraries_scaffold(payload: LibraryScaffoldRequest) -> LibraryScaffoldResponse:
         prefix, created, paths = _scaffold_library(payload)
+        symbol_path = paths.get("symbol")
+        if symbol_path:
+            indexes.watch_library(Path(symbol_path), prefix)
         return LibraryScaffoldResponse(
             resolved_library_prefix=str(prefix),
             symbol_path=paths.get("symbol"),
@@ -1025,44 +800,155 @@ def create_app(
 
     @router.post("/libraries/validate", response_model=LibraryValidateResponse)
     async def libraries_validate(payload: LibraryValidateRequest) -> LibraryValidateResponse:
-        return _inspect_library(payload.path)
+        response = _inspect_library(payload.path)
+        symbol_path, library_root = _resolve_symbol_library(payload.path)
+        if symbol_path:
+            indexes.watch_library(symbol_path, library_root)
+        return response
 
     @router.post("/libraries/component", response_model=ComponentCheckResponse)
     async def libraries_component(payload: ComponentCheckRequest) -> ComponentCheckResponse:
-        return _check_component_in_library(payload.path, payload.lcsc_id)
+        return _check_component_in_library(
+            payload.path, payload.lcsc_id, indexes
+        )
 
     @router.post("/libraries/components", response_model=ComponentBatchResponse)
     async def libraries_components(payload: ComponentBatchRequest) -> ComponentBatchResponse:
-        return _check_components_in_library(payload.path, payload.lcsc_ids)
-
-    @router.get("/tasks/{task_id}", response_model=TaskDetail)
-    async def retrieve_task(task: TaskRecord = Depends(get_task)) -> TaskDetail:
-        return as_detail(task)
+        return _check_components_in_library(
+            payload.path, payload.lcsc_ids, indexes
+        )
 
     @router.get("/health")
     async def health() -> JSONResponse:
         return JSONResponse({"status": "ok"})
 
-    @app.websocket("/ws/tasks/{task_id}")
-    async def task_updates(websocket: WebSocket, task_id: str) -> None:
-        await websocket.accept()
-        async with app.state.task_lock:
-            record = app.state.tasks.get(task_id)
-            if not record:
-                await websocket.send_json({"error": "Task not found."})
-                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-                return
-            app.state.subscribers[task_id].add(websocket)
-        await broadcast(task_id)
+    @router.get("/cache/stats")
+    async def cache_stats() -> Dict[str, Any]:
+        return _cache_stats()
+
+
+def _add_stream_routes(app: FastAPI, manager: TaskManager) -> None:
+    """WebSocket updates of tasks and batches."""
+
+    async def stream_updates(
+        websocket: WebSocket, task_id: Optional[str], batch_id: Optional[str] = None
+    ) -> None:
+        await manager.stream.subscribe(websocket, task_id, batch_id)
         try:
             while True:
                 await websocket.receive_text()
         except WebSocketDisconnect:
             pass
         finally:
-            async with app.state.task_lock:
-                app.state.subscribers[task_id].discard(websocket)
+            await manager.stream.unsubscribe(websocket)
+
+    @app.websocket("/ws/tasks")
+    async def all_task_updates(websocket: WebSocket) -> None:
+        """
+        Updates of every task: a "snapshot" message with all task summaries,
+        then "tasks" messages with the changed fields of each changed task
+        and the ids of removed ones, at most once per flush interval.
+        """
+        await websocket.accept()
+        await stream_updates(websocket, None)
+
+    @app.websocket("/ws/tasks/batch/{batch_id}")
+    async def batch_updates(websocket: WebSocket, batch_id: str) -> None:
+        """Aggregate summary of a batch each time one of its tasks changed."""
+        await websocket.accept()
+        async with manager.lock:
+            batch = manager.batches.get(batch_id)
+        if not batch:
+            await websocket.send_json({"error": "Batch not found."})
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        await stream_updates(websocket, None, batch_id)
+
+    @app.websocket("/ws/tasks/{task_id}")
+    async def task_updates(websocket: WebSocket, task_id: str) -> None:
+        await websocket.accept()
+        async with manager.lock:
+            record = manager.tasks.get(task_id)
+        if not record:
+            await websocket.send_json({"error": "Task not found."})
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        await stream_updates(websocket, task_id)
+
+
+def create_app(
+    conversion_runner: ConversionRunner = run_conversion,
+    workers: Optional[int] = None,
+    watch_libraries: Optional[bool] = None,
+    retention: Optional[TaskRetention] = None,
+    task_store: Optional[Union[str, TaskStore]] = None,
+) -> FastAPI:
+    """
+    Build the API application.
+
+    Up to `workers` queued conversions (see resolve_worker_count) run at the
+    same time, each on its own thread. run_conversion takes a per-library
+    lock around its file writes, so jobs for the same library only wait for
+    each other while writing; fetching and converting always overlap.
+
+    With `watch_libraries` (see resolve_watch_libraries) the libraries seen
+    through /libraries/validate and /libraries/scaffold are watched for
+    changes, so component lookups are answered without touching the disk.
+
+    Finished tasks are dropped according to `retention` (by default
+    TaskRetention.from_env()); queued and running tasks are always kept.
+
+    With a `task_store` (a TaskStore or a database path, see
+    resolve_task_store_path) tasks are persisted, and the tasks that were
+    queued or running when the server stopped are queued again on start.
+
+    The tasks themselves are kept by the TaskManager in
+    `app.state.task_manager`; this function only wires the routes.
+    """
+    router = APIRouter()
+    app = FastAPI(
+        title="easyeda2kicad API",
+        description="REST/WebSocket interface for easyeda2kicad conversions.",
+        version="0.1.0",
+    )
+
+    if task_store is None or isinstance(task_store, str):
+        store_path = resolve_task_store_path(task_store)
+        task_store = TaskStore(store_path) if store_path else None
+    manager = TaskManager(
+        conversion_runner,
+        workers=resolve_worker_count(workers),
+        retention=retention or TaskRetention.from_env(),
+        store=task_store,
+    )
+    app.state.task_manager = manager
+    app.state.library_indexes = LibraryIndexCache(
+        watch=resolve_watch_libraries(watch_libraries)
+    )
+
+    async def start_worker() -> None:
+        await manager.start()
+        app.state.library_indexes.start()
+
+    async def stop_worker() -> None:
+        app.state.library_indexes.stop()
+        await manager.stop()
+
+    @asynccontextmanager
+    async def lifespan(_: FastAPI):
+        await start_worker()
+        try:
+            yield
+        finally:
+            await stop_worker()
+
+    app.router.lifespan_context = lifespan
+    app.state.start_worker = start_worker
+    app.state.stop_worker = stop_worker
 
+    _add_task_routes(router, manager)
+    _add_library_routes(router, app.state.library_indexes)
+    _add_stream_routes(app, manager)
     app.include_router(router)
 
     return app
@@ -0,0 +1,785 @@
+"""Conversion tasks of the API server: queueing, workers, updates and persistence."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, Field
+
+from easyeda2kicad.api.scheduler import PRIORITY_INTERACTIVE, TaskScheduler
+from easyeda2kicad.api.task_registry import (
+    DEFAULT_TASK_LOG_LIMIT,
+    TaskJournal,
+    TaskRetention,
+)
+from easyeda2kicad.api.task_store import TaskStore, TaskStoreWriter
+from easyeda2kicad.api.task_stream import TaskUpdateStream
+from easyeda2kicad.kicad.parameters_kicad_symbol import KicadVersion
+from easyeda2kicad.service import (
+    ConversionRequest,
+    ConversionResult,
+    ConversionStage,
+)
+
+ConversionRunner = Callable[[ConversionRequest, Optional[Callable]], ConversionResult]
+
+
+class TaskStatus(str):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+_TASK_STATUSES = {
+    TaskStatus.QUEUED,
+    TaskStatus.RUNNING,
+    TaskStatus.COMPLETED,
+    TaskStatus.FAILED,
+}
+
+
+@dataclass
+class TaskRecord:
+    id: str
+    request: ConversionRequest
+    status: str = TaskStatus.QUEUED
+    progress: int = 0
+    message: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    result: Optional[ConversionResult] = None
+    log: Deque[dict[str, Any]] = field(
+        default_factory=lambda: deque(maxlen=DEFAULT_TASK_LOG_LIMIT)
+    )
+    batch_id: Optional[str] = None
+    priority: str = PRIORITY_INTERACTIVE
+    client_id: Optional[str] = None
+    # Identical request already in flight whose outcome this task mirrors
+    coalesced_with: Optional[str] = None
+    followers: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TaskBatch:
+    id: str
+    task_ids: List[str]
+    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    finished_at: Optional[datetime] = None
+    # Final status of the finished tasks, kept after they are evicted
+    outcomes: Dict[str, str] = field(default_factory=dict)
+    # Tasks of the batch still held in TaskManager.tasks
+    retained: int = 0
+
+
+class ConversionResultModel(BaseModel):
+    symbol_path: Optional[str] = None
+    footprint_path: Optional[str] = None
+    model_paths: Dict[str, str] = Field(default_factory=dict)
+    messages: List[str] = Field(default_factory=list)
+
+
+class TaskSummary(BaseModel):
+    id: str
+    status: str
+    progress: int
+    message: Optional[str]
+    queue_position: Optional[int]
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    result: Optional[ConversionResultModel]
+    batch_id: Optional[str] = None
+    coalesced_with: Optional[str] = None
+    priority: str = PRIORITY_INTERACTIVE
+    queue_wait_seconds: Optional[float] = None
+    run_seconds: Optional[float] = None
+
+
+class TaskDetail(TaskSummary):
+    log: List[dict[str, Any]]
+
+
+class TaskBatchSummary(BaseModel):
+    id: str
+    status: str
+    progress: int
+    total: int
+    queued: int
+    running: int
+    completed: int
+    failed: int
+    created_at: datetime
+    finished_at: Optional[datetime]
+    task_ids: List[str]
+
+
+class TaskBatchDetail(TaskBatchSummary):
+    tasks: List[TaskSummary]
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _require_datetime(value: Optional[str]) -> datetime:
+    if not value:
+        raise ValueError("Missing timestamp")
+    return datetime.fromisoformat(value)
+
+
+def _record_to_row(record: TaskRecord) -> dict[str, Any]:
+    request = asdict(record.request)
+    request["kicad_version"] = record.request.kicad_version.name
+    return {
+        "id": record.id,
+        "request": request,
+        "status": record.status,
+        "progress": record.progress,
+        "message": record.message,
+        "error": record.error,
+        "created_at": _isoformat(record.created_at),
+        "started_at": _isoformat(record.started_at),
+        "finished_at": _isoformat(record.finished_at),
+        "updated_at": _isoformat(record.updated_at),
+        "result": asdict(record.result) if record.result else None,
+        "log": list(record.log),
+        "batch_id": record.batch_id,
+        "coalesced_with": record.coalesced_with,
+        "priority": record.priority,
+        "client_id": record.client_id,
+    }
+
+
+def _record_from_row(row: dict[str, Any], log_limit: int) -> TaskRecord:
+    request = dict(row["request"])
+    request["kicad_version"] = KicadVersion[request["kicad_version"]]
+    return TaskRecord(
+        id=row["id"],
+        request=ConversionRequest(**request),
+        status=row["status"],
+        progress=row["progress"],
+        message=row["message"],
+        error=row["error"],
+        created_at=_require_datetime(row["created_at"]),
+        started_at=_parse_datetime(row["started_at"]),
+        finished_at=_parse_datetime(row["finished_at"]),
+        updated_at=_require_datetime(row["updated_at"]),
+        result=ConversionResult(**row["result"]) if row["result"] else None,
+        log=deque(row["log"], maxlen=log_limit),
+        batch_id=row["batch_id"],
+        coalesced_with=row["coalesced_with"],
+        priority=row.get("priority", PRIORITY_INTERACTIVE),
+        client_id=row.get("client_id"),
+    )
+
+
+def _seconds_since(moment: datetime, now: datetime) -> float:
+    return max(0.0, (now - moment).total_seconds())
+
+
+def _elapsed_seconds(
+    start: Optional[datetime], end: Optional[datetime]
+) -> Optional[float]:
+    if start is None:
+        return None
+    return round(((end or datetime.now(UTC)) - start).total_seconds(), 3)
+
+
+def _batch_to_row(batch: TaskBatch) -> dict[str, Any]:
+    return {
+        "id": batch.id,
+        "task_ids": batch.task_ids,
+        "created_at": _isoformat(batch.created_at),
+        "finished_at": _isoformat(batch.finished_at),
+        "outcomes": batch.outcomes,
+    }
+
+
+def _batch_from_row(row: dict[str, Any]) -> TaskBatch:
+    return TaskBatch(
+        id=row["id"],
+        task_ids=list(row["task_ids"]),
+        created_at=_require_datetime(row["created_at"]),
+        finished_at=_parse_datetime(row["finished_at"]),
+        outcomes=dict(row["outcomes"]),
+    )
+
+
+def _copy_state(source: TaskRecord, record: TaskRecord) -> None:
+    record.status = source.status
+    record.progress = source.progress
+    record.message = source.message
+    record.error = source.error
+    record.started_at = source.started_at
+    record.finished_at = source.finished_at
+    record.result = source.result
+
+
+def _log_entry(record: TaskRecord, stage: ConversionStage) -> dict[str, Any]:
+    return {
+        "timestamp": record.updated_at.isoformat(),
+        "stage": stage.name,
+        "message": record.message,
+        "progress": record.progress,
+    }
+
+
+class TaskManager:
+    """
+    Conversion tasks of the API server, from queueing to eviction.
+
+    Up to `workers` queued conversions run at the same time, each on its
+    own thread; the TaskScheduler picks which one a free worker runs next.
+    A request identical to one already in flight does not run again: it
+    follows that task and mirrors its state.
+
+    Finished tasks are dropped according to `retention`; queued and
+    running tasks are always kept. Every change is published through
+    `stream` and, with a `store`, persisted by a TaskStoreWriter; the
+    tasks that were queued or running when the server stopped are queued
+    again by `start`.
+
+    All state is guarded by `lock`; the methods documented as "called with
+    the lock held" expect the caller to hold it.
+    """
+
+    def __init__(
+        self,
+        conversion_runner: ConversionRunner,
+        workers: int,
+        retention: TaskRetention,
+        store: Optional[TaskStore] = None,
+    ) -> None:
+        self.conversion_runner = conversion_runner
+        self.workers = workers
+        self.retention = retention
+        # One token per scheduled task; the scheduler picks which task it runs
+        self.queue: asyncio.Queue[None] = asyncio.Queue()
+        self.scheduler = TaskScheduler()
+        self.tasks: Dict[str, TaskRecord] = {}
+        self.batches: Dict[str, TaskBatch] = {}
+        # Coalescing key of each queued or running request -> its task id
+        self.in_flight: Dict[Tuple, str] = {}
+        self.journal = TaskJournal(retention)
+        self.lock = asyncio.Lock()
+        self.worker_tasks: List[asyncio.Task[Any]] = []
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.store = store
+        self.store_writer = (
+            TaskStoreWriter(store, self.collect_rows) if store is not None else None
+        )
+        self.restored = False
+        self.stream = TaskUpdateStream(
+            self.collect_summaries, collect_batches=self.collect_batch_summaries
+        )
+
+    # ------------------------------------------------------------ lifecycle
+    async def start(self) -> None:
+        await self.restore()
+        if self.store_writer is not None:
+            self.store_writer.start()
+        self.worker_tasks = [task for task in self.worker_tasks if not task.done()]
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="easyeda-conversion"
+            )
+        while len(self.worker_tasks) < self.workers:
+            self.worker_tasks.append(asyncio.create_task(self._work()))
+        self.stream.start()
+
+    async def stop(self) -> None:
+        worker_tasks = self.worker_tasks
+        if worker_tasks:
+            await self.queue.join()
+            for worker_task in worker_tasks:
+                worker_task.cancel()
+            for worker_task in worker_tasks:
+                with suppress(asyncio.CancelledError):
+                    await worker_task
+            self.worker_tasks = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        await self.stream.stop()
+        if self.store_writer is not None:
+            await self.store_writer.stop()
+        if self.store is not None:
+            # Everything pending was written by the writer above
+            self.store.close()
+
+    async def restore(self) -> None:
+        """Reload the persisted tasks once and queue again the unfinished ones."""
+        if self.store is None or self.restored:
+            return
+        self.restored = True
+        task_rows, batch_rows = self.store.load()
+        resumed: List[TaskRecord] = []
+        finished: List[TaskRecord] = []
+        now = datetime.now(UTC)
+        async with self.lock:
+            for row in batch_rows:
+                try:
+                    batch = _batch_from_row(row)
+                except (KeyError, TypeError, ValueError) as exc:
+                    logging.warning("Dropping stored batch %s: %s", row.get("id"), exc)
+                    self._drop_stored_row(row, batch=True)
+                    continue
+                self.batches[batch.id] = batch
+            for row in task_rows:
+                try:
+                    record = _record_from_row(row, self.retention.log_limit)
+                except (KeyError, TypeError, ValueError) as exc:
+                    logging.warning("Dropping stored task %s: %s", row.get("id"), exc)
+                    self._drop_stored_row(row)
+                    continue
+                self.tasks[record.id] = record
+                self.journal.add(record.id, age=_seconds_since(record.created_at, now))
+                if record.status in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+                    finished.append(record)
+                else:
+                    resumed.append(record)
+            # Retention keeps counting from when the tasks actually finished
+            finished.sort(key=lambda record: record.finished_at or record.created_at)
+            for record in finished:
+                self.journal.finish(
+                    record.id,
+                    completed=record.status == TaskStatus.COMPLETED,
+                    age=_seconds_since(record.finished_at or record.created_at, now),
+                )
+            self._release_empty_batches()
+            for record in resumed:
+                self._resume(record)
+            evicted = self.evict_expired()
+        if resumed:
+            logging.info("Resumed %d unfinished task(s)", len(resumed))
+            self.broadcast_queue_changes()
+        # Finished tasks are already stored as they are, only stream them
+        for record in finished:
+            self.stream.mark(record.id)
+        for record in resumed:
+            self.broadcast(record.id)
+        self.broadcast_evictions(evicted)
+
+    def _release_empty_batches(self) -> None:
+        # Called with the lock held
+        for batch in list(self.batches.values()):
+            batch.retained = sum(1 for task_id in batch.task_ids if task_id in self.tasks)
+            if not batch.retained:
+                del self.batches[batch.id]
+                self.persist_batch(batch.id)
+
+    def _resume(self, record: TaskRecord) -> None:
+        # Called with the lock held for a task left unfinished by a restart
+        record.status = TaskStatus.QUEUED
+        record.progress = 0
+        record.message = "Resumed after restart."
+        record.started_at = None
+        record.coalesced_with = None
+        record.updated_at = datetime.now(UTC)
+        record.log.append(_log_entry(record, ConversionStage.QUEUED))
+        self._queue_record(record)
+
+    # ------------------------------------------------------------ queueing
+    def new_record(
+        self,
+        request: ConversionRequest,
+        priority: str,
+        client_id: Optional[str],
+        batch_id: Optional[str] = None,
+    ) -> TaskRecord:
+        return TaskRecord(
+            id=str(uuid.uuid4()),
+            request=request,
+            log=deque(maxlen=self.retention.log_limit),
+            batch_id=batch_id,
+            priority=priority,
+            client_id=client_id,
+        )
+
+    async def enqueue(
+        self, records: List[TaskRecord], batch: Optional[TaskBatch] = None
+    ) -> None:
+        # One lock acquisition and one queue broadcast however many records
+        async with self.lock:
+            if batch is not None:
+                batch.retained = len(records)
+                self.batches[batch.id] = batch
+                self.persist_batch(batch.id)
+            for record in records:
+                self.tasks[record.id] = record
+                self.journal.add(record.id)
+                self._queue_record(record)
+            evicted = self.evict_expired()
+
+        self.broadcast_queue_changes()
+        for record in records:
+            self.broadcast(record.id)
+        self.broadcast_evictions(evicted)
+
+    def _queue_record(self, record: TaskRecord) -> None:
+        # Called with the lock held: run `record`, or let it follow an
+        # identical request already in flight
+        key = record.request.coalescing_key()
+        leader = self.tasks.get(self.in_flight.get(key, ""))
+        if leader is not None:
+            self._attach_follower(leader, record)
+            return
+        self.in_flight[key] = record.id
+        self.scheduler.push(record.id, record.priority, record.client_id)
+        self.queue.put_nowait(None)
+
+    def _attach_follower(self, leader: TaskRecord, record: TaskRecord) -> None:
+        # Called with the lock held: `record` shares the run of `leader`
+        record.coalesced_with = leader.id
+        leader.followers.append(record.id)
+        record.log.append(
+            {
+                "timestamp": record.created_at.isoformat(),
+                "stage": ConversionStage.QUEUED.name,
+                "message": f"Identical request in flight, following task {leader.id}.",
+                "progress": leader.progress,
+            }
+        )
+        _copy_state(leader, record)
+
+    def _mirror_followers(
+        self, record: TaskRecord, entry: Optional[dict[str, Any]] = None
+    ) -> List[str]:
+        # Called with the lock held after `record` changed; returns the
+        # followers to broadcast
+        followers = []
+        for follower_id in record.followers:
+            follower = self.tasks.get(follower_id)
+            if follower is None:
+                continue
+            _copy_state(record, follower)
+            follower.updated_at = record.updated_at
+            if entry is not None:
+                follower.log.append(entry)
+            self.journal.touch(follower_id)
+            followers.append(follower_id)
+        return followers
+
+    def _finish(self, record: TaskRecord, entry: dict[str, Any]) -> List[str]:
+        # Called with the lock held once `record` reached its final status;
+        # returns the tasks to broadcast
+        record.log.append(entry)
+        key = record.request.coalescing_key()
+        if self.in_flight.get(key) == record.id:
+            del self.in_flight[key]
+        completed = record.status == TaskStatus.COMPLETED
+        self.journal.touch(record.id)
+        changed = [record.id, *self._mirror_followers(record, entry)]
+        for task_id in changed:
+            self.journal.finish(task_id, completed=completed)
+            self._record_outcome(self.tasks[task_id])
+        return changed
+
+    def _record_outcome(self, record: TaskRecord) -> None:
+        # Called with the lock held once the record reached its final status
+        batch = self.batches.get(record.batch_id) if record.batch_id else None
+        if batch is None:
+            return
+        batch.outcomes[record.id] = record.status
+        self.persist_batch(batch.id)
+        if len(batch.outcomes) == len(batch.task_ids):
+            batch.finished_at = record.finished_at
+
+    def evict_expired(self) -> List[str]:
+        # Called with the lock held; the caller broadcasts the removals
+        evicted = self.journal.expired()
+        for task_id in evicted:
+            record = self.tasks.pop(task_id, None)
+            batch = self.batches.get(record.batch_id) if record else None
+            if batch is not None:
+                batch.retained -= 1
+                if batch.retained <= 0:
+                    del self.batches[batch.id]
+                    self.persist_batch(batch.id)
+        return evicted
+
+    # ------------------------------------------------------------ queries
+    async def get(self, task_id: str) -> Optional[TaskRecord]:
+        async with self.lock:
+            evicted = self.evict_expired()
+            record = self.tasks.get(task_id)
+        self.broadcast_evictions(evicted)
+        return record
+
+    async def get_batch(self, batch_id: str) -> Optional[TaskBatchSummary]:
+        async with self.lock:
+            evicted = self.evict_expired()
+            batch = self.batches.get(batch_id)
+            summary = self.batch_summary(batch) if batch else None
+        self.broadcast_evictions(evicted)
+        return summary
+
+    async def changed_since(
+        self, statuses: Set[str], cursor: int, limit: Optional[int]
+    ) -> Tuple[List[TaskRecord], int]:
+        """
+        Tasks changed after `cursor` (with one of `statuses`, if any), oldest
+        first and at most `limit`, and the cursor to continue from.
+        """
+        records: List[TaskRecord] = []
+        async with self.lock:
+            evicted = self.evict_expired()
+            next_cursor = self.journal.revision
+            for revision, task_id in self.journal.changed_since(cursor):
+                record = self.tasks[task_id]
+                if statuses and record.status not in statuses:
+                    continue
+                records.append(record)
+                if limit is not None and len(records) >= limit:
+                    next_cursor = revision
+                    break
+        self.broadcast_evictions(evicted)
+        return records, next_cursor
+
+    def summary(self, record: TaskRecord) -> TaskSummary:
+        return TaskSummary(
+            id=record.id,
+            status=record.status,
+            progress=record.progress,
+            message=record.message,
+            queue_position=self.scheduler.position(record.coalesced_with or record.id),
+            error=record.error,
+            created_at=record.created_at,
+            started_at=record.started_at,
+            finished_at=record.finished_at,
+            result=ConversionResultModel(
+                symbol_path=record.result.symbol_path,
+                footprint_path=record.result.footprint_path,
+                model_paths=record.result.model_paths,
+                messages=record.result.messages,
+            )
+            if record.result
+            else None,
+            batch_id=record.batch_id,
+            coalesced_with=record.coalesced_with,
+            priority=record.priority,
+            queue_wait_seconds=_elapsed_seconds(
+                record.created_at, record.started_at or record.finished_at
+            ),
+            run_seconds=_elapsed_seconds(record.started_at, record.finished_at),
+        )
+
+    def detail(self, record: TaskRecord) -> TaskDetail:
+        summary = self.summary(record)
+        return TaskDetail(**summary.model_dump(), log=list(record.log))
+
+    def batch_summary(self, batch: TaskBatch) -> TaskBatchSummary:
+        # Called with the lock held
+        counts = {status_: 0 for status_ in _TASK_STATUSES}
+        progress = 0
+        for task_id in batch.task_ids:
+            record = self.tasks.get(task_id)
+            if record is not None and task_id not in batch.outcomes:
+                counts[record.status] += 1
+                progress += record.progress
+            else:
+                counts[batch.outcomes.get(task_id, TaskStatus.FAILED)] += 1
+                progress += 100
+        total = len(batch.task_ids)
+        if counts[TaskStatus.QUEUED] == total:
+            batch_status = TaskStatus.QUEUED
+        elif batch.finished_at is None:
+            batch_status = TaskStatus.RUNNING
+        elif counts[TaskStatus.FAILED]:
+            batch_status = TaskStatus.FAILED
+        else:
+            batch_status = TaskStatus.COMPLETED
+        return TaskBatchSummary(
+            id=batch.id,
+            status=batch_status,
+            progress=progress // total if total else 100,
+            total=total,
+            queued=counts[TaskStatus.QUEUED],
+            running=counts[TaskStatus.RUNNING],
+            completed=counts[TaskStatus.COMPLETED],
+            failed=counts[TaskStatus.FAILED],
+            created_at=batch.created_at,
+            finished_at=batch.finished_at,
+            task_ids=batch.task_ids,
+        )
+
+    # ------------------------------------------------------------ publishing
+    async def collect_summaries(
+        self, task_ids: Set[str], queue_changed: bool
+    ) -> Dict[str, Optional[dict]]:
+        async with self.lock:
+            if queue_changed:
+                task_ids = task_ids | set(self.scheduler)
+            summaries: Dict[str, Optional[dict]] = {}
+            for task_id in task_ids:
+                record = self.tasks.get(task_id)
+                summaries[task_id] = (
+                    self.summary(record).model_dump(mode="json") if record else None
+                )
+        return summaries
+
+    async def collect_batch_summaries(
+        self, batch_ids: Set[str]
+    ) -> Dict[str, Optional[dict]]:
+        async with self.lock:
+            summaries: Dict[str, Optional[dict]] = {}
+            for batch_id in batch_ids:
+                batch = self.batches.get(batch_id)
+                summaries[batch_id] = (
+                    self.batch_summary(batch).model_dump(mode="json") if batch else None
+                )
+        return summaries
+
+    def _drop_stored_row(self, row: dict[str, Any], batch: bool = False) -> None:
+        # Unknown ids are written as deletions by the store writer
+        row_id = row.get("id")
+        if self.store_writer is None or not isinstance(row_id, str):
+            return
+        if batch:
+            self.store_writer.mark_batch(row_id)
+        else:
+            self.store_writer.mark_task(row_id)
+
+    async def collect_rows(
+        self, task_ids: Set[str], batch_ids: Set[str]
+    ) -> Tuple[Dict[str, Optional[dict]], Dict[str, Optional[dict]]]:
+        async with self.lock:
+            task_rows: Dict[str, Optional[dict]] = {}
+            for task_id in task_ids:
+                record = self.tasks.get(task_id)
+                task_rows[task_id] = _record_to_row(record) if record else None
+            batch_rows: Dict[str, Optional[dict]] = {}
+            for batch_id in batch_ids:
+                batch = self.batches.get(batch_id)
+                batch_rows[batch_id] = _batch_to_row(batch) if batch else None
+        return task_rows, batch_rows
+
+    def broadcast(self, task_id: str) -> None:
+        self.stream.mark(task_id)
+        if self.store_writer is not None:
+            self.store_writer.mark_task(task_id)
+
+    def broadcast_evictions(self, evicted: List[str]) -> None:
+        for task_id in evicted:
+            self.broadcast(task_id)
+
+    def broadcast_queue_changes(self) -> None:
+        self.stream.mark_queue()
+
+    def persist_batch(self, batch_id: str) -> None:
+        if self.store_writer is not None:
+            self.store_writer.mark_batch(batch_id)
+
+    # ------------------------------------------------------------ workers
+    async def update_progress(
+        self, task_id: str, stage: ConversionStage, percent: int, message: Optional[str]
+    ) -> None:
+        async with self.lock:
+            record = self.tasks.get(task_id)
+            if not record:
+                return
+            record.progress = max(0, min(100, percent))
+            record.message = message
+            record.updated_at = datetime.now(UTC)
+            entry = _log_entry(record, stage)
+            record.log.append(entry)
+            if stage == ConversionStage.COMPLETED:
+                record.status = TaskStatus.COMPLETED
+                record.finished_at = datetime.now(UTC)
+            elif stage == ConversionStage.FAILED:
+                record.status = TaskStatus.FAILED
+                record.finished_at = datetime.now(UTC)
+            else:
+                record.status = TaskStatus.RUNNING
+            self.journal.touch(task_id)
+            followers = self._mirror_followers(record, entry)
+        self.broadcast(task_id)
+        for follower_id in followers:
+            self.broadcast(follower_id)
+
+    async def _work(self) -> None:
+        while True:
+            await self.queue.get()
+            task = await self._start_next()
+            try:
+                result = await self._run(task)
+            except Exception as exc:  # pragma: no cover - defensive catch
+                changed, evicted = await self._fail(task, exc)
+            else:
+                changed, evicted = await self._complete(task, result)
+            for task_id in changed:
+                self.broadcast(task_id)
+            self.broadcast_evictions(evicted)
+
+            self.queue.task_done()
+
+    async def _start_next(self) -> TaskRecord:
+        async with self.lock:
+            task = self.tasks[self.scheduler.pop()]
+            task.status = TaskStatus.RUNNING
+            task.started_at = datetime.now(UTC)
+            task.updated_at = task.started_at
+            self.journal.touch(task.id)
+            followers = self._mirror_followers(task)
+        self.broadcast(task.id)
+        for follower_id in followers:
+            self.broadcast(follower_id)
+        self.broadcast_queue_changes()
+        return task
+
+    async def _run(self, task: TaskRecord) -> ConversionResult:
+        loop = asyncio.get_running_loop()
+
+        def progress_callback(
+            stage: ConversionStage, percent: int, message: Optional[str]
+        ) -> None:
+            asyncio.run_coroutine_threadsafe(
+                self.update_progress(task.id, stage, percent, message), loop
+            )
+
+        return await loop.run_in_executor(
+            self.executor, self.conversion_runner, task.request, progress_callback
+        )
+
+    async def _fail(
+        self, task: TaskRecord, exc: Exception
+    ) -> Tuple[List[str], List[str]]:
+        async with self.lock:
+            task.status = TaskStatus.FAILED
+            task.error = str(exc)
+            task.message = str(exc)
+            task.progress = task.progress or 0
+            task.finished_at = datetime.now(UTC)
+            task.updated_at = task.finished_at
+            changed = self._finish(task, _log_entry(task, ConversionStage.FAILED))
+            return changed, self.evict_expired()
+
+    async def _complete(
+        self, task: TaskRecord, result: ConversionResult
+    ) -> Tuple[List[str], List[str]]:
+        async with self.lock:
+            task.status = TaskStatus.COMPLETED
+            task.result = result
+            task.progress = max(task.progress, 100)
+            task.message = "Conversion finished."
+            task.finished_at = datetime.now(UTC)
+            task.updated_at = task.finished_at
+            changed = self._finish(task, _log_entry(task, ConversionStage.COMPLETED))
+            return changed, self.evict_expired()
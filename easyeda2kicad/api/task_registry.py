@@ -0,0 +1,170 @@
+"""Retention policy and change journal for the tasks kept by the API server."""
+
+from __future__ import annotations
+
+import heapq
+import os
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_MAX_TASKS = 1000
+DEFAULT_MAX_TASK_AGE = 24 * 3600.0
+DEFAULT_COMPLETED_TASK_TTL = 3600.0
+DEFAULT_TASK_LOG_LIMIT = 200
+
+_DISABLED = {"none", "off", "unlimited"}
+
+
+def _env_limit(name: str, default, cast):
+    value = os.getenv(name, "").strip().lower()
+    if not value:
+        return default
+    if value in _DISABLED:
+        return None
+    try:
+        return max(0, cast(value))
+    except ValueError:
+        return default
+
+
+@dataclass
+class TaskRetention:
+    """
+    How long finished tasks are kept; None disables a limit.
+
+    - max_tasks: tasks kept at most; the oldest finished ones go first,
+      queued and running tasks are never evicted
+    - max_age: seconds after creation a finished task is dropped
+    - completed_ttl: seconds a successfully completed task is kept after
+      finishing (failed tasks stay until max_age so they can be inspected)
+    - log_limit: progress entries kept per task, older ones are dropped
+    """
+
+    max_tasks: Optional[int] = DEFAULT_MAX_TASKS
+    max_age: Optional[float] = DEFAULT_MAX_TASK_AGE
+    completed_ttl: Optional[float] = DEFAULT_COMPLETED_TASK_TTL
+    log_limit: int = DEFAULT_TASK_LOG_LIMIT
+
+    @classmethod
+    def from_env(cls) -> "TaskRetention":
+        """Defaults overridden by EASYEDA2KICAD_MAX_TASKS, _TASK_MAX_AGE,
+        _COMPLETED_TASK_TTL and _TASK_LOG_LIMIT ("none" disables a limit)."""
+        log_limit = _env_limit(
+            "EASYEDA2KICAD_TASK_LOG_LIMIT", DEFAULT_TASK_LOG_LIMIT, int
+        )
+        return cls(
+            max_tasks=_env_limit("EASYEDA2KICAD_MAX_TASKS", DEFAULT_MAX_TASKS, int),
+            max_age=_env_limit(
+                "EASYEDA2KICAD_TASK_MAX_AGE", DEFAULT_MAX_TASK_AGE, float
+            ),
+            completed_ttl=_env_limit(
+                "EASYEDA2KICAD_COMPLETED_TASK_TTL", DEFAULT_COMPLETED_TASK_TTL, float
+            ),
+            log_limit=DEFAULT_TASK_LOG_LIMIT if log_limit is None else log_limit,
+        )
+
+
+class TaskJournal:
+    """
+    Orders task ids by their last change and picks finished tasks to evict.
+
+    Every `touch` gives the task a new, increasing revision. Revisions are
+    what /tasks cursors refer to: `changed_since(cursor)` bisects to the
+    first later revision, so a polling client only pays for the tasks that
+    changed since its previous call. Superseded journal entries are skipped
+    and compacted away once they outnumber the live ones.
+
+    Not thread-safe; the server calls it under its task lock.
+    """
+
+    def __init__(
+        self,
+        retention: TaskRetention,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.retention = retention
+        self.clock = clock
+        self.revision = 0
+        self._revisions: Dict[str, int] = {}
+        self._created: Dict[str, float] = {}
+        self._entry_revisions: List[int] = []
+        self._entry_ids: List[str] = []
+        # Finished tasks in the order they finished, oldest first
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._deadlines: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._revisions)
+
+    def add(self, task_id: str, age: float = 0.0) -> int:
+        """Register a task created `age` seconds ago (e.g. one restored on start)."""
+        self._created[task_id] = self.clock() - age
+        return self.touch(task_id)
+
+    def touch(self, task_id: str) -> int:
+        self.revision += 1
+        self._revisions[task_id] = self.revision
+        self._entry_revisions.append(self.revision)
+        self._entry_ids.append(task_id)
+        if len(self._entry_ids) > 2 * len(self._revisions) + 64:
+            self._compact()
+        return self.revision
+
+    def finish(self, task_id: str, completed: bool, age: float = 0.0) -> None:
+        """Start the retention clock of a task that finished `age` seconds ago."""
+        if task_id not in self._revisions or task_id in self._finished:
+            return
+        self._finished[task_id] = None
+        retention = self.retention
+        deadlines = []
+        if retention.max_age is not None:
+            deadlines.append(self._created[task_id] + retention.max_age)
+        if completed and retention.completed_ttl is not None:
+            deadlines.append(self.clock() - age + retention.completed_ttl)
+        if deadlines:
+            heapq.heappush(self._deadlines, (min(deadlines), task_id))
+
+    def discard(self, task_id: str) -> None:
+        self._revisions.pop(task_id, None)
+        self._created.pop(task_id, None)
+        self._finished.pop(task_id, None)
+
+    def expired(self) -> List[str]:
+        """Forget and return the finished tasks the retention policy drops now."""
+        evicted: List[str] = []
+        now = self.clock()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, task_id = heapq.heappop(self._deadlines)
+            if task_id in self._finished:
+                evicted.append(task_id)
+                self.discard(task_id)
+        max_tasks = self.retention.max_tasks
+        if max_tasks is not None:
+            while len(self._revisions) > max_tasks and self._finished:
+                task_id = next(iter(self._finished))
+                evicted.append(task_id)
+                self.discard(task_id)
+        if not self._revisions:
+            self._deadlines.clear()
+        return evicted
+
+    def changed_since(self, cursor: int = 0) -> Iterator[Tuple[int, str]]:
+        """Yield `(revision, task_id)` of tasks changed after `cursor`, oldest first."""
+        start = bisect_right(self._entry_revisions, cursor)
+        for index in range(start, len(self._entry_ids)):
+            task_id = self._entry_ids[index]
+            revision = self._entry_revisions[index]
+            if self._revisions.get(task_id) == revision:
+                yield revision, task_id
+
+    def _compact(self) -> None:
+        live = [
+            (revision, task_id)
+            for revision, task_id in zip(self._entry_revisions, self._entry_ids)
+            if self._revisions.get(task_id) == revision
+        ]
+        self._entry_revisions = [revision for revision, _ in live]
+        self._entry_ids = [task_id for _, task_id in live]
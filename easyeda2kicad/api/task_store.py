@@ -0,0 +1,206 @@
+"""Optional SQLite persistence of API tasks, so queued work survives restarts."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+DEFAULT_WRITE_INTERVAL = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+# Rows to write: id -> JSON-compatible dict, or None to delete the row
+Rows = Dict[str, Optional[dict]]
+# Render the current rows of the given task and batch ids
+RowCollector = Callable[[Set[str], Set[str]], Awaitable[Tuple[Rows, Rows]]]
+
+
+def resolve_task_store_path(path: Optional[str] = None) -> Optional[str]:
+    """Task database: `path` or EASYEDA2KICAD_TASK_STORE; None keeps tasks in memory."""
+    if path is None:
+        path = os.getenv("EASYEDA2KICAD_TASK_STORE", "").strip() or None
+    return path
+
+
+class TaskStore:
+    """
+    Tasks and batches kept as JSON documents in a SQLite database.
+
+    The database runs in WAL mode with synchronous=NORMAL: a commit
+    appends to the write-ahead log without waiting for an fsync, and a
+    crash loses at most the last commits but never corrupts the file.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            str(self.path), check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+    def load(self) -> Tuple[List[dict], List[dict]]:
+        """All stored tasks in creation order, and all batches."""
+        with self._lock:
+            tasks = self._connection.execute(
+                "SELECT data FROM tasks ORDER BY created_at, rowid"
+            ).fetchall()
+            batches = self._connection.execute("SELECT data FROM batches").fetchall()
+        return (
+            [json.loads(data) for (data,) in tasks],
+            [json.loads(data) for (data,) in batches],
+        )
+
+    def write(self, tasks: Rows, batches: Optional[Rows] = None) -> None:
+        """Apply every change in a single transaction."""
+        batches = batches or {}
+        upserts = [
+            (task_id, row["created_at"], row["status"], json.dumps(row))
+            for task_id, row in tasks.items()
+            if row is not None
+        ]
+        deletes = [(task_id,) for task_id, row in tasks.items() if row is None]
+        batch_upserts = [
+            (batch_id, json.dumps(row))
+            for batch_id, row in batches.items()
+            if row is not None
+        ]
+        batch_deletes = [(batch_id,) for batch_id, row in batches.items() if row is None]
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN")
+            try:
+                connection.executemany(
+                    "INSERT INTO tasks (id, created_at, status, data)"
+                    " VALUES (?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET"
+                    " status = excluded.status, data = excluded.data",
+                    upserts,
+                )
+                connection.executemany("DELETE FROM tasks WHERE id = ?", deletes)
+                connection.executemany(
+                    "INSERT INTO batches (id, data) VALUES (?, ?)"
+                    " ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+                    batch_upserts,
+                )
+                connection.executemany("DELETE FROM batches WHERE id = ?", batch_deletes)
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class TaskStoreWriter:
+    """
+    Writes changed tasks to a TaskStore at most once per `interval`.
+
+    Like TaskUpdateStream, producers only mark task or batch ids as dirty;
+    the writer renders their current rows through `collect` and writes
+    them in one transaction on its own thread, so progress events never
+    wait for the disk. On stop everything still pending is written.
+    """
+
+    def __init__(
+        self,
+        store: TaskStore,
+        collect: RowCollector,
+        interval: float = DEFAULT_WRITE_INTERVAL,
+    ) -> None:
+        self.store = store
+        self.collect = collect
+        self.interval = interval
+        self._tasks: Set[str] = set()
+        self._batches: Set[str] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task[None]] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._flush_lock = asyncio.Lock()
+
+    def mark_task(self, task_id: str) -> None:
+        self._tasks.add(task_id)
+        self._wake()
+
+    def mark_batch(self, batch_id: str) -> None:
+        self._batches.add(batch_id)
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="easyeda-task-store"
+            )
+        self._wakeup = asyncio.Event()
+        if self._tasks or self._batches:
+            self._wakeup.set()
+        self._task = asyncio.create_task(self._run(self._wakeup))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _run(self, wakeup: asyncio.Event) -> None:
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("Unable to persist tasks")
+            await asyncio.sleep(self.interval)
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            tasks, self._tasks = self._tasks, set()
+            batches, self._batches = self._batches, set()
+            if not tasks and not batches:
+                return
+            try:
+                task_rows, batch_rows = await self.collect(tasks, batches)
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(
+                    self._executor, self.store.write, task_rows, batch_rows
+                )
+            except BaseException:
+                # Keep the ids so the next flush retries them
+                self._tasks |= tasks
+                self._batches |= batches
+                raise
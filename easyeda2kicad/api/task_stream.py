@@ -0,0 +1,311 @@
+"""Coalesced task updates pushed to WebSocket subscribers."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from fastapi import WebSocket
+
+DEFAULT_FLUSH_INTERVAL = 0.1
+DEFAULT_OUTBOX_SIZE = 64
+
+# Render the current summaries of `task_ids` (plus every queued task when
+# the queue changed); None marks a task that no longer exists
+SummaryCollector = Callable[[Set[str], bool], Awaitable[Dict[str, Optional[dict]]]]
+# Render the aggregate summaries of the given batches; None for unknown ones
+BatchCollector = Callable[[Set[str]], Awaitable[Dict[str, Optional[dict]]]]
+
+
+class _Subscriber:
+    """One WebSocket with its own outbox, so a slow client never blocks others."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        task_id: Optional[str],
+        batch_id: Optional[str] = None,
+    ) -> None:
+        self.websocket = websocket
+        self.task_id = task_id
+        self.batch_id = batch_id
+        self.outbox: asyncio.Queue[Optional[str]] = asyncio.Queue(DEFAULT_OUTBOX_SIZE)
+        self.needs_snapshot = False
+        self.sender: Optional[asyncio.Task[None]] = None
+
+    def offer(self, text: str) -> bool:
+        try:
+            self.outbox.put_nowait(text)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def run(self) -> None:
+        while True:
+            text = await self.outbox.get()
+            if text is None:
+                return
+            try:
+                await self.websocket.send_text(text)
+            except Exception:
+                return
+
+
+class TaskUpdateStream:
+    """
+    Pushes task changes to WebSocket clients at most once per `interval`.
+
+    Producers only `mark` tasks (or the queue) as changed, which is cheap
+    however often progress is reported. A single flush then renders every
+    changed task once, and each payload is serialized to JSON once for all
+    subscribers:
+
+    - multiplexed subscribers (task_id None) first get a "snapshot" of all
+      tasks, then "tasks" messages holding only the fields that changed
+      (plus "id") and the ids of removed tasks;
+    - per-task subscribers get the full summary of their task;
+    - batch subscribers get the aggregate summary of their batch whenever
+      one of its tasks (recognized by the "batch_id" of task summaries)
+      changed, rendered through `collect_batches`.
+
+    A subscriber whose outbox is full is sent a fresh snapshot once it
+    has caught up instead of the messages it missed.
+    """
+
+    def __init__(
+        self,
+        collect: SummaryCollector,
+        interval: float = DEFAULT_FLUSH_INTERVAL,
+        collect_batches: Optional[BatchCollector] = None,
+    ) -> None:
+        self.collect = collect
+        self.collect_batches = collect_batches
+        self.interval = interval
+        self._dirty: Set[str] = set()
+        self._queue_changed = False
+        self._state: Dict[str, dict] = {}
+        # Last message sent per subscribed batch, reused to resync
+        self._batch_messages: Dict[str, str] = {}
+        self._sequence = 0
+        self._subscribers: List[_Subscriber] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task[None]] = None
+        self._flush_lock = asyncio.Lock()
+
+    # ------------------------------------------------------------ producers
+    def mark(self, task_id: str) -> None:
+        self._dirty.add(task_id)
+        self._wake()
+
+    def mark_queue(self) -> None:
+        self._queue_changed = True
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # ------------------------------------------------------------ lifecycle
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        if self._dirty or self._queue_changed:
+            self._wakeup.set()
+        self._task = asyncio.create_task(self._run(self._wakeup))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        for subscriber in list(self._subscribers):
+            await self.unsubscribe(subscriber.websocket)
+
+    async def _run(self, wakeup: asyncio.Event) -> None:
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("Unable to publish task updates")
+            # Everything reported meanwhile goes out with the next flush
+            await asyncio.sleep(self.interval)
+
+    # ------------------------------------------------------------ subscribers
+    async def subscribe(
+        self,
+        websocket: WebSocket,
+        task_id: Optional[str] = None,
+        batch_id: Optional[str] = None,
+    ) -> None:
+        self.start()
+        subscriber = _Subscriber(websocket, task_id, batch_id)
+        async with self._flush_lock:
+            # Bring the shared state up to date so the snapshot matches the diffs
+            await self._flush()
+            if batch_id is not None:
+                await self._render_batches({batch_id})
+                text = self._batch_messages.get(batch_id)
+                if text is not None:
+                    subscriber.offer(text)
+            elif task_id is None:
+                subscriber.offer(self._snapshot())
+            else:
+                summary = self._state.get(task_id)
+                if summary is not None:
+                    subscriber.offer(json.dumps(summary))
+            subscriber.sender = asyncio.create_task(subscriber.run())
+            self._subscribers.append(subscriber)
+
+    async def unsubscribe(self, websocket: WebSocket) -> None:
+        for subscriber in [s for s in self._subscribers if s.websocket is websocket]:
+            self._subscribers.remove(subscriber)
+            if subscriber.batch_id is not None and not any(
+                other.batch_id == subscriber.batch_id for other in self._subscribers
+            ):
+                self._batch_messages.pop(subscriber.batch_id, None)
+            if subscriber.sender is not None:
+                subscriber.sender.cancel()
+                try:
+                    await subscriber.sender
+                except asyncio.CancelledError:
+                    pass
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def _snapshot(self) -> str:
+        return json.dumps(
+            {
+                "type": "snapshot",
+                "seq": self._sequence,
+                "tasks": list(self._state.values()),
+            }
+        )
+
+    # ------------------------------------------------------------ flushing
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        dirty, self._dirty = self._dirty, set()
+        queue_changed, self._queue_changed = self._queue_changed, False
+        if not dirty and not queue_changed:
+            self._resync()
+            return
+        summaries = await self.collect(dirty, queue_changed)
+
+        changes: List[Dict[str, Any]] = []
+        removed: List[str] = []
+        changed_ids: Set[str] = set()
+        changed_batches: Set[str] = set()
+        for task_id, summary in summaries.items():
+            previous = self._state.get(task_id)
+            if summary is None:
+                if previous is not None:
+                    del self._state[task_id]
+                    removed.append(task_id)
+                    if previous.get("batch_id"):
+                        changed_batches.add(previous["batch_id"])
+                continue
+            if previous is None:
+                diff = dict(summary)
+            else:
+                diff = {
+                    key: value
+                    for key, value in summary.items()
+                    if previous.get(key) != value
+                }
+                if not diff:
+                    continue
+                diff["id"] = task_id
+            self._state[task_id] = summary
+            changes.append(diff)
+            changed_ids.add(task_id)
+            if summary.get("batch_id"):
+                changed_batches.add(summary["batch_id"])
+
+        if not changes and not removed:
+            self._resync()
+            return
+        self._sequence += 1
+        changed_batches &= {s.batch_id for s in self._subscribers if s.batch_id}
+        if changed_batches:
+            await self._render_batches(changed_batches)
+        self._dispatch(changes, removed, changed_ids, changed_batches)
+        self._resync()
+
+    def _dispatch(
+        self,
+        changes: List[Dict[str, Any]],
+        removed: List[str],
+        changed_ids: Set[str],
+        changed_batches: Set[str],
+    ) -> None:
+        """Offer every subscriber the message of the changes it follows."""
+        message: Optional[str] = None
+        task_messages: Dict[str, str] = {}
+        for subscriber in self._subscribers:
+            if subscriber.batch_id is not None:
+                if subscriber.batch_id not in changed_batches:
+                    continue
+                text = self._batch_messages.get(subscriber.batch_id)
+                if text is None:
+                    continue
+            elif subscriber.task_id is None:
+                if subscriber.needs_snapshot:
+                    continue
+                if message is None:
+                    message = json.dumps(
+                        {
+                            "type": "tasks",
+                            "seq": self._sequence,
+                            "changes": changes,
+                            "removed": removed,
+                        }
+                    )
+                text = message
+            elif subscriber.task_id in changed_ids:
+                text = task_messages.get(subscriber.task_id)
+                if text is None:
+                    text = json.dumps(self._state[subscriber.task_id])
+                    task_messages[subscriber.task_id] = text
+            else:
+                continue
+            if not subscriber.offer(text):
+                subscriber.needs_snapshot = True
+
+    async def _render_batches(self, batch_ids: Set[str]) -> None:
+        if self.collect_batches is None:
+            return
+        for batch_id, summary in (await self.collect_batches(batch_ids)).items():
+            if summary is None:
+                self._batch_messages.pop(batch_id, None)
+            else:
+                self._batch_messages[batch_id] = json.dumps(summary)
+
+    def _resync(self) -> None:
+        for subscriber in self._subscribers:
+            if not subscriber.needs_snapshot:
+                continue
+            if subscriber.outbox.empty():
+                if subscriber.batch_id is not None:
+                    text = self._batch_messages.get(subscriber.batch_id, "null")
+                elif subscriber.task_id is None:
+                    text = self._snapshot()
+                else:
+                    text = json.dumps(self._state.get(subscriber.task_id))
+                subscriber.needs_snapshot = not subscriber.offer(text)
+            if subscriber.needs_snapshot:
+                # Try again with the next flush
+                self._wake()
@@ -0,0 +1,277 @@
+"""Background watcher reporting changes inside KiCad library directories."""
+
+from __future__ import annotations
+
+import abc
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+
+# Called with the changed paths; None in the set means "anything may have
+# changed" (e.g. the kernel event queue overflowed)
+ChangeCallback = Callable[[Set[Optional[Path]]], None]
+
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_DEBOUNCE = 0.1
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+    | _IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class LibraryWatcher(abc.ABC):
+    """
+    Watches directories from a daemon thread and reports changed paths.
+
+    Events are collected for `debounce` seconds before `on_change` is
+    called, so a save touching several files gives a single callback.
+    Subclasses provide the actual change detection.
+    """
+
+    backend = "none"
+
+    def __init__(self, on_change: ChangeCallback, debounce: float = DEFAULT_DEBOUNCE) -> None:
+        self.on_change = on_change
+        self.debounce = debounce
+        self._directories: Set[Path] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, directory: Path) -> None:
+        directory = Path(directory)
+        with self._lock:
+            if directory in self._directories:
+                return
+            self._directories.add(directory)
+        self._add_directory(directory)
+
+    def _add_directory(self, directory: Path) -> None:
+        pass
+
+    @property
+    def directories(self) -> Set[Path]:
+        with self._lock:
+            return set(self._directories)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"easyeda-watcher-{self.backend}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is None:
+            return
+        thread.join(timeout=5)
+        if thread.is_alive():
+            # Still winding down; it sees the stop flag and exits on its own
+            logging.warning("Library watcher thread did not stop in time")
+            return
+        self._thread = None
+
+    @abc.abstractmethod
+    def _run(self) -> None:
+        """Detect changes and pass them to `_dispatch` until stopped."""
+
+    def _dispatch(self, changes: Set[Optional[Path]]) -> None:
+        if not changes:
+            return
+        try:
+            self.on_change(changes)
+        except Exception:
+            logging.exception("Library watcher callback failed")
+
+
+class InotifyWatcher(LibraryWatcher):
+    """Linux inotify(7) through ctypes; raises OSError when unavailable."""
+
+    backend = "inotify"
+
+    def __init__(self, on_change: ChangeCallback, debounce: float = DEFAULT_DEBOUNCE) -> None:
+        super().__init__(on_change, debounce)
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._watches: Dict[int, Path] = {}
+
+    def _add_directory(self, directory: Path) -> None:
+        with self._lock:
+            if self._fd < 0:
+                return
+            wd = self._add_watch(self._fd, os.fsencode(str(directory)), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            logging.debug("Unable to watch %s: %s", directory, os.strerror(errno))
+            with self._lock:
+                self._directories.discard(directory)
+            return
+        with self._lock:
+            self._watches[wd] = directory
+
+    def _read_events(self) -> Set[Optional[Path]]:
+        changes: Set[Optional[Path]] = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changes
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                changes.add(None)
+                continue
+            with self._lock:
+                directory = self._watches.get(wd)
+                if mask & _IN_IGNORED:
+                    # The directory was removed; watch() may add it again
+                    self._watches.pop(wd, None)
+                    if directory is not None:
+                        self._directories.discard(directory)
+            if directory is None:
+                continue
+            changes.add(directory / os.fsdecode(name) if name else directory)
+        return changes
+
+    def _run(self) -> None:
+        # The thread owns the descriptor while it runs and closes it on exit
+        try:
+            while not self._stop.is_set():
+                readable, _, _ = select.select([self._fd], [], [], 0.5)
+                if not readable:
+                    continue
+                changes = self._read_events()
+                # Let related events of the same save arrive
+                self._stop.wait(self.debounce)
+                changes |= self._read_events()
+                self._dispatch(changes)
+        finally:
+            self._close()
+
+    def _close(self) -> None:
+        with self._lock:
+            if self._fd >= 0:
+                os.close(self._fd)
+                self._fd = -1
+
+    def stop(self) -> None:
+        super().stop()
+        if self._thread is None:
+            # Never started, or joined: no thread is left to close it
+            self._close()
+
+
+class PollingWatcher(LibraryWatcher):
+    """Portable fallback comparing directory listings every `interval` seconds."""
+
+    backend = "polling"
+
+    def __init__(
+        self,
+        on_change: ChangeCallback,
+        debounce: float = DEFAULT_DEBOUNCE,
+        interval: float = DEFAULT_POLL_INTERVAL,
+    ) -> None:
+        super().__init__(on_change, debounce)
+        self.interval = interval
+        self._snapshots: Dict[Path, Optional[Dict[str, Tuple[int, int]]]] = {}
+
+    @staticmethod
+    def _snapshot(directory: Path) -> Optional[Dict[str, Tuple[int, int]]]:
+        entries: Dict[str, Tuple[int, int]] = {}
+        try:
+            with os.scandir(directory) as iterator:
+                for entry in iterator:
+                    try:
+                        if entry.is_dir():
+                            # Sub-directories are watched on their own if needed
+                            entries[entry.name] = (0, 0)
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+        return entries
+
+    def _add_directory(self, directory: Path) -> None:
+        snapshot = self._snapshot(directory)
+        with self._lock:
+            self._snapshots[directory] = snapshot
+
+    def poll(self) -> Set[Optional[Path]]:
+        """Compare every watched directory with its last listing."""
+        changes: Set[Optional[Path]] = set()
+        for directory in self.directories:
+            snapshot = self._snapshot(directory)
+            with self._lock:
+                previous = self._snapshots.get(directory)
+                self._snapshots[directory] = snapshot
+            if snapshot == previous:
+                continue
+            if snapshot is None or previous is None:
+                changes.add(directory)
+                continue
+            for name in snapshot.keys() | previous.keys():
+                if snapshot.get(name) != previous.get(name):
+                    changes.add(directory / name)
+        return changes
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._dispatch(self.poll())
+
+
+def create_library_watcher(
+    on_change: ChangeCallback,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+) -> LibraryWatcher:
+    """Return an inotify watcher when the platform has one, else a polling one."""
+    try:
+        return InotifyWatcher(on_change)
+    except (OSError, AttributeError) as exc:
+        logging.debug("inotify unavailable (%s); polling library directories", exc)
+        return PollingWatcher(on_change, interval=poll_interval)
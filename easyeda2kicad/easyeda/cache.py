@@ -0,0 +1,364 @@
+# Global imports
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_cache_dir() -> Path:
+    """
+    Location of the easyeda2kicad cache, overridable with EASYEDA2KICAD_CACHE_DIR.
+    """
+    override = os.getenv("EASYEDA2KICAD_CACHE_DIR")
+    if override:
+        return Path(override).expanduser()
+    if os.name == "nt":
+        base = os.getenv("LOCALAPPDATA") or str(Path.home() / "AppData" / "Local")
+        return Path(base) / "easyeda2kicad" / "cache"
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Caches" / "easyeda2kicad"
+    base = os.getenv("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "easyeda2kicad"
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _unlink_quietly(tmp_path)
+        raise
+
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+    stale_hits: int = 0
+    stores: int = 0
+    evictions: int = 0
+    network_seconds: float = 0.0
+    network_requests: int = 0
+    saved_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    digest: str
+    size: int
+    fetched_at: float
+    accessed_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    body: bytes = b""
+
+    def is_fresh(self, ttl: float, now: Optional[float] = None) -> bool:
+        return ((now or time.time()) - self.fetched_at) < ttl
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ContentStore:
+    """
+    Directory of content-addressed objects plus small JSON entries.
+
+    Objects live under `objects/` named by their SHA-256 digest so identical
+    payloads are stored once; `entries/` maps a key to an object digest with
+    its size and last access time, which drives LRU eviction once the stored
+    objects exceed `max_bytes`.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._stored_bytes: Optional[int] = None
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / "entries" / f"{key}.json"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.directory / "objects" / digest[:2] / digest
+
+    def _read_entry(self, key: str) -> Optional[dict]:
+        try:
+            return json.loads(self._entry_path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _write_entry(self, key: str, meta: dict) -> None:
+        atomic_write_bytes(self._entry_path(key), json.dumps(meta).encode("utf-8"))
+
+    def _remove_entry(self, key: str) -> None:
+        _unlink_quietly(str(self._entry_path(key)))
+
+    def _read_object(self, digest: str) -> Optional[bytes]:
+        """Return the object bytes, or None if missing or failing its hash."""
+        try:
+            data = self._object_path(digest).read_bytes()
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() != digest:
+            logging.warning(f"Discarding corrupted object {digest} in {self.directory}")
+            _unlink_quietly(str(self._object_path(digest)))
+            return None
+        return data
+
+    def _put_object(self, data: bytes) -> str:
+        """Store `data` (once) and return its digest; call with the lock held."""
+        digest = hashlib.sha256(data).hexdigest()
+        if self._stored_bytes is None:
+            self._stored_bytes = self._scan_object_bytes()
+        object_path = self._object_path(digest)
+        if not object_path.exists():
+            atomic_write_bytes(object_path, data)
+            self._stored_bytes += len(data)
+        return digest
+
+    def _over_budget(self) -> bool:
+        return self._stored_bytes is not None and self._stored_bytes > self.max_bytes
+
+    def _scan_object_bytes(self) -> int:
+        total = 0
+        for object_path in (self.directory / "objects").glob("*/*"):
+            try:
+                total += object_path.stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the store fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for entry_path in (self.directory / "entries").glob("*.json"):
+                try:
+                    meta = json.loads(entry_path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    _unlink_quietly(str(entry_path))
+                    continue
+                entries.append((meta["accessed_at"], entry_path.stem, meta))
+
+            referenced: Dict[str, int] = {}
+            for _, _, meta in entries:
+                referenced[meta["digest"]] = meta["size"]
+            for object_path in (self.directory / "objects").glob("*/*"):
+                if object_path.name.startswith("."):
+                    continue
+                if object_path.name not in referenced:
+                    _unlink_quietly(str(object_path))
+            total = sum(referenced.values())
+            self._stored_bytes = total
+            if total <= self.max_bytes:
+                return
+
+            entries.sort(key=lambda item: item[0])
+            remaining = {digest: 0 for digest in referenced}
+            for _, _, meta in entries:
+                remaining[meta["digest"]] += 1
+            for _, key, meta in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove_entry(key)
+                self.evictions += 1
+                remaining[meta["digest"]] -= 1
+                if remaining[meta["digest"]] == 0:
+                    _unlink_quietly(str(self._object_path(meta["digest"])))
+                    total -= meta["size"]
+            self._stored_bytes = total
+
+
+class ResponseCache(ContentStore):
+    """
+    Persistent, content-addressed cache of EasyEDA API responses.
+
+    Entries map a request key (hash of the URL) to the response body plus the
+    HTTP validators needed for conditional revalidation. Entries older than
+    `ttl` are revalidated (or refetched), and the least recently used ones are
+    evicted once the stored bodies exceed `max_bytes`.
+    In `offline` mode no request is sent and stale entries are served as-is.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        offline: bool = False,
+    ) -> None:
+        super().__init__(
+            directory=Path(directory or default_cache_dir() / "responses"),
+            max_bytes=max_bytes,
+        )
+        self.ttl = ttl
+        self.offline = offline
+        self.stats = CacheStats()
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        key = self.key_for(url)
+        meta = self._read_entry(key)
+        if meta is None:
+            return None
+        try:
+            entry = CacheEntry(key=key, **meta)
+        except TypeError:
+            return None
+        body = self._read_object(entry.digest)
+        if body is None:
+            self._remove_entry(key)
+            return None
+        entry.body = body
+        return entry
+
+    def store(self, url: str, body: bytes, headers: Mapping[str, str]) -> CacheEntry:
+        now = time.time()
+        with self._lock:
+            entry = CacheEntry(
+                key=self.key_for(url),
+                digest=self._put_object(body),
+                size=len(body),
+                fetched_at=now,
+                accessed_at=now,
+                etag=headers.get("ETag"),
+                last_modified=headers.get("Last-Modified"),
+                body=body,
+            )
+            self._save(entry)
+            self.stats.stores += 1
+            over_budget = self._over_budget()
+        if over_budget:
+            self.evict()
+            self.stats.evictions = self.evictions
+        return entry
+
+    def mark_revalidated(self, entry: CacheEntry) -> None:
+        entry.fetched_at = time.time()
+        self.mark_used(entry)
+
+    def mark_used(self, entry: CacheEntry) -> None:
+        entry.accessed_at = time.time()
+        with self._lock:
+            self._save(entry)
+
+    def record_network_time(self, seconds: float) -> None:
+        with self._lock:
+            self.stats.network_requests += 1
+            self.stats.network_seconds += seconds
+
+    def record_hit(self, stale: bool = False, revalidated: bool = False) -> None:
+        with self._lock:
+            self.stats.hits += 1
+            if stale:
+                self.stats.stale_hits += 1
+            if revalidated:
+                self.stats.revalidated += 1
+            elif self.stats.network_requests:
+                self.stats.saved_seconds += (
+                    self.stats.network_seconds / self.stats.network_requests
+                )
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.stats.misses += 1
+
+    def _save(self, entry: CacheEntry) -> None:
+        meta = asdict(entry)
+        del meta["key"]
+        del meta["body"]
+        self._write_entry(entry.key, meta)
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_cache_configured = False
+_default_cache_lock = threading.Lock()
+
+
+def env_flag(name: str) -> Optional[bool]:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return None
+    return value.strip().lower() not in {"0", "false", "no", "off"}
+
+
+def get_default_response_cache() -> Optional[ResponseCache]:
+    """
+    Return the process-wide response cache, or None when disabled with
+    EASYEDA2KICAD_CACHE=0. EASYEDA2KICAD_CACHE_TTL (seconds),
+    EASYEDA2KICAD_CACHE_MAX_MB and EASYEDA2KICAD_OFFLINE tune it.
+    """
+    global _default_cache, _default_cache_configured
+    with _default_cache_lock:
+        if not _default_cache_configured:
+            if env_flag("EASYEDA2KICAD_CACHE") is False:
+                _default_cache = None
+                _default_cache_configured = True
+                return None
+            try:
+                ttl = float(os.getenv("EASYEDA2KICAD_CACHE_TTL", DEFAULT_TTL_SECONDS))
+                max_bytes = int(
+                    float(
+                        os.getenv(
+                            "EASYEDA2KICAD_CACHE_MAX_MB",
+                            DEFAULT_MAX_BYTES / (1024 * 1024),
+                        )
+                    )
+                    * 1024
+                    * 1024
+                )
+            except ValueError:
+                logging.warning("Invalid cache settings; falling back to defaults")
+                ttl, max_bytes = DEFAULT_TTL_SECONDS, DEFAULT_MAX_BYTES
+            _default_cache = ResponseCache(
+                ttl=ttl,
+                max_bytes=max_bytes,
+                offline=bool(env_flag("EASYEDA2KICAD_OFFLINE")),
+            )
+            _default_cache_configured = True
+        return _default_cache
+
+
+def configure_default_response_cache(
+    cache: Optional[ResponseCache],
+) -> Optional[ResponseCache]:
+    """Install `cache` (None disables caching) as the process-wide response cache."""
+    global _default_cache, _default_cache_configured
+    with _default_cache_lock:
+        _default_cache = cache
+        _default_cache_configured = True
+        return _default_cache
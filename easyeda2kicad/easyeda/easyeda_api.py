@@ -1,20 +1,49 @@
 # Global imports
+import copy
+import json
 import logging
+import os
+import tempfile
+import time
+from typing import Optional
 
 import requests
 
 from easyeda2kicad import __version__
+from easyeda2kicad.easyeda.cache import ResponseCache, get_default_response_cache
+from easyeda2kicad.easyeda.http_session import PooledHttpSession, get_shared_session
+from easyeda2kicad.easyeda.model_store import ModelBlobStore, get_default_model_store
+from easyeda2kicad.easyeda.single_flight import SingleFlight, get_shared_flights
 
 API_ENDPOINT = "https://easyeda.com/api/products/{lcsc_id}/components?version=6.4.19.5"
 ENDPOINT_3D_MODEL = "https://modules.easyeda.com/3dmodel/{uuid}"
 ENDPOINT_3D_MODEL_STEP = "https://modules.easyeda.com/qAxj6KHrDKw4blvCG8QJPs7Y/{uuid}"
 # ENDPOINT_3D_MODEL_STEP found in https://modules.lceda.cn/smt-gl-engine/0.8.22.6032922c/smt-gl-engine.js : points to the bucket containing the step files.
 
+STREAM_CHUNK_SIZE = 256 * 1024
+
 # ------------------------------------------------------------
 
 
 class EasyedaApi:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        session: Optional[PooledHttpSession] = None,
+        cache: Optional[ResponseCache] = None,
+        use_cache: bool = True,
+        model_store: Optional[ModelBlobStore] = None,
+        flights: Optional[SingleFlight] = None,
+    ) -> None:
+        self.session = session or get_shared_session()
+        # Concurrent fetches of the same part or model, e.g. one part being
+        # converted into several libraries, share a single download
+        self.flights = flights or get_shared_flights()
+        if cache is None and use_cache:
+            cache = get_default_response_cache()
+        self.cache = cache
+        if model_store is None and use_cache:
+            model_store = get_default_model_store()
+        self.model_store = model_store
         self.headers = {
             "Accept-Encoding": "gzip, deflate",
             "Accept": "application/json, text/javascript, */*; q=0.01",
@@ -23,16 +52,71 @@ class EasyedaApi:
         }
 
     def get_info_from_easyeda_api(self, lcsc_id: str) -> dict:
-        r = requests.get(url=API_ENDPOINT.format(lcsc_id=lcsc_id), headers=self.headers)
-        api_response = r.json()
+        url = API_ENDPOINT.format(lcsc_id=lcsc_id)
+        api_response, shared = self.flights.run(
+            ("info", url), lambda: self._fetch_info(lcsc_id, url)
+        )
+        # Every caller gets its own copy to work on
+        return copy.deepcopy(api_response) if shared else api_response
+
+    def _fetch_info(self, lcsc_id: str, url: str) -> dict:
+        if self.cache is None:
+            r = self.session.get(url=url, headers=self.headers)
+            return self._parse_api_response(r.json())
+
+        entry = self.cache.lookup(url)
+        if entry and (self.cache.offline or entry.is_fresh(self.cache.ttl)):
+            self.cache.mark_used(entry)
+            self.cache.record_hit(stale=not entry.is_fresh(self.cache.ttl))
+            return self._parse_api_response(json.loads(entry.body))
+        if self.cache.offline:
+            self.cache.record_miss()
+            logging.error(f"Offline mode: no cached data for {lcsc_id}")
+            return {}
+
+        headers = dict(self.headers)
+        if entry:
+            headers.update(entry.validators())
+        started = time.perf_counter()
+        try:
+            r = self.session.get(url=url, headers=headers)
+        except requests.RequestException:
+            if entry is None:
+                raise
+            logging.warning(f"EasyEDA unreachable, serving cached data for {lcsc_id}")
+            self.cache.record_hit(stale=True)
+            return self._parse_api_response(json.loads(entry.body))
+        self.cache.record_network_time(time.perf_counter() - started)
 
+        if entry and r.status_code == requests.codes.not_modified:
+            self.cache.mark_revalidated(entry)
+            self.cache.record_hit(revalidated=True)
+            return self._parse_api_response(json.loads(entry.body))
+
+        try:
+            api_response = self._parse_api_response(r.json()) if r.ok else {}
+        except ValueError:  # e.g. an HTML error page
+            api_response = {}
+        if not api_response and entry:
+            logging.warning(
+                f"EasyEDA returned no usable data, serving cached data for {lcsc_id}"
+            )
+            self.cache.record_hit(stale=True)
+            return self._parse_api_response(json.loads(entry.body))
+        self.cache.record_miss()
+        if api_response:
+            self.cache.store(url, r.content, r.headers)
+        return api_response
+
+    @staticmethod
+    def _parse_api_response(api_response: dict) -> dict:
         if not api_response or (
             "code" in api_response and api_response["success"] is False
         ):
             logging.debug(f"{api_response}")
             return {}
 
-        return r.json()
+        return api_response
 
     def get_cad_data_of_component(self, lcsc_id: str) -> dict:
         cp_cad_info = self.get_info_from_easyeda_api(lcsc_id=lcsc_id)
@@ -40,22 +124,103 @@ class EasyedaApi:
             return {}
         return cp_cad_info["result"]
 
-    def get_raw_3d_model_obj(self, uuid: str) -> str:
-        r = requests.get(
+    def get_raw_3d_model_obj(self, uuid: str) -> Optional[str]:
+        obj_data, _ = self.flights.run(
+            ("obj", uuid), lambda: self._fetch_raw_3d_model_obj(uuid)
+        )
+        return obj_data
+
+    def _fetch_raw_3d_model_obj(self, uuid: str) -> Optional[str]:
+        if self.model_store is not None:
+            stored = self.model_store.get(uuid, "obj")
+            if stored is not None:
+                return stored.decode()
+        r = self.session.get(
             url=ENDPOINT_3D_MODEL.format(uuid=uuid),
             headers={"User-Agent": self.headers["User-Agent"]},
         )
         if r.status_code != requests.codes.ok:
             logging.error(f"No raw 3D model data found for uuid:{uuid} on easyeda")
             return None
+        if self.model_store is not None:
+            self.model_store.put(uuid, "obj", r.content)
         return r.content.decode()
 
-    def get_step_3d_model(self, uuid: str) -> bytes:
-        r = requests.get(
+    def get_step_3d_model(self, uuid: str) -> Optional[bytes]:
+        step_data, _ = self.flights.run(
+            ("step", uuid), lambda: self._fetch_step_3d_model(uuid)
+        )
+        return step_data
+
+    def _fetch_step_3d_model(self, uuid: str) -> Optional[bytes]:
+        if self.model_store is not None:
+            stored = self.model_store.get(uuid, "step")
+            if stored is not None:
+                return stored
+        r = self.session.get(
             url=ENDPOINT_3D_MODEL_STEP.format(uuid=uuid),
             headers={"User-Agent": self.headers["User-Agent"]},
         )
         if r.status_code != requests.codes.ok:
             logging.error(f"No step 3D model data found for uuid:{uuid} on easyeda")
             return None
+        if self.model_store is not None:
+            self.model_store.put(uuid, "step", r.content)
         return r.content
+
+    def download_step_3d_model(self, uuid: str, destination: str) -> bool:
+        """
+        Stream the STEP model of `uuid` straight into `destination`.
+
+        The payload never has to fit in memory; it is written to a temporary
+        file next to `destination` and moved into place once complete.
+
+        Concurrent downloads of the same model into other libraries wait
+        for the first one and are then materialized from the model store.
+        """
+        if self.model_store is None:
+            downloaded, _ = self.flights.run(
+                ("step-file", uuid, os.path.abspath(destination)),
+                lambda: self._download_step_3d_model(uuid, destination),
+            )
+            return downloaded
+        if self.model_store.materialize(uuid, "step", destination):
+            return True
+        downloaded, shared = self.flights.run(
+            ("step-file", uuid), lambda: self._download_step_3d_model(uuid, destination)
+        )
+        if not shared:
+            return downloaded
+        if downloaded and self.model_store.materialize(uuid, "step", destination):
+            return True
+        # The shared download failed or was not stored: try on our own
+        return self._download_step_3d_model(uuid, destination)
+
+    def _download_step_3d_model(self, uuid: str, destination: str) -> bool:
+        r = self.session.get(
+            url=ENDPOINT_3D_MODEL_STEP.format(uuid=uuid),
+            headers={"User-Agent": self.headers["User-Agent"]},
+            stream=True,
+        )
+        with r:
+            if r.status_code != requests.codes.ok:
+                logging.error(f"No step 3D model data found for uuid:{uuid} on easyeda")
+                return False
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(destination) or ".", prefix=".easyeda2kicad-"
+            )
+            try:
+                with os.fdopen(fd, "wb") as tmp_file:
+                    for chunk in r.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                        tmp_file.write(chunk)
+                os.replace(tmp_path, destination)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+
+        if self.model_store is not None:
+            self.model_store.put_file(uuid, "step", destination)
+        return True
@@ -1,11 +1,23 @@
 # Global imports
 import json
 import logging
-from typing import Optional, Tuple
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
 
 from easyeda2kicad.easyeda.easyeda_api import EasyedaApi
+from easyeda2kicad.easyeda.obj_model import OBJ_MODEL_KIND, ObjModel
+from easyeda2kicad.easyeda.obj_vertices import ObjMetrics, parse_obj_vertices
 from easyeda2kicad.easyeda.parameters_easyeda import *
 
+# Given the parsed model info, returns the file the STEP payload should be
+# streamed to, or None to keep it in memory (Ee3dModel.step)
+StepDestination = Callable[[Ee3dModel], Optional[str]]
+
+# "geometry" measures the OBJ mesh to place the model (one extra download),
+# "metadata" places it from the footprint data alone
+MODEL_PLACEMENTS = ("geometry", "metadata")
+
 
 def add_easyeda_pin(pin_data: str, ee_symbol: EeSymbol):
     segments = pin_data.split("^^")
@@ -155,8 +167,19 @@ class EasyedaSymbolImporter:
 
 
 class EasyedaFootprintImporter:
-    def __init__(self, easyeda_cp_cad_data: dict):
+    def __init__(
+        self,
+        easyeda_cp_cad_data: dict,
+        api: Optional[EasyedaApi] = None,
+        step_destination: Optional[StepDestination] = None,
+        model_placement: str = "geometry",
+        prefetch_3d_model: bool = False,
+    ):
         self.input = easyeda_cp_cad_data
+        self.api = api or EasyedaApi()
+        self.step_destination = step_destination
+        self.model_placement = model_placement
+        self.prefetch_3d_model = prefetch_3d_model
         self.output = self.extract_easyeda_data(
             ee_data_str=self.input["packageDetail"]["dataStr"],
             ee_data_info=self.input["packageDetail"]["dataStr"]["head"]["c_para"],
@@ -229,7 +252,11 @@ class EasyedaFootprintImporter:
                 new_ee_footprint.texts.append(ee_text)
             elif ee_designator == "SVGNODE":
                 new_ee_footprint.model_3d = Easyeda3dModelImporter(
-                    easyeda_cp_cad_data=[line], download_raw_3d_model=True
+                    easyeda_cp_cad_data=[line],
+                    download_raw_3d_model=self.prefetch_3d_model,
+                    api=self.api,
+                    step_destination=self.step_destination,
+                    model_placement=self.model_placement,
                 ).output
 
             elif ee_designator == "SOLIDREGION":
@@ -242,11 +269,167 @@ class EasyedaFootprintImporter:
 
 # ------------------------------------------------------------------------------
 
+_download_executor: Optional[ThreadPoolExecutor] = None
+_download_executor_lock = threading.Lock()
+
+
+def _get_download_executor() -> ThreadPoolExecutor:
+    global _download_executor
+    with _download_executor_lock:
+        if _download_executor is None:
+            _download_executor = ThreadPoolExecutor(
+                max_workers=8, thread_name_prefix="easyeda-3d-download"
+            )
+        return _download_executor
+
+
+class LazyEe3dModelPayload(Ee3dModelPayload):
+    """
+    Payload handle that downloads the OBJ / STEP of a model on first access.
+
+    Each payload is fetched at most once, even when several threads read it
+    at the same time; `prefetch` starts the downloads in the background so
+    they overlap with other work. When `step_target` returns a path, the STEP
+    is streamed there and exposed through `step_path` instead of `step`.
+
+    The parsed OBJ (`obj_model`) is cached in the model store too: once a
+    model has been parsed, later handles load it from there and do not
+    download the OBJ at all.
+    """
+
+    def __init__(
+        self,
+        api: EasyedaApi,
+        uuid: str,
+        step_target: Optional[Callable[[], Optional[str]]] = None,
+    ) -> None:
+        super().__init__()
+        self.api = api
+        self.uuid = uuid
+        self.step_target = step_target
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        # An assigned OBJ is not the one stored under this uuid
+        self._obj_assigned = False
+
+    def prefetch(self, obj: bool = True, step: bool = True) -> None:
+        if step:
+            self._fetch("step")
+        if obj and not self._has_stored_obj_model():
+            self._fetch("obj")
+
+    def _has_stored_obj_model(self) -> bool:
+        store = self.api.model_store
+        return store is not None and store.contains(self.uuid, OBJ_MODEL_KIND)
+
+    def is_loaded(self, kind: str) -> bool:
+        future = self._futures.get(kind)
+        return future is not None and future.done()
+
+    def _fetch(self, kind: str) -> Future:
+        with self._lock:
+            future = self._futures.get(kind)
+            if future is None:
+                future = _get_download_executor().submit(
+                    self._download_obj if kind == "obj" else self._download_step
+                )
+                self._futures[kind] = future
+            return future
+
+    def _settle(self, kind: str, value) -> None:
+        # Assigned values replace whatever a pending download would return
+        future: Future = Future()
+        future.set_result(value)
+        with self._lock:
+            self._futures[kind] = future
+
+    def _download_obj(self) -> Optional[str]:
+        return self.api.get_raw_3d_model_obj(uuid=self.uuid)
+
+    def _download_step(self) -> Tuple[Optional[bytes], Optional[str]]:
+        target = self.step_target() if self.step_target else None
+        if target:
+            if self.api.download_step_3d_model(self.uuid, target):
+                return None, target
+            return None, None
+        # None when EasyEDA has no STEP for this uuid
+        step = self.api.get_step_3d_model(uuid=self.uuid)
+        return step, None
+
+    @property
+    def raw_obj(self) -> Optional[str]:
+        return self._fetch("obj").result()
+
+    @raw_obj.setter
+    def raw_obj(self, value: Optional[str]) -> None:
+        self._settle("obj", value)
+        self._obj_assigned = True
+        self._obj_model = None
+
+    @property
+    def obj_model(self) -> Optional[ObjModel]:
+        with self._model_lock:
+            if self._obj_model is None:
+                self._obj_model = self._load_obj_model()
+            return self._obj_model
+
+    @obj_model.setter
+    def obj_model(self, value: Optional[ObjModel]) -> None:
+        self._obj_model = value
+
+    def _load_obj_model(self) -> Optional[ObjModel]:
+        store = None if self._obj_assigned else self.api.model_store
+        if store is not None:
+            stored = store.get(self.uuid, OBJ_MODEL_KIND)
+            obj_model = ObjModel.from_bytes(stored) if stored else None
+            if obj_model is not None:
+                return obj_model
+        raw_obj = self.raw_obj
+        if not raw_obj:
+            return None
+        obj_model = ObjModel.parse(raw_obj)
+        if store is not None:
+            store.put(self.uuid, OBJ_MODEL_KIND, obj_model.to_bytes())
+        return obj_model
+
+    @property
+    def step(self) -> Optional[bytes]:
+        return self._fetch("step").result()[0]
+
+    @step.setter
+    def step(self, value: Optional[bytes]) -> None:
+        self._settle("step", (value, None))
+
+    @property
+    def step_path(self) -> Optional[str]:
+        return self._fetch("step").result()[1]
+
+    @step_path.setter
+    def step_path(self, value: Optional[str]) -> None:
+        self._settle("step", (None, value))
+
+    def fetched_step_path(self) -> Optional[str]:
+        future = self._futures.get("step")
+        return future.result()[1] if future is not None else None
+
 
 class Easyeda3dModelImporter:
-    def __init__(self, easyeda_cp_cad_data, download_raw_3d_model: bool):
+    def __init__(
+        self,
+        easyeda_cp_cad_data,
+        download_raw_3d_model: bool,
+        api: Optional[EasyedaApi] = None,
+        step_destination: Optional[StepDestination] = None,
+        model_placement: str = "geometry",
+    ):
+        if model_placement not in MODEL_PLACEMENTS:
+            raise ValueError(f"Unknown model placement '{model_placement}'")
         self.input = easyeda_cp_cad_data
         self.download_raw_3d_model = download_raw_3d_model
+        self.api = api or EasyedaApi()
+        self.step_destination = step_destination
+        self.model_placement = model_placement
         self.output = self.create_3d_model()
 
     def create_3d_model(self) -> Union[Ee3dModel, None]:
@@ -258,18 +441,39 @@ class Easyeda3dModelImporter:
 
         if model_3d_info := self.get_3d_model_info(ee_data=ee_data):
             model_3d: Ee3dModel = self.parse_3d_model_info(info=model_3d_info)
+            step_destination = self.step_destination
+            model_3d.payload = LazyEe3dModelPayload(
+                api=self.api,
+                uuid=model_3d.uuid,
+                step_target=(
+                    (lambda: step_destination(model_3d))
+                    if step_destination is not None
+                    else None
+                ),
+            )
             if self.download_raw_3d_model:
-                model_3d.raw_obj = EasyedaApi().get_raw_3d_model_obj(uuid=model_3d.uuid)
-                model_3d.step = EasyedaApi().get_step_3d_model(uuid=model_3d.uuid)
-                metrics = compute_obj_center(model_3d.raw_obj)
-                if metrics is not None:
-                    model_3d.center = metrics[:3]
-                    model_3d.size = metrics[3:]
+                # Both payloads will be needed: overlap the two downloads
+                model_3d.payload.prefetch()
+            if self.model_placement == "geometry":
+                self.measure(model_3d)
             return model_3d
 
         logging.warning("No 3D model available for this component")
         return None
 
+    @staticmethod
+    def measure(model_3d: Ee3dModel) -> None:
+        """Set the center / size of the model from its OBJ mesh."""
+        try:
+            obj_model = model_3d.obj_model
+        except ValueError:
+            logging.warning("Unable to measure the 3D model: malformed OBJ")
+            return
+        metrics = obj_model.metrics() if obj_model is not None else None
+        if metrics is not None:
+            model_3d.center = metrics[:3]
+            model_3d.size = metrics[3:]
+
     def get_3d_model_info(self, ee_data: str) -> dict:
         for line in ee_data:
             ee_designator = line.split("~")[0]
@@ -293,54 +497,12 @@ class Easyeda3dModelImporter:
         )
 
 
-def compute_obj_center(raw_obj: Optional[str]) -> Optional[
-    Tuple[float, float, float, float, float, float]
-]:
+def compute_obj_center(raw_obj: Optional[str]) -> Optional[ObjMetrics]:
+    """Center and size of the OBJ mesh, in the units of the WRL export."""
     if not raw_obj:
         return None
-
-    min_x = float("inf")
-    max_x = float("-inf")
-    min_y = float("inf")
-    max_y = float("-inf")
-    min_z = float("inf")
-    max_z = float("-inf")
-
-    for line in raw_obj.splitlines():
-        if not line.startswith("v "):
-            continue
-        parts = line.strip().split()
-        if len(parts) != 4:
-            continue
-        try:
-            x, y, z = (
-                float(parts[1]) / 2.54,
-                float(parts[2]) / 2.54,
-                float(parts[3]) / 2.54,
-            )
-        except ValueError:
-            continue
-        if x < min_x:
-            min_x = x
-        if x > max_x:
-            max_x = x
-        if y < min_y:
-            min_y = y
-        if y > max_y:
-            max_y = y
-        if z < min_z:
-            min_z = z
-        if z > max_z:
-            max_z = z
-
-    if min_x == float("inf") or min_y == float("inf") or min_z == float("inf"):
+    try:
+        return parse_obj_vertices(raw_obj).metrics()
+    except ValueError:
+        logging.warning("Unable to measure the 3D model: malformed vertices")
         return None
-
-    return (
-        (min_x + max_x) / 2,
-        (min_y + max_y) / 2,
-        (min_z + max_z) / 2,
-        max_x - min_x,
-        max_y - min_y,
-        max_z - min_z,
-    )
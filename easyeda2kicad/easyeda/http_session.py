@@ -0,0 +1,165 @@
+# Global imports
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from easyeda2kicad import __version__
+
+
+@dataclass(frozen=True)
+class HttpSessionConfig:
+    """
+    Tuning knobs for the pooled HTTP layer shared by every EasyEDA request.
+
+    pool_connections is the number of distinct hosts kept in the pool cache,
+    pool_maxsize the number of keep-alive connections kept per host. With
+    pool_block enabled, callers wait for a free connection instead of opening
+    more than pool_maxsize connections to the same host.
+    """
+
+    pool_connections: int = 4
+    pool_maxsize: int = 16
+    pool_block: bool = True
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    max_retries: int = 2
+    backoff_factor: float = 0.3
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
+
+    @classmethod
+    def from_env(cls) -> "HttpSessionConfig":
+        defaults = cls()
+        return cls(
+            pool_connections=_env_int(
+                "EASYEDA2KICAD_HTTP_POOL_CONNECTIONS", defaults.pool_connections
+            ),
+            pool_maxsize=_env_int(
+                "EASYEDA2KICAD_HTTP_POOL_MAXSIZE", defaults.pool_maxsize
+            ),
+            connect_timeout=_env_float(
+                "EASYEDA2KICAD_HTTP_CONNECT_TIMEOUT", defaults.connect_timeout
+            ),
+            read_timeout=_env_float(
+                "EASYEDA2KICAD_HTTP_READ_TIMEOUT", defaults.read_timeout
+            ),
+            max_retries=_env_int("EASYEDA2KICAD_HTTP_RETRIES", defaults.max_retries),
+        )
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logging.warning(f"Ignoring invalid value for {name}: {value}")
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return max(0.1, float(value))
+    except ValueError:
+        logging.warning(f"Ignoring invalid value for {name}: {value}")
+        return default
+
+
+class PooledHttpSession:
+    """
+    Thread-safe, keep-alive HTTP client.
+
+    A single HTTPAdapter (and thus a single urllib3 connection pool per host)
+    is shared by all threads, while each thread gets its own requests.Session
+    so that cookie and header state is never mutated concurrently.
+    """
+
+    def __init__(self, config: Optional[HttpSessionConfig] = None) -> None:
+        self.config = config or HttpSessionConfig()
+        self.headers = {
+            "Accept-Encoding": "gzip, deflate",
+            "User-Agent": f"easyeda2kicad v{__version__}",
+        }
+        self._adapter = HTTPAdapter(
+            pool_connections=self.config.pool_connections,
+            pool_maxsize=self.config.pool_maxsize,
+            pool_block=self.config.pool_block,
+            max_retries=Retry(
+                total=self.config.max_retries,
+                connect=self.config.max_retries,
+                read=self.config.max_retries,
+                status=self.config.max_retries,
+                backoff_factor=self.config.backoff_factor,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD"}),
+                raise_on_status=False,
+            ),
+        )
+        self._local = threading.local()
+        self._sessions: List[requests.Session] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            with self._lock:
+                self._sessions.append(session)
+            self._local.session = session
+        return session
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        if self._closed:
+            raise RuntimeError("HTTP session has been closed")
+        kwargs.setdefault("timeout", self.config.timeout)
+        return self._session().get(url, **kwargs)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self._adapter.close()
+
+
+_shared_session: Optional[PooledHttpSession] = None
+_shared_session_lock = threading.Lock()
+
+
+def get_shared_session() -> PooledHttpSession:
+    """Return the process-wide pooled session, creating it on first use."""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = PooledHttpSession(config=HttpSessionConfig.from_env())
+        return _shared_session
+
+
+def configure_shared_session(config: HttpSessionConfig) -> PooledHttpSession:
+    """
+    Replace the process-wide pooled session with one using `config`.
+
+    Clients already holding the previous session keep using it until they are
+    recreated, so this is meant to be called once at startup.
+    """
+    global _shared_session
+    with _shared_session_lock:
+        _shared_session = PooledHttpSession(config=config)
+        return _shared_session
@@ -0,0 +1,267 @@
+# Global imports
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from easyeda2kicad.easyeda.cache import ContentStore, default_cache_dir, env_flag
+
+DEFAULT_MODEL_STORE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+LINK_MODES = ("copy", "hardlink", "reflink")
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# Linux FICLONE ioctl request number (_IOW(0x94, 9, int))
+_FICLONE = 0x40049409
+
+
+@dataclass
+class ModelStoreStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    linked: int = 0
+    evictions: int = 0
+    bytes_served: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class ModelBlobStore(ContentStore):
+    """
+    Deduplicating store for 3D model payloads keyed by EasyEDA model UUID.
+
+    Every payload kind ("obj", "step", or a generated artifact like "wrl")
+    of a model is referenced by `<uuid>.<kind>`, and the bytes live once in
+    the content-addressed object area, so the many parts sharing one package
+    model download and store it a single time. Objects are checked against
+    their SHA-256 digest whenever they are read or linked.
+
+    With `link_mode` set to "hardlink" or "reflink", `materialize` places a
+    stored artifact into a library folder without rewriting its bytes, falling
+    back to a plain copy when the filesystem cannot link.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_bytes: int = DEFAULT_MODEL_STORE_MAX_BYTES,
+        link_mode: str = "copy",
+    ) -> None:
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"Unknown link mode '{link_mode}'")
+        super().__init__(
+            directory=Path(directory or default_cache_dir() / "models"),
+            max_bytes=max_bytes,
+        )
+        self.link_mode = link_mode
+        self.stats = ModelStoreStats()
+
+    @staticmethod
+    def key_for(uuid: str, kind: str) -> str:
+        safe_uuid = "".join(ch for ch in uuid if ch.isalnum() or ch in "-_")
+        return f"{safe_uuid}.{kind}"
+
+    def _lookup(self, uuid: str, kind: str) -> Optional[dict]:
+        if not uuid:
+            return None
+        key = self.key_for(uuid, kind)
+        meta = self._read_entry(key)
+        if meta is None:
+            return None
+        meta["accessed_at"] = time.time()
+        with self._lock:
+            self._write_entry(key, meta)
+        return meta
+
+    def get(self, uuid: str, kind: str) -> Optional[bytes]:
+        meta = self._lookup(uuid, kind)
+        data = self._read_object(meta["digest"]) if meta else None
+        with self._lock:
+            if data is None:
+                self.stats.misses += 1
+            else:
+                self.stats.hits += 1
+                self.stats.bytes_served += len(data)
+        return data
+
+    def put(self, uuid: str, kind: str, data: bytes) -> Optional[str]:
+        if not uuid or data is None:
+            return None
+        with self._lock:
+            digest = self._put_object(data)
+            self._write_entry(
+                self.key_for(uuid, kind),
+                {"digest": digest, "size": len(data), "accessed_at": time.time()},
+            )
+            self.stats.stores += 1
+            over_budget = self._over_budget()
+        if over_budget:
+            self.evict()
+            self.stats.evictions = self.evictions
+        return digest
+
+    def put_file(self, uuid: str, kind: str, path: str) -> Optional[str]:
+        """Like `put`, for a payload already on disk (hashed in chunks)."""
+        if not uuid:
+            return None
+        sha = hashlib.sha256()
+        try:
+            with open(path, "rb") as payload:
+                for chunk in iter(lambda: payload.read(_HASH_CHUNK_SIZE), b""):
+                    sha.update(chunk)
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        digest = sha.hexdigest()
+        with self._lock:
+            if self._stored_bytes is None:
+                self._stored_bytes = self._scan_object_bytes()
+            object_path = self._object_path(digest)
+            if not object_path.exists():
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = object_path.with_name(f".{digest}.tmp-{threading.get_ident()}")
+                shutil.copyfile(path, tmp_path)
+                os.replace(tmp_path, object_path)
+                self._stored_bytes += size
+            self._write_entry(
+                self.key_for(uuid, kind),
+                {"digest": digest, "size": size, "accessed_at": time.time()},
+            )
+            self.stats.stores += 1
+            over_budget = self._over_budget()
+        if over_budget:
+            self.evict()
+            self.stats.evictions = self.evictions
+        return digest
+
+    def contains(self, uuid: str, kind: str) -> bool:
+        meta = self._read_entry(self.key_for(uuid, kind)) if uuid else None
+        if not meta:
+            return False
+        return self._object_path(meta["digest"]).is_file()
+
+    def materialize(self, uuid: str, kind: str, destination: str) -> bool:
+        """
+        Place the stored `kind` payload of `uuid` at `destination`.
+
+        Returns False when the store has no valid payload for it.
+        """
+        meta = self._lookup(uuid, kind)
+        if not meta or self._read_object(meta["digest"]) is None:
+            with self._lock:
+                self.stats.misses += 1
+            return False
+
+        source = self._object_path(meta["digest"])
+        target = Path(destination)
+        tmp_target = target.with_name(f".{target.name}.tmp-{threading.get_ident()}")
+        try:
+            _link_or_copy(source, tmp_target, self.link_mode)
+            os.replace(tmp_target, target)
+        except OSError as exc:
+            logging.warning(f"Unable to place stored model at {destination}: {exc}")
+            try:
+                os.unlink(tmp_target)
+            except OSError:
+                pass
+            return False
+
+        with self._lock:
+            self.stats.hits += 1
+            if self.link_mode != "copy":
+                self.stats.linked += 1
+        return True
+
+
+def _link_or_copy(source: Path, target: Path, link_mode: str) -> None:
+    if link_mode == "hardlink":
+        try:
+            os.link(source, target)
+            return
+        except OSError as exc:
+            # Cross-device targets and filesystems without hard links
+            logging.debug(f"Hard link to {target} failed ({exc}); copying instead")
+    elif link_mode == "reflink" and _reflink(source, target):
+        return
+    shutil.copyfile(source, target)
+
+
+def _reflink(source: Path, target: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        return True
+    except OSError:
+        try:
+            os.unlink(target)
+        except OSError:
+            pass
+        return False
+
+
+_default_store: Optional[ModelBlobStore] = None
+_default_store_configured = False
+_default_store_lock = threading.Lock()
+
+
+def get_default_model_store() -> Optional[ModelBlobStore]:
+    """
+    Return the process-wide model store, or None when disabled with
+    EASYEDA2KICAD_CACHE=0 or EASYEDA2KICAD_MODEL_STORE=0.
+    EASYEDA2KICAD_MODEL_STORE_MAX_MB and EASYEDA2KICAD_MODEL_LINK
+    (copy, hardlink or reflink) tune it.
+    """
+    global _default_store, _default_store_configured
+    with _default_store_lock:
+        if not _default_store_configured:
+            if (
+                env_flag("EASYEDA2KICAD_CACHE") is False
+                or env_flag("EASYEDA2KICAD_MODEL_STORE") is False
+            ):
+                _default_store = None
+                _default_store_configured = True
+                return None
+            link_mode = os.getenv("EASYEDA2KICAD_MODEL_LINK", "copy").strip().lower()
+            if link_mode not in LINK_MODES:
+                logging.warning(f"Unknown EASYEDA2KICAD_MODEL_LINK '{link_mode}'")
+                link_mode = "copy"
+            try:
+                max_bytes = int(
+                    float(
+                        os.getenv(
+                            "EASYEDA2KICAD_MODEL_STORE_MAX_MB",
+                            DEFAULT_MODEL_STORE_MAX_BYTES / (1024 * 1024),
+                        )
+                    )
+                    * 1024
+                    * 1024
+                )
+            except ValueError:
+                logging.warning("Invalid model store size; falling back to default")
+                max_bytes = DEFAULT_MODEL_STORE_MAX_BYTES
+            _default_store = ModelBlobStore(max_bytes=max_bytes, link_mode=link_mode)
+            _default_store_configured = True
+        return _default_store
+
+
+def configure_default_model_store(
+    store: Optional[ModelBlobStore],
+) -> Optional[ModelBlobStore]:
+    """Install `store` (None disables it) as the process-wide model store."""
+    global _default_store, _default_store_configured
+    with _default_store_lock:
+        _default_store = store
+        _default_store_configured = True
+        return _default_store
@@ -0,0 +1,252 @@
+"""OBJ mesh of an EasyEDA 3D model, parsed once and shared by placement and export."""
+
+from __future__ import annotations
+
+# Global imports
+import json
+import re
+import sys
+from array import array
+from dataclasses import dataclass, field
+from itertools import accumulate, islice, repeat
+from typing import Dict, List, Optional, Sequence, TextIO, Tuple, Union
+
+from easyeda2kicad.easyeda.obj_vertices import (
+    VERTEX_REGEX,
+    ObjMetrics,
+    ObjVertices,
+    first_use_unique,
+    iter_obj_chunks,
+    np,
+)
+
+# ModelBlobStore kind of the serialized form, next to the raw "obj"
+OBJ_MODEL_KIND = "objmodel"
+# Bump when the parsed form or its serialization changes
+OBJ_MODEL_VERSION = 1
+
+# First token of every line: the "f" of a face
+_FACE_HEAD = re.compile("^[^ \n]* ?", flags=re.MULTILINE)
+# Face indices remapped per list comprehension without NumPy
+_REMAP_BATCH = 1 << 16
+
+
+def _parse_indices(tokens: List[str]):
+    """The tokens as a NumPy int array, None to convert them in Python."""
+    if np is None:
+        return None
+    try:
+        return np.array(tokens, dtype=np.intc)
+    except ValueError:
+        # Malformed index: raised again by the Python path, like before
+        return None
+
+
+@dataclass
+class ObjShape:
+    """
+    The faces of one `usemtl` group.
+
+    `indices` holds the 1-based OBJ vertex indices of every face, one face
+    after the other; `face_ends` the offset in `indices` where each face
+    ends.
+    """
+
+    material_id: str
+    indices: array = field(default_factory=lambda: array("i"))
+    face_ends: array = field(default_factory=lambda: array("I"))
+
+    def add_faces(self, text: str) -> None:
+        """Add the faces of some `f` lines, parsed a block at a time."""
+        lines = list(filter(None, text.replace("//", "").splitlines()))
+        if not lines:
+            return
+        # Everything after the first token of a line is a vertex index
+        sizes = list(map(str.count, lines, repeat(" ")))
+        count = sum(sizes)
+        text = "\n".join(lines)
+        if text.startswith("f ") and text.count("\nf ") == len(lines) - 1:
+            body = text[2:].replace("\nf ", " ")
+        else:
+            body = _FACE_HEAD.sub("", text).replace("\n", " ")
+
+        tokens = body.split()
+        if len(tokens) != count:
+            # Empty fields: int("") raises like the original exporter did
+            tokens = [index for line in lines for index in line.split(" ")[1:]]
+
+        indices = self.indices
+        start = len(indices)
+        parsed = _parse_indices(tokens)
+        if parsed is not None:
+            indices.frombytes(parsed.tobytes())
+        else:
+            indices.extend(map(int, tokens))
+        self.face_ends.extend(islice(accumulate(sizes, initial=start), 1, None))
+
+    def remap(self) -> Tuple[Sequence[int], Sequence[int]]:
+        """
+        The OBJ vertices used by the shape, in order of first use, and the
+        position in that list of every entry of `indices`.
+        """
+        if np is not None:
+            indices = np.frombuffer(self.indices, dtype=np.intc)
+            first, positions = first_use_unique(indices)
+            return indices[first], positions
+
+        # OBJ vertex index -> index in the shape, in order of first use
+        link: Dict[int, int] = {}
+        setdefault = link.setdefault
+        positions = array("i")
+        indices = self.indices
+        for start in range(0, len(indices), _REMAP_BATCH):
+            positions.extend(
+                [
+                    setdefault(index, len(link))
+                    for index in indices[start : start + _REMAP_BATCH]
+                ]
+            )
+        return list(link), positions
+
+
+class _MaterialReader:
+    """Collects the `newmtl ... endmtl` blocks of an OBJ read in chunks."""
+
+    def __init__(self) -> None:
+        self.materials: Dict[str, dict] = {}
+        self._block: Optional[str] = None
+
+    def feed(self, text: str) -> None:
+        start = 0
+        while True:
+            if self._block is None:
+                start = text.find("newmtl ", start)
+                if start < 0:
+                    return
+                self._block = ""
+            end = text.find("endmtl", start)
+            if end < 0:
+                self._block += text[start:]
+                return
+            self._add(self._block + text[start:end])
+            self._block = None
+            start = end + len("endmtl")
+
+    def _add(self, block: str) -> None:
+        material: dict = {}
+        material_id = ""
+        for value in block.splitlines():
+            if value.startswith("newmtl"):
+                material_id = value.split(" ")[1]
+            elif value.startswith("Ka"):
+                material["ambient_color"] = value.split(" ")[1:]
+            elif value.startswith("Kd"):
+                material["diffuse_color"] = value.split(" ")[1:]
+            elif value.startswith("Ks"):
+                material["specular_color"] = value.split(" ")[1:]
+            elif value.startswith("d"):
+                # This isn't exactly the same as transparency, is dissolve
+                # I.e. part C115366 (SW-TH_SPEF110100) has d=1, and isn't transparent
+                material["transparency"] = value.split(" ")[1]
+        self.materials[material_id] = material
+
+
+@dataclass
+class ObjModel:
+    """
+    Vertices, materials and per-material faces of an EasyEDA OBJ mesh.
+
+    Built once per download by `parse` (a single pass over the text, in
+    chunks), then used both to place the model (`metrics`) and to write
+    the WRL. `to_bytes` / `from_bytes` give a compact binary form that is
+    cached in the model store next to the raw OBJ, so later conversions
+    of the same model skip the download and the parsing.
+    """
+
+    vertices: ObjVertices
+    materials: Dict[str, dict] = field(default_factory=dict)
+    shapes: List[ObjShape] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, obj_data: Union[str, TextIO]) -> "ObjModel":
+        materials = _MaterialReader()
+        model = cls(vertices=ObjVertices(), materials=materials.materials)
+        shape: Optional[ObjShape] = None
+        for chunk in iter_obj_chunks(obj_data):
+            parts = chunk.split("usemtl")
+            if shape is None:
+                # Still before the first shape: material blocks and vertices
+                materials.feed(parts[0])
+                model.vertices.extend(VERTEX_REGEX.findall(parts[0]))
+            else:
+                shape.add_faces(parts[0])
+            for part in parts[1:]:
+                # The rest of the `usemtl` line names the material
+                head, _, faces = part.partition("\n")
+                head_lines = head.splitlines() or [""]
+                shape = ObjShape(material_id=head_lines[0].replace(" ", ""))
+                shape.add_faces("\n".join(head_lines[1:]))
+                shape.add_faces(faces)
+                model.shapes.append(shape)
+        return model
+
+    def metrics(self) -> Optional[ObjMetrics]:
+        return self.vertices.metrics()
+
+    def to_bytes(self) -> bytes:
+        coords, starts = self.vertices.arrays()
+        sections = [coords] + ([starts] if starts is not None else [])
+        for shape in self.shapes:
+            sections += [shape.indices, shape.face_ends]
+        header = {
+            "version": OBJ_MODEL_VERSION,
+            "byteorder": sys.byteorder,
+            "materials": self.materials,
+            "has_starts": starts is not None,
+            "shapes": [shape.material_id for shape in self.shapes],
+            "sections": [len(section) for section in sections],
+        }
+        return b"".join(
+            [json.dumps(header).encode("utf-8"), b"\n"]
+            + [section.tobytes() for section in sections]
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional["ObjModel"]:
+        """The model serialized by `to_bytes`, None if the data is unusable."""
+        end = data.find(b"\n")
+        try:
+            header = json.loads(data[:end]) if end >= 0 else None
+        except ValueError:
+            return None
+        if not isinstance(header, dict) or header.get("version") != OBJ_MODEL_VERSION:
+            return None
+        typecodes = ["d"] + (["I"] if header["has_starts"] else [])
+        typecodes += ["i", "I"] * len(header["shapes"])
+        if len(typecodes) != len(header["sections"]):
+            return None
+
+        sections = []
+        offset = end + 1
+        for typecode, length in zip(typecodes, header["sections"]):
+            section = array(typecode)
+            size = length * section.itemsize
+            if offset + size > len(data):
+                return None
+            section.frombytes(data[offset : offset + size])
+            if header["byteorder"] != sys.byteorder:
+                section.byteswap()
+            sections.append(section)
+            offset += size
+
+        coords = sections.pop(0)
+        starts = sections.pop(0) if header["has_starts"] else None
+        shapes = [
+            ObjShape(material_id, sections[2 * index], sections[2 * index + 1])
+            for index, material_id in enumerate(header["shapes"])
+        ]
+        return cls(
+            vertices=ObjVertices.from_arrays(coords, starts),
+            materials=header["materials"],
+            shapes=shapes,
+        )
@@ -0,0 +1,311 @@
+"""Vertices of an EasyEDA OBJ mesh, parsed once for the WRL export and model placement."""
+
+from __future__ import annotations
+
+# Global imports
+import re
+from array import array
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    try:
+        import numpy as np
+    except ImportError:  # pragma: no cover - optional dependency
+        np = None
+
+# OBJ coordinates are divided by this to get VRML / KiCad 3D units
+OBJ_SCALE = 2.54
+# Decimals of the coordinates written to the WRL by default
+OBJ_PRECISION = 4
+# Characters of OBJ text parsed at once
+OBJ_CHUNK_SIZE = 1 << 20
+# Same matches as the original "v (.*?)\n" with DOTALL, without backtracking
+VERTEX_REGEX = re.compile("v ([^\n]*)\n")
+# Three spaces on one line: more than 3 coordinates
+_OVER_3D = re.compile(" [^ \n]* [^ \n]* ")
+
+# (center x, y, z, size x, y, z)
+ObjMetrics = Tuple[float, float, float, float, float, float]
+
+
+def iter_obj_chunks(
+    obj_data: Union[str, TextIO], size: int = OBJ_CHUNK_SIZE
+) -> Iterator[str]:
+    """Yield an OBJ text in pieces of about `size` characters, cut after a newline."""
+    if isinstance(obj_data, str):
+        start = 0
+        while start < len(obj_data):
+            end = obj_data.find("\n", start + size) + 1 or len(obj_data)
+            yield obj_data[start:end]
+            start = end
+        return
+    rest = ""
+    while True:
+        block = obj_data.read(size)
+        if not block:
+            if rest:
+                yield rest
+            return
+        block = rest + block
+        end = block.rfind("\n") + 1
+        yield block[:end]
+        rest = block[end:]
+
+
+def first_use_unique(values, axis: Optional[int] = None):
+    """
+    With NumPy: the offsets of the distinct entries of `values`, in order
+    of first use, and the position in that list of every entry.
+    """
+    _, first, inverse = np.unique(
+        values, return_index=True, return_inverse=True, axis=axis
+    )
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return first[order], rank[inverse.ravel()]
+
+
+class ObjVertices:
+    """
+    The `v` coordinates of an OBJ mesh, in one flat buffer.
+
+    With NumPy, every batch of vertex lines is converted by one vectorized
+    call, and batches are joined into a single contiguous float64 array
+    when first used; bounds are then min / max reductions over its
+    columns. Without NumPy the same values are kept in an `array("d")`.
+
+    Coordinates stay in OBJ units. Dividing by OBJ_SCALE is monotonic, so
+    `metrics` scales only the bounds and still matches the previous
+    per-vertex computation exactly. `format_points` uses a scaled copy
+    rounded to OBJ_PRECISION (or the requested) decimals exactly like
+    round() in the original WRL exporter, made once on first use.
+    """
+
+    def __init__(self, use_numpy: Optional[bool] = None) -> None:
+        self.use_numpy = np is not None and use_numpy is not False
+        # A float64 NumPy array when `use_numpy`, else an array("d")
+        self._coords: Any = np.empty(0) if self.use_numpy else array("d")
+        self._pending: List[Any] = []
+        self._rounded: Any = None
+        self._rounded_precision = OBJ_PRECISION
+        # Offsets into the coordinates, only kept once a vertex is not 3D
+        self._starts: Optional[array] = None
+        self._count = 0
+
+    @classmethod
+    def from_arrays(
+        cls, coords: array, starts: Optional[array] = None, use_numpy: Optional[bool] = None
+    ) -> "ObjVertices":
+        """Rebuild from `coords` / `starts` as returned by `arrays`."""
+        vertices = cls(use_numpy=use_numpy and starts is None)
+        if starts is not None:
+            vertices._coords = coords
+            vertices._starts = starts
+            vertices._count = len(starts) - 1
+        else:
+            vertices._coords = (
+                np.array(coords, dtype=np.float64) if vertices.use_numpy else coords
+            )
+            vertices._count = len(coords) // 3
+        return vertices
+
+    def arrays(self) -> Tuple[array, Optional[array]]:
+        """Coordinates as an `array("d")`, and the per-vertex offsets if not all 3D."""
+        coords = self.coords
+        if self.use_numpy:
+            coords = array("d", coords.tobytes())
+        return coords, self._starts
+
+    def __len__(self) -> int:
+        return self._count
+
+    def extend(self, values: List[str]) -> None:
+        """Add vertices from the text after `v ` of their lines."""
+        if not values:
+            return
+        self._rounded = None
+        text = "\n".join(values)
+        # At most 2 spaces per line and 2 on average: exactly 3 coordinates each
+        if (
+            self._starts is None
+            and text.count(" ") == 2 * len(values)
+            and not _OVER_3D.search(text)
+        ):
+            if self.use_numpy:
+                coords = np.array(text.split(), dtype=np.float64)
+                if coords.size != 3 * len(values):
+                    raise ValueError("Malformed OBJ vertices")
+                self._pending.append(coords)
+            else:
+                self._coords.extend(map(float, text.replace("\n", " ").split(" ")))
+            self._count += len(values)
+            return
+
+        # Rare: vertices with more or fewer than 3 coordinates
+        if self._starts is None:
+            self._coords = array("d", self.coords)
+            self._pending = []
+            self.use_numpy = False
+            self._starts = array("I", range(0, len(self._coords) + 1, 3))
+        for value in values:
+            self._coords.extend(map(float, value.split(" ")))
+            self._starts.append(len(self._coords))
+        self._count += len(values)
+
+    @property
+    def coords(self):
+        """All coordinates, flat; a NumPy array when `use_numpy`."""
+        if self._pending:
+            self._coords = np.concatenate([self._coords, *self._pending])
+            self._pending = []
+        return self._coords
+
+    def _rounded_coords(self, precision: int = OBJ_PRECISION):
+        """Coordinates divided by OBJ_SCALE and rounded like round(value, precision)."""
+        if self._rounded is not None and self._rounded_precision == precision:
+            return self._rounded
+        coords = self.coords
+        if self.use_numpy:
+            scale = 10.0**precision
+            scaled = coords / OBJ_SCALE
+            shifted = scaled * scale
+            steps = np.rint(shifted)
+            rounded = steps / scale
+            # round() rounds the exact value; rint() may pick the other step
+            # only when the product lands within a few ulps of a half step
+            near_half = np.abs(np.abs(shifted - steps) - 0.5) <= 4 * np.spacing(
+                np.abs(shifted)
+            )
+            for position in np.flatnonzero(near_half).tolist():
+                rounded[position] = round(float(scaled[position]), precision)
+        else:
+            rounded = array(
+                "d", [round(value / OBJ_SCALE, precision) for value in coords]
+            )
+        self._rounded = rounded
+        self._rounded_precision = precision
+        return rounded
+
+    def _position(self, index: int) -> int:
+        # Like the original list lookup, 0 and negative indices count from the end
+        return index - 1 if index > 0 else index - 1 + self._count
+
+    def _positions(self, indices: Sequence[int]):
+        """NumPy array of the 0-based positions of 1-based OBJ indices."""
+        positions = np.asarray(indices, dtype=np.int64) - 1
+        positions[positions < 0] += self._count
+        return positions
+
+    def _point(self, rounded, index: int):
+        if self._starts is not None:
+            position = self._position(index)
+            return rounded[self._starts[position] : self._starts[position + 1]]
+        offset = 3 * self._position(index)
+        return rounded[offset : offset + 3]
+
+    def merge_points(
+        self,
+        indices: Sequence[int],
+        positions: Sequence[int],
+        precision: int = OBJ_PRECISION,
+    ) -> Tuple[Sequence[int], Sequence[int]]:
+        """
+        Drop the `indices` whose vertex rounds to the same point as an
+        earlier one. `positions` refer to `indices`; returns the remaining
+        indices and `positions` moved to refer to them.
+        """
+        rounded = self._rounded_coords(precision)
+        if self.use_numpy and self._starts is None:
+            points = rounded.reshape(-1, 3)[self._positions(indices)]
+            first, moved = first_use_unique(points, axis=0)
+            return np.asarray(indices)[first], moved[np.asarray(positions)]
+
+        # Rounded point -> its position in the remaining indices
+        link: dict = {}
+        kept: List[int] = []
+        merged: List[int] = []
+        for index in indices:
+            key = tuple(self._point(rounded, index))
+            position = link.get(key)
+            if position is None:
+                position = link[key] = len(kept)
+                kept.append(index)
+            merged.append(position)
+        return kept, array("i", [merged[position] for position in positions])
+
+    def format_points(
+        self, indices: Sequence[int], precision: int = OBJ_PRECISION
+    ) -> str:
+        """The vertices at the given 1-based OBJ indices, as "x y z, x y z"."""
+        if not len(indices):
+            return ""
+        rounded = self._rounded_coords(precision)
+        if self._starts is not None:
+            return ", ".join(
+                " ".join(map(str, self._point(rounded, index))) for index in indices
+            )
+
+        if self.use_numpy:
+            values = rounded.reshape(-1, 3)[self._positions(indices)].ravel().tolist()
+        else:
+            values = []
+            extend = values.extend
+            count = self._count
+            for index in indices:
+                offset = 3 * (index - 1 if index > 0 else index - 1 + count)
+                extend(rounded[offset : offset + 3])
+        # One formatting call for the whole batch; %r of a float is its str()
+        return (("%r %r %r, " * len(indices)) % tuple(values))[:-2]
+
+    def metrics(self) -> Optional[ObjMetrics]:
+        """Center and size of the bounding box of the 3D vertices, None if empty."""
+        coords = self.coords
+        if self._starts is not None:
+            points = [
+                coords[start : start + 3]
+                for start, end in zip(self._starts, self._starts[1:])
+                if end - start == 3
+            ]
+            if not points:
+                return None
+            axes = list(zip(*points))
+            lows = [min(axis) for axis in axes]
+            highs = [max(axis) for axis in axes]
+        elif not self._count:
+            return None
+        elif self.use_numpy:
+            points = coords.reshape(-1, 3)
+            lows = points.min(axis=0).tolist()
+            highs = points.max(axis=0).tolist()
+        else:
+            lows = [min(coords[axis::3]) for axis in range(3)]
+            highs = [max(coords[axis::3]) for axis in range(3)]
+        lows = [low / OBJ_SCALE for low in lows]
+        highs = [high / OBJ_SCALE for high in highs]
+        return (
+            *((low + high) / 2 for low, high in zip(lows, highs)),
+            *(high - low for low, high in zip(lows, highs)),
+        )
+
+
+def parse_obj_vertices(
+    obj_data: Union[str, TextIO], use_numpy: Optional[bool] = None
+) -> ObjVertices:
+    """Read every vertex of an OBJ text in one pass."""
+    vertices = ObjVertices(use_numpy=use_numpy)
+    for chunk in iter_obj_chunks(obj_data):
+        vertices.extend(VERTEX_REGEX.findall(chunk))
+    return vertices
@@ -5,6 +5,7 @@ from typing import List, Optional, Tuple, Union
 
 from pydantic import BaseModel, field_validator
 
+from easyeda2kicad.easyeda.obj_model import ObjModel
 from easyeda2kicad.easyeda.svg_path_parser import parse_svg_path
 
 
@@ -537,16 +538,106 @@ class Ee3dModelBase(BaseModel):
         self.z = convert_to_mm(self.z)
 
 
+class Ee3dModelPayload:
+    """OBJ / STEP payloads of a 3D model, already available in memory."""
+
+    def __init__(
+        self,
+        raw_obj: Optional[str] = None,
+        step: Optional[bytes] = None,
+        step_path: Optional[str] = None,
+    ) -> None:
+        self._raw_obj = raw_obj
+        self._step = step
+        self._step_path = step_path
+        self._obj_model: Optional[ObjModel] = None
+
+    @property
+    def raw_obj(self) -> Optional[str]:
+        return self._raw_obj
+
+    @raw_obj.setter
+    def raw_obj(self, value: Optional[str]) -> None:
+        self._raw_obj = value
+        self._obj_model = None
+
+    @property
+    def obj_model(self) -> Optional[ObjModel]:
+        """The OBJ mesh, parsed from `raw_obj` on first use."""
+        if self._obj_model is None and self.raw_obj:
+            self._obj_model = ObjModel.parse(self.raw_obj)
+        return self._obj_model
+
+    @obj_model.setter
+    def obj_model(self, value: Optional[ObjModel]) -> None:
+        self._obj_model = value
+
+    @property
+    def step(self) -> Optional[bytes]:
+        return self._step
+
+    @step.setter
+    def step(self, value: Optional[bytes]) -> None:
+        self._step = value
+
+    @property
+    def step_path(self) -> Optional[str]:
+        return self._step_path
+
+    @step_path.setter
+    def step_path(self, value: Optional[str]) -> None:
+        self._step_path = value
+
+    def fetched_step_path(self) -> Optional[str]:
+        """`step_path`, without starting a download that was not requested yet."""
+        return self._step_path
+
+    def prefetch(self, obj: bool = True, step: bool = True) -> None:
+        """Start loading the payloads in the background; they already are here."""
+
+
 @dataclass
 class Ee3dModel:
     name: str
     uuid: str
     translation: Ee3dModelBase
     rotation: Ee3dModelBase
-    raw_obj: str = None
-    step: bytes = None
     center: Optional[Tuple[float, float, float]] = None
     size: Optional[Tuple[float, float, float]] = None
+    payload: Ee3dModelPayload = field(
+        default_factory=Ee3dModelPayload, repr=False, compare=False
+    )
+
+    # The payload may be a lazy handle: reading these properties is what
+    # triggers the download, so only touch them when the data is needed.
+    @property
+    def raw_obj(self) -> Optional[str]:
+        return self.payload.raw_obj
+
+    @raw_obj.setter
+    def raw_obj(self, value: Optional[str]) -> None:
+        self.payload.raw_obj = value
+
+    @property
+    def obj_model(self) -> Optional[ObjModel]:
+        """Parsed `raw_obj`, shared by the model placement and the WRL export."""
+        return self.payload.obj_model
+
+    @property
+    def step(self) -> Optional[bytes]:
+        return self.payload.step
+
+    @step.setter
+    def step(self, value: Optional[bytes]) -> None:
+        self.payload.step = value
+
+    @property
+    def step_path(self) -> Optional[str]:
+        return self.payload.step_path
+
+    @step_path.setter
+    def step_path(self, value: Optional[str]) -> None:
+        self.payload.step_path = value
 
     def convert_to_mm(self) -> None:
         self.translation.convert_to_mm()
@@ -5,143 +5,339 @@ Convert 3D model from .obj format to .wrl with colors
 from __future__ import annotations
 
 # Global imports
+import gzip
+import io
+import logging
 import os
-import re
+import shutil
+import tempfile
 import textwrap
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import IO, Iterator, Optional, TextIO, Union
 
+from easyeda2kicad.easyeda.model_store import ModelBlobStore
+from easyeda2kicad.easyeda.obj_model import ObjModel, ObjShape
+from easyeda2kicad.easyeda.obj_vertices import OBJ_PRECISION, ObjVertices
 from easyeda2kicad.easyeda.parameters_easyeda import Ee3dModel
-from easyeda2kicad.kicad.parameters_kicad_footprint import Ki3dModel
+from easyeda2kicad.kicad.parameters_kicad_footprint import Ki3dModel, Ki3dModelBase
 
 VRML_HEADER = """#VRML V2.0 utf8
 # 3D model generated by easyeda2kicad.py (https://github.com/uPesy/easyeda2kicad.py)
 """
+# Decimals accepted for the WRL coordinates
+WRL_PRECISIONS = range(0, 9)
+# zlib level of .wrz files: within 1% of level 9 on meshes, about 10x faster
+_GZIP_LEVEL = 3
 
 
-def get_materials(obj_data: str) -> dict:
-
-    material_regex = "newmtl .*?endmtl"
-    matchs = re.findall(pattern=material_regex, string=obj_data, flags=re.DOTALL)
-
-    materials = {}
-    for match in matchs:
-        material = {}
-        for value in match.splitlines():
-            if value.startswith("newmtl"):
-                material_id = value.split(" ")[1]
-            elif value.startswith("Ka"):
-                material["ambient_color"] = value.split(" ")[1:]
-            elif value.startswith("Kd"):
-                material["diffuse_color"] = value.split(" ")[1:]
-            elif value.startswith("Ks"):
-                material["specular_color"] = value.split(" ")[1:]
-            elif value.startswith("d"):
-                # This isn't exactly the same as transparency, is dissolve
-                # I.e. part C115366 (SW-TH_SPEF110100) has d=1, and isn't transparent
-                material["transparency"] = value.split(" ")[1]
-
-        materials[material_id] = material
-    return materials
-
-
-def get_vertices(obj_data: str) -> list:
-    vertices_regex = "v (.*?)\n"
-    matchs = re.findall(pattern=vertices_regex, string=obj_data, flags=re.DOTALL)
-
-    return [
-        " ".join([str(round(float(coord) / 2.54, 4)) for coord in vertice.split(" ")])
-        for vertice in matchs
-    ]
-
-
-def generate_wrl_model(model_3d: Ee3dModel) -> Ki3dModel:
-    materials = get_materials(obj_data=model_3d.raw_obj)
-    vertices = get_vertices(obj_data=model_3d.raw_obj)
-
-    raw_wrl = VRML_HEADER
-    shapes = model_3d.raw_obj.split("usemtl")[1:]
-    for shape in shapes:
-        lines = shape.splitlines()
-        material = materials[lines[0].replace(" ", "")]
-        index_counter = 0
-        link_dict = {}
-        coord_index = []
-        points = []
-        for line in lines[1:]:
-            if len(line) > 0:
-                face = [int(index) for index in line.replace("//", "").split(" ")[1:]]
-                face_index = []
-                for index in face:
-                    if index not in link_dict:
-                        link_dict[index] = index_counter
-                        face_index.append(str(index_counter))
-                        points.append(vertices[index - 1])
-                        index_counter += 1
-                    else:
-                        face_index.append(str(link_dict[index]))
-                face_index.append("-1")
-                coord_index.append(",".join(face_index) + ",")
-        points.insert(-1, points[-1])
-
-        shape_str = textwrap.dedent(
-            f"""
-            Shape{{
-                appearance Appearance {{
-                    material  Material 	{{
-                        diffuseColor {' '.join(material['diffuse_color'])}
-                        specularColor {' '.join(material['specular_color'])}
-                        ambientIntensity 0.2
-                        transparency 0
-                        shininess 0.5
-                    }}
-                }}
-                geometry IndexedFaceSet {{
-                    ccw TRUE
-                    solid FALSE
-                    coord DEF co Coordinate {{
-                        point [
-                            {(", ").join(points)}
-                        ]
-                    }}
-                    coordIndex [
-                        {"".join(coord_index)}
-                    ]
-                }}
-            }}"""
+@dataclass(frozen=True)
+class WrlOptions:
+    """
+    How the VRML of a 3D model is written.
+
+    `compress` writes a gzipped VRML file with the .wrz extension, which
+    KiCad reads like a .wrl. `precision` is the number of decimals of the
+    coordinates, and `merge_points` lists the vertices of a shape that
+    round to the same point only once. The defaults give the plain .wrl
+    of previous versions.
+    """
+
+    compress: bool = False
+    precision: int = OBJ_PRECISION
+    merge_points: bool = False
+
+    def __post_init__(self) -> None:
+        if self.precision not in WRL_PRECISIONS:
+            raise ValueError(
+                f"WRL precision must be between {WRL_PRECISIONS.start}"
+                f" and {WRL_PRECISIONS.stop - 1} decimals"
+            )
+
+    @property
+    def extension(self) -> str:
+        return "wrz" if self.compress else "wrl"
+
+    @property
+    def store_kind(self) -> str:
+        """ModelBlobStore kind of the files written with these options."""
+        kind = self.extension
+        if self.precision != OBJ_PRECISION:
+            kind += f".p{self.precision}"
+        if self.merge_points:
+            kind += ".merged"
+        return kind
+
+
+@dataclass
+class WrlStats:
+    """Size of a written 3D model: its VRML text and the file on disk."""
+
+    vrml_bytes: int
+    file_bytes: int
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.vrml_bytes - self.file_bytes
+
+    def describe(self) -> str:
+        saved = self.saved_bytes
+        ratio = saved / self.vrml_bytes if self.vrml_bytes else 0
+        return (
+            f"{self.vrml_bytes} bytes of VRML written as {self.file_bytes} bytes"
+            f" ({saved} bytes saved, {ratio:.0%})"
         )
 
-        raw_wrl += shape_str
 
+_SHAPE_TEMPLATE = textwrap.dedent(
+    """
+    Shape{{
+        appearance Appearance {{
+            material  Material 	{{
+                diffuseColor {diffuse_color}
+                specularColor {specular_color}
+                ambientIntensity 0.2
+                transparency 0
+                shininess 0.5
+            }}
+        }}
+        geometry IndexedFaceSet {{
+            ccw TRUE
+            solid FALSE
+            coord DEF co Coordinate {{
+                point [
+                    {points}
+                ]
+            }}
+            coordIndex [
+                {coord_index}
+            ]
+        }}
+    }}"""
+)
+_SHAPE_HEAD, _, _rest = _SHAPE_TEMPLATE.partition("{points}")
+_SHAPE_MIDDLE, _, _SHAPE_TAIL = _rest.partition("{coord_index}")
+_SHAPE_MIDDLE = _SHAPE_MIDDLE.format()
+_SHAPE_TAIL = _SHAPE_TAIL.format()
+del _rest
+
+# Points / indices formatted per write() call when streaming a shape
+_WRITE_BATCH = 4096
+# Bytes buffered before the WRL file is written to, instead of the default 8 KiB
+_WRITE_BUFFER = 1 << 20
+
+
+@lru_cache(maxsize=None)
+def _face_format(size: int) -> str:
+    return "%d," * size + "-1,"
+
+
+def _write_shape(
+    out: TextIO,
+    shape: ObjShape,
+    material: dict,
+    vertices: ObjVertices,
+    options: WrlOptions,
+) -> None:
+    points, positions = shape.remap()
+    if options.merge_points:
+        points, positions = vertices.merge_points(points, positions, options.precision)
+    precision = options.precision
+
+    head = _SHAPE_HEAD.format(
+        diffuse_color=" ".join(material["diffuse_color"]),
+        specular_color=" ".join(material["specular_color"]),
+    )
+    # Like textwrap.dedent, an empty list leaves an empty line
+    out.write(head if len(points) else head.rstrip(" "))
+    for start in range(0, len(points), _WRITE_BATCH):
+        out.write(
+            vertices.format_points(points[start : start + _WRITE_BATCH], precision)
+        )
+        out.write(", ")
+    if len(points):
+        # Kept from the original exporter: the last point is listed twice
+        out.write(vertices.format_points(points[-1:], precision))
+
+    face_ends = shape.face_ends
+    out.write(_SHAPE_MIDDLE if len(face_ends) else _SHAPE_MIDDLE.rstrip(" "))
+    begin = 0
+    for start in range(0, len(face_ends), _WRITE_BATCH):
+        ends = face_ends[start : start + _WRITE_BATCH]
+        sizes = [end - previous for previous, end in zip([begin, *ends], ends)]
+        batch = positions[begin : ends[-1]]
+        values = batch.tolist() if hasattr(batch, "tolist") else tuple(batch)
+        if sizes.count(sizes[0]) == len(sizes):
+            # Only triangles (or only quads): one repeated format
+            template = _face_format(sizes[0]) * len(sizes)
+        else:
+            template = "".join(map(_face_format, sizes))
+        out.write(template % tuple(values))
+        begin = ends[-1]
+    out.write(_SHAPE_TAIL)
+
+
+def write_wrl_model(
+    obj_model: Union[ObjModel, str, TextIO],
+    out: TextIO,
+    options: Optional[WrlOptions] = None,
+) -> None:
+    """
+    Write an OBJ mesh as VRML to `out`, one shape at a time.
+
+    Only the vertex remapping of the shape being written is held in
+    memory besides the parsed model; OBJ text is parsed first.
+    """
+    if not isinstance(obj_model, ObjModel):
+        obj_model = ObjModel.parse(obj_model)
+    options = options or WrlOptions()
+    out.write(VRML_HEADER)
+    for shape in obj_model.shapes:
+        _write_shape(
+            out,
+            shape,
+            obj_model.materials[shape.material_id],
+            obj_model.vertices,
+            options,
+        )
+
+
+def write_wrl_file(obj_model: ObjModel, out: IO[bytes], options: WrlOptions) -> int:
+    """Write the WRL (gzipped if `options.compress`) to `out`; returns the VRML size."""
+    binary: Union[IO[bytes], gzip.GzipFile] = out
+    if options.compress:
+        # No name or time in the header: the same model gives the same file
+        binary = gzip.GzipFile(
+            filename="", mode="wb", compresslevel=_GZIP_LEVEL, fileobj=out, mtime=0
+        )
+    # newline="": the file must not depend on the platform
+    wrl = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+    write_wrl_model(obj_model, wrl, options)
+    wrl.flush()
+    # The uncompressed offset for a GzipFile
+    vrml_bytes = binary.tell()
+    wrl.detach()
+    if binary is not out:
+        binary.close()
+    return vrml_bytes
+
+
+def generate_wrl_model(model_3d: Ee3dModel) -> Optional[Ki3dModel]:
+    obj_model = model_3d.obj_model
+    if obj_model is None:
+        return None
+    raw_wrl = io.StringIO()
+    write_wrl_model(obj_model, raw_wrl)
     return Ki3dModel(
-        translation=None, rotation=None, name=model_3d.name, raw_wrl=raw_wrl
+        translation=Ki3dModelBase(),
+        rotation=Ki3dModelBase(),
+        name=model_3d.name,
+        raw_wrl=raw_wrl.getvalue(),
+    )
+
+
+@contextmanager
+def _replacing(path: str, mode: str = "wb", **kwargs) -> Iterator[IO]:
+    """Open a temporary file that replaces `path` once the block succeeds."""
+    # Always write a new inode: the target may be hard-linked to the model
+    # store (or another library), which must not be modified in place.
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=".easyeda2kicad-"
     )
+    try:
+        with os.fdopen(fd, mode, **kwargs) as tmp_file:
+            yield tmp_file
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _replace_file(path: str, data: bytes) -> None:
+    with _replacing(path) as tmp_file:
+        tmp_file.write(data)
 
 
 class Exporter3dModelKicad:
-    def __init__(self, model_3d: Ee3dModel):
+    def __init__(
+        self,
+        model_3d: Optional[Ee3dModel],
+        model_store: Optional[ModelBlobStore] = None,
+        options: Optional[WrlOptions] = None,
+    ):
         self.input = model_3d
+        self.model_store = model_store
+        self.options = options or WrlOptions()
+        # Sizes of the last WRL written by export(), None if none was written
+        self.stats: Optional[WrlStats] = None
+        uuid = model_3d.uuid if model_3d else None
+        self.reuse_stored = bool(
+            model_store is not None
+            and uuid
+            and model_store.contains(uuid, self.options.store_kind)
+        )
+        # The WRL itself is streamed to disk by export(), from the parsed OBJ
         self.output = (
-            generate_wrl_model(model_3d=model_3d)
-            if model_3d and model_3d.raw_obj
+            Ki3dModel(
+                translation=Ki3dModelBase(),
+                rotation=Ki3dModelBase(),
+                name=model_3d.name,
+            )
+            if model_3d and (self.reuse_stored or model_3d.obj_model)
             else None
         )
-        self.output_step = model_3d.step
+        self.output_step = model_3d.step if model_3d else None
+
+    @property
+    def has_step(self) -> bool:
+        return bool(self.output_step or (self.input and self.input.step_path))
 
     def export(self, lib_path: str) -> None:
         model_base_name = os.path.splitext(self.output.name or "")[0] if self.output else ""
         if not model_base_name:
             model_base_name = "easyeda_model"
         model_base_name = model_base_name.replace("\\", "_").replace("/", "_")
+        wrl_path = f"{lib_path}.3dshapes/{model_base_name}.{self.options.extension}"
+        step_path = f"{lib_path}.3dshapes/{model_base_name}.step"
+        model_3d = self.input
+        uuid = model_3d.uuid if model_3d else ""
+        # Models are only stored under their uuid
+        store = self.model_store if uuid else None
+        store_kind = self.options.store_kind
 
-        if self.output:
-            with open(
-                file=f"{lib_path}.3dshapes/{model_base_name}.wrl",
-                mode="w",
-                encoding="utf-8",
-            ) as my_lib:
-                my_lib.write(self.output.raw_wrl)
-        if self.output_step:
-            with open(
-                file=f"{lib_path}.3dshapes/{model_base_name}.step",
-                mode="wb",
-            ) as my_lib:
-                my_lib.write(self.output_step)
+        if self.output and model_3d is not None:
+            placed = (
+                self.reuse_stored
+                and store is not None
+                and store.materialize(uuid, store_kind, wrl_path)
+            )
+            obj_model = None if placed else model_3d.obj_model
+            if obj_model:
+                with _replacing(wrl_path, buffering=_WRITE_BUFFER) as wrl:
+                    vrml_bytes = write_wrl_file(obj_model, wrl, self.options)
+                self.stats = WrlStats(
+                    vrml_bytes=vrml_bytes, file_bytes=os.path.getsize(wrl_path)
+                )
+                logging.debug(f"{os.path.basename(wrl_path)}: {self.stats.describe()}")
+                if store is not None:
+                    store.put_file(uuid, store_kind, wrl_path)
+        streamed_step = model_3d.step_path if model_3d else None
+        if not self.output_step and streamed_step:
+            # The importer already streamed the STEP file to disk
+            if os.path.abspath(streamed_step) != os.path.abspath(step_path):
+                with open(streamed_step, "rb") as source, _replacing(
+                    step_path
+                ) as target:
+                    shutil.copyfileobj(source, target)
+        elif self.output_step:
+            linked = (
+                store is not None
+                and store.link_mode != "copy"
+                and store.materialize(uuid, "step", step_path)
+            )
+            if not linked:
+                _replace_file(step_path, self.output_step)
@@ -734,7 +734,32 @@ class ExporterFootprintKicad:
         footprint_full_path: str,
         model_3d_path: str,
         model_3d_path_is_explicit: bool = False,
+        model_3d_extension: str = "wrl",
     ) -> None:
+        ki_lib = self.render(
+            model_3d_path=model_3d_path,
+            model_3d_path_is_explicit=model_3d_path_is_explicit,
+            model_3d_extension=model_3d_extension,
+        )
+        with open(
+            file=footprint_full_path,
+            mode="w",
+            encoding="utf-8",
+        ) as my_lib:
+            my_lib.write(ki_lib)
+
+    def render(
+        self,
+        model_3d_path: str,
+        model_3d_path_is_explicit: bool = False,
+        model_3d_extension: str = "wrl",
+    ) -> str:
+        """
+        Return the .kicad_mod content written by `export`.
+
+        `model_3d_extension` is the one of the model file written next to
+        the library: "wrl", or "wrz" for compressed models.
+        """
         ki = self.output
         ki_lib = ""
 
@@ -794,16 +819,16 @@ class ExporterFootprintKicad:
             model_path = (model_3d_path or "").strip()
             if model_3d_path_is_explicit:
                 trimmed = model_path.rstrip("/\\")
-                file_3d = f"{trimmed}/{model_base_name}.wrl"
+                file_3d = f"{trimmed}/{model_base_name}.{model_3d_extension}"
             else:
                 model_path = model_path.replace("\\", "/").rstrip("/")
             if not model_3d_path_is_explicit and "${KIPRJMOD}" in model_path:
                 cleaned = model_path.replace("..${KIPRJMOD}", "${KIPRJMOD}")
-                file_3d = f"{cleaned}/{model_base_name}.wrl"
+                file_3d = f"{cleaned}/{model_base_name}.{model_3d_extension}"
             elif not model_3d_path_is_explicit and model_path.startswith("${"):
-                file_3d = f"{model_path}/{model_base_name}.wrl"
+                file_3d = f"{model_path}/{model_base_name}.{model_3d_extension}"
             elif not model_3d_path_is_explicit:
-                file_3d = f"..{model_path}/{model_base_name}.wrl"
+                file_3d = f"..{model_path}/{model_base_name}.{model_3d_extension}"
             ki_lib += KI_MODEL_3D.format(
                 file_3d=file_3d,
                 pos_x=ki.model_3d.translation.x,
@@ -816,9 +841,4 @@ class ExporterFootprintKicad:
 
         ki_lib += KI_END_FILE
 
-        with open(
-            file=footprint_full_path,
-            mode="w",
-            encoding="utf-8",
-        ) as my_lib:
-            my_lib.write(ki_lib)
+        return ki_lib
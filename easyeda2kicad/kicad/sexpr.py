@@ -0,0 +1,128 @@
+# Global imports
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Parentheses and complete quoted strings (which may contain parentheses)
+_TOKEN_PATTERN = re.compile(r'[()]|"(?:[^"\\]|\\.)*"')
+# Same, plus bare atoms (keywords, numbers, yes/no ...)
+_ATOM_PATTERN = re.compile(r'[()]|"(?:[^"\\]|\\.)*"|[^\s()"]+')
+_STRING_PATTERN = re.compile(r'\s*"((?:[^"\\]|\\.)*)"')
+
+
+def unquote(value: str) -> str:
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+def iter_top_level_lists(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    Yield the (start, end) spans of the lists directly inside the root list
+    of a KiCad S-expression document, e.g. every `(symbol ...)` of a
+    .kicad_sym file, in a single pass over `text`.
+    """
+    depth = 0
+    start = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        if token == "(":
+            depth += 1
+            if depth == 2:
+                start = match.start()
+        elif token == ")":
+            if depth == 2:
+                yield start, match.end()
+            depth -= 1
+
+
+def list_head(text: str, start: int) -> Tuple[str, Optional[str]]:
+    """
+    Return the keyword of the list opening at `start` and its first
+    argument when that is a quoted string, e.g. ("symbol", "R_0402").
+    """
+    position = start + 1
+    end = position
+    while end < len(text) and not text[end].isspace() and text[end] not in '()"':
+        end += 1
+    keyword = text[position:end]
+    match = _STRING_PATTERN.match(text, end)
+    return keyword, unquote(match.group(1)) if match else None
+
+
+@dataclass
+class SymbolBlock:
+    """A top-level symbol of a library: its name, span and properties."""
+
+    name: str
+    start: int
+    end: int = 0
+    properties: Dict[str, str] = field(default_factory=dict)
+
+    def get_property(self, key: str) -> Optional[str]:
+        value = self.properties.get(key)
+        if value is None:
+            lowered = key.lower()
+            for name, candidate in self.properties.items():
+                if name.lower() == lowered:
+                    return candidate
+        return value
+
+
+def tokenize(text: str) -> Iterator[Tuple[str, int]]:
+    """Yield every token of `text` with its offset, quoted strings kept whole."""
+    for match in _ATOM_PATTERN.finditer(text):
+        yield match.group(), match.start()
+
+
+def iter_symbols(text: str) -> Iterator[SymbolBlock]:
+    """
+    Yield the top-level `(symbol ...)` entries of a .kicad_sym document in a
+    single pass, with the values of their own `(property "key" "value")`
+    lists. Units nested inside a symbol are not reported separately.
+    """
+    depth = 0
+    opening = 0
+    keyword_expected = False
+    current: Optional[SymbolBlock] = None
+    name_expected = False
+    property_args: Optional[List[str]] = None
+
+    for token, position in tokenize(text):
+        if token == "(":
+            depth += 1
+            keyword_expected = True
+            opening = position
+            continue
+        if token == ")":
+            if current is not None:
+                if depth == 3 and property_args is not None:
+                    if len(property_args) == 2:
+                        current.properties.setdefault(*property_args)
+                    property_args = None
+                elif depth == 2:
+                    current.end = position + 1
+                    yield current
+                    current = None
+            depth -= 1
+            keyword_expected = False
+            continue
+
+        if keyword_expected:
+            keyword_expected = False
+            if depth == 2 and token == "symbol":
+                current = SymbolBlock(name="", start=opening)
+                name_expected = True
+            elif depth == 3 and current is not None and token == "property":
+                property_args = []
+            continue
+
+        if depth == 2 and name_expected:
+            name_expected = False
+            if current is not None and token.startswith('"'):
+                current.name = unquote(token[1:-1])
+        elif (
+            depth == 3
+            and property_args is not None
+            and len(property_args) < 2
+            and token.startswith('"')
+        ):
+            property_args.append(unquote(token[1:-1]))
@@ -0,0 +1,541 @@
+# Global imports
+import logging
+import os
+import re
+import shutil
+import tempfile
+import textwrap
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from easyeda2kicad.kicad.parameters_kicad_symbol import KicadVersion
+from easyeda2kicad.kicad.sexpr import (
+    SymbolBlock,
+    iter_symbols,
+    iter_top_level_lists,
+    list_head,
+    unquote,
+)
+
+_EASYEDA2KICAD_GENERATOR = "(generator https://github.com/uPesy/easyeda2kicad.py)"
+_V5_HEADER_PATTERN = re.compile(r"^#\n# (?P<name>.*)\n#\n", re.MULTILINE)
+_V5_DEF_PATTERN = re.compile(r"^DEF\s+(?P<name>\S+)", re.MULTILINE)
+_V5_FIELD_PATTERN = re.compile(
+    r'^F(?P<number>\d+)\s+"(?P<value>(?:[^"\\]|\\.)*)"(?P<rest>.*?)(?:"(?P<name>[^"]*)")?\s*$'
+)
+_V5_FIELD_NAMES = ("Reference", "Value", "Footprint", "Datasheet")
+_LCSC_PATTERNS = {
+    KicadVersion.v6: re.compile(r'\(property\s+"LCSC Part"\s+"([^"]+)"', re.IGNORECASE),
+    KicadVersion.v5: re.compile(
+        r'^\s*F6\s+"([^"]+)".*LCSC Part', re.IGNORECASE | re.MULTILINE
+    ),
+}
+
+
+def component_name_variants(component_name: str) -> List[str]:
+    """
+    Yield possible symbol identifiers used across tool versions.
+    Historically colons were left untouched; newer releases encode them
+    as {colon}. We must handle both to keep overwrite behaviour intact.
+    """
+    variants = [component_name]
+    legacy_variant = (
+        component_name.replace("{colon}", ":").replace("{COLON}", ":")
+    )
+    if legacy_variant not in variants:
+        variants.append(legacy_variant)
+    return variants
+
+
+def iter_symbols_v5(text: str) -> Iterator[SymbolBlock]:
+    """
+    Yield the DEF ... ENDDEF components of a KiCad 5 .lib file in one pass.
+    Fields are reported under their KiCad names (F2 as "Footprint", and
+    custom fields under their own name, e.g. "LCSC Part").
+    """
+    current: Optional[SymbolBlock] = None
+    position = 0
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if current is None:
+            if line.startswith("DEF "):
+                parts = stripped.split()
+                current = SymbolBlock(name=parts[1] if len(parts) > 1 else "", start=position)
+        elif stripped == "ENDDEF":
+            current.end = position + len(line.rstrip("\r\n"))
+            yield current
+            current = None
+        else:
+            field_match = _V5_FIELD_PATTERN.match(stripped)
+            if field_match:
+                number = int(field_match.group("number"))
+                if number < len(_V5_FIELD_NAMES):
+                    key = _V5_FIELD_NAMES[number]
+                else:
+                    key = field_match.group("name") or f"F{number}"
+                current.properties.setdefault(key, unquote(field_match.group("value")))
+        position += len(line)
+
+
+def iter_library_symbols(
+    text: str, kicad_version: KicadVersion
+) -> Iterator[SymbolBlock]:
+    """Yield the top-level symbols of a .kicad_sym (v6) or .lib (v5) library."""
+    if kicad_version == KicadVersion.v6:
+        return iter_symbols(text)
+    return iter_symbols_v5(text)
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FlushTicket:
+    """
+    Outcome of the flush that writes a set of pending library changes.
+
+    Every change made to a SymbolLibrary belongs to the library's current
+    ticket until it is written (`written`) or dropped by a failed flush or
+    a discard (`error`); the next changes then get a new ticket.
+    """
+
+    def __init__(self) -> None:
+        self.written = False
+        self.error: Optional[BaseException] = None
+
+
+class SymbolLibrary:
+    """
+    In-memory model of a .kicad_sym (v6) or .lib (v5) symbol library.
+
+    The file is split once into a prefix, one text chunk per top-level
+    symbol and a suffix, so rendering an unmodified library gives back the
+    original bytes. Symbols are indexed by name and by "LCSC Part" value, so
+    existence checks are dictionary lookups, and inserts, replacements and
+    sub-unit additions only touch the affected chunk, and `flush` writes the whole library
+    with a single atomic replace, however many parts were changed since
+    the previous flush.
+
+    Every change is also kept as a pending operation until flushed: should
+    the file have been modified by someone else in the meantime, it is
+    reloaded and the operations are replayed on top of it. `ticket` tells
+    whoever made a change whether it was eventually written, even when
+    another thread flushed (or dropped) it.
+
+    Instances are not thread-safe on their own; hold
+    `service.locks.library_lock(path)` while using them.
+    """
+
+    def __init__(self, path: str, kicad_version: KicadVersion) -> None:
+        self.path = path
+        self.kicad_version = kicad_version
+        self.prefix = ""
+        self.suffix = ""
+        self.names: List[str] = []
+        self.chunks: List[str] = []
+        self._positions: Dict[str, int] = {}
+        # Names of more than one block, e.g. from earlier releases
+        self._duplicates: Set[str] = set()
+        self._lcsc_positions: Dict[str, int] = {}
+        self._chunk_lcsc_ids: List[Optional[str]] = []
+        self._offsets: Optional[List[int]] = None
+        self._pending: List[Tuple[str, tuple]] = []
+        self._signature: Optional[Tuple[int, int]] = None
+        self._ticket = FlushTicket()
+        self.load()
+
+    # ------------------------------------------------------------ loading
+    def load(self) -> None:
+        with open(self.path, encoding="utf-8") as lib_file:
+            text = lib_file.read()
+        self._signature = _file_signature(self.path)
+        if self.kicad_version == KicadVersion.v6:
+            self._split_v6(text)
+        else:
+            self._split_v5(text)
+        self._reindex()
+
+    def _split_v6(self, text: str) -> None:
+        self.names, self.chunks = [], []
+        chunk_start = None
+        previous_end = 0
+        for start, end in iter_top_level_lists(text):
+            keyword, name = list_head(text, start)
+            if keyword != "symbol" or name is None:
+                continue
+            # A chunk starts right after the previous content, so it carries
+            # its own leading newline and indentation
+            leading = max(previous_end, len(text[:start].rstrip()))
+            if chunk_start is None:
+                chunk_start = leading
+                self.prefix = text[:leading]
+            else:
+                self.chunks[-1] += text[previous_end:leading]
+            self.names.append(name)
+            self.chunks.append(text[leading:end])
+            previous_end = end
+
+        if chunk_start is None:
+            last_paren = text.rfind(")")
+            if last_paren == -1:
+                raise ValueError(
+                    "Invalid KiCad library file: unable to locate closing parenthesis"
+                )
+            split_at = len(text[:last_paren].rstrip())
+            self.prefix, self.suffix = text[:split_at], text[split_at:]
+        else:
+            self.suffix = text[previous_end:]
+
+    def _split_v5(self, text: str) -> None:
+        self.names, self.chunks = [], []
+        previous_end = None
+        for definition in _V5_DEF_PATTERN.finditer(text):
+            end = text.find("\nENDDEF", definition.end())
+            if end == -1:
+                break
+            end = text.find("\n", end + 1)
+            end = len(text) if end == -1 else end + 1
+            start = definition.start()
+            name = definition.group("name")
+            # Keep the "#\n# name\n#\n" comment header with its component
+            header_start = text.rfind("#\n# ", 0, start)
+            if header_start != -1 and (previous_end is None or header_start >= previous_end):
+                header = _V5_HEADER_PATTERN.match(text, header_start)
+                if header and header.end() == start:
+                    start = header_start
+                    name = header.group("name")
+            if previous_end is None:
+                self.prefix = text[:start]
+            else:
+                self.chunks[-1] += text[previous_end:start]
+            self.names.append(name)
+            self.chunks.append(text[start:end])
+            previous_end = end
+
+        if previous_end is None:
+            self.prefix, self.suffix = text, ""
+        else:
+            self.suffix = text[previous_end:]
+
+    def _reindex(self) -> None:
+        self._positions = {}
+        self._duplicates = set()
+        self._lcsc_positions = {}
+        self._chunk_lcsc_ids = []
+        self._offsets = None
+        for index, name in enumerate(self.names):
+            if name in self._positions:
+                self._duplicates.add(name)
+            self._positions.setdefault(name, index)
+            self._chunk_lcsc_ids.append(None)
+            self._index_lcsc_id(index)
+
+    def _index_lcsc_id(self, index: int) -> None:
+        previous = self._chunk_lcsc_ids[index]
+        if previous is not None and self._lcsc_positions.get(previous) == index:
+            del self._lcsc_positions[previous]
+        match = _LCSC_PATTERNS[self.kicad_version].search(self.chunks[index])
+        lcsc_id = match.group(1).strip().upper() if match else None
+        self._chunk_lcsc_ids[index] = lcsc_id
+        if lcsc_id:
+            self._lcsc_positions.setdefault(lcsc_id, index)
+
+    # ------------------------------------------------------------ queries
+    def find(self, component_name: str) -> Optional[int]:
+        for variant in component_name_variants(component_name):
+            index = self._positions.get(variant)
+            if index is not None:
+                return index
+        return None
+
+    def contains(self, component_name: str) -> bool:
+        return self.find(component_name) is not None
+
+    def find_lcsc_id(self, lcsc_id: str) -> Optional[str]:
+        """Return the name of the symbol whose "LCSC Part" is `lcsc_id`."""
+        index = self._lcsc_positions.get(lcsc_id.strip().upper())
+        return None if index is None else self.names[index]
+
+    def span(self, component_name: str) -> Optional[Tuple[int, int]]:
+        """
+        Return the (start, end) byte offsets of `component_name` in the
+        UTF-8 encoded rendered library, including its leading whitespace.
+        """
+        index = self.find(component_name)
+        if index is None:
+            return None
+        if self._offsets is None:
+            offsets = [len(self._rendered_prefix().encode("utf-8"))]
+            for chunk in self.chunks:
+                offsets.append(offsets[-1] + len(chunk.encode("utf-8")))
+            self._offsets = offsets
+        return self._offsets[index], self._offsets[index + 1]
+
+    def _rendered_prefix(self) -> str:
+        if self.kicad_version == KicadVersion.v6:
+            return self.prefix.replace(
+                "(generator kicad_symbol_editor)", _EASYEDA2KICAD_GENERATOR, 1
+            )
+        return self.prefix
+
+    def render(self) -> str:
+        return self._rendered_prefix() + "".join(self.chunks) + self.suffix
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._pending)
+
+    @property
+    def ticket(self) -> FlushTicket:
+        """The ticket of the changes made since the last flush."""
+        return self._ticket
+
+    # ------------------------------------------------------------ changes
+    def _format_chunk(self, component_content: str) -> str:
+        if self.kicad_version == KicadVersion.v5:
+            return component_content
+        component_lines = component_content.split("\n")
+        return "\n" + "\n".join(
+            f"  {line}" if line.strip() else line for line in component_lines
+        )
+
+    @staticmethod
+    def _content_name(component_content: str, kicad_version: KicadVersion) -> str:
+        if kicad_version == KicadVersion.v5:
+            header = _V5_HEADER_PATTERN.search(component_content)
+            if header:
+                return header.group("name")
+            definition = _V5_DEF_PATTERN.search(component_content)
+            return definition.group("name") if definition else ""
+        start = component_content.find("(")
+        _, name = list_head(component_content, start) if start != -1 else ("", None)
+        return name or ""
+
+    def add(self, component_content: str, component_name: Optional[str] = None) -> None:
+        """Append a component (the text produced by ExporterSymbolKicad)."""
+        name = component_name or self._content_name(
+            component_content, self.kicad_version
+        )
+        self._pending.append(("add", (component_content, name)))
+        self._apply_add(component_content, name)
+
+    def _apply_add(self, component_content: str, name: str) -> None:
+        chunk = self._format_chunk(component_content)
+        if (
+            self.kicad_version == KicadVersion.v5
+            and self.chunks
+            and not self.chunks[-1].endswith("\n")
+        ):
+            chunk = "\n" + chunk
+        self.names.append(name)
+        self.chunks.append(chunk)
+        self._chunk_lcsc_ids.append(None)
+        if name in self._positions:
+            self._duplicates.add(name)
+        self._positions.setdefault(name, len(self.names) - 1)
+        self._index_lcsc_id(len(self.names) - 1)
+        self._offsets = None
+
+    def replace(self, component_name: str, component_content: str) -> None:
+        """Replace `component_name` in place, or append it when missing."""
+        self._pending.append(("replace", (component_name, component_content)))
+        self._apply_replace(component_name, component_content)
+
+    def _apply_replace(self, component_name: str, component_content: str) -> None:
+        index = self.find(component_name)
+        if index is None:
+            logging.warning(
+                "Unable to locate symbol '%s' in %s for update; appending new entry instead.",
+                component_name,
+                self.path,
+            )
+            self._apply_add(
+                component_content,
+                self._content_name(component_content, self.kicad_version)
+                or component_name,
+            )
+            return
+        new_chunk = self._format_chunk(component_content)
+        if self.kicad_version == KicadVersion.v6:
+            # Keep the blank lines that separated the old block from its neighbour
+            old_chunk = self.chunks[index]
+            whitespace = old_chunk[: len(old_chunk) - len(old_chunk.lstrip())]
+            leading = whitespace[: whitespace.rfind("\n") + 1] or "\n"
+            new_chunk = leading + new_chunk.lstrip("\n")
+        self.chunks[index] = new_chunk
+        self._index_lcsc_id(index)
+        self._offsets = None
+        variants = component_name_variants(component_name)
+        present = [variant for variant in variants if variant in self._positions]
+        if len(present) > 1 or self._duplicates.intersection(present):
+            self._remove_duplicates(index, variants)
+
+    def _remove_duplicates(self, kept: int, variants: List[str]) -> None:
+        # Like the regex rewrite it replaced, drop every other block of that name
+        for index in reversed(range(len(self.names))):
+            if index != kept and self.names[index] in variants:
+                del self.names[index]
+                del self.chunks[index]
+        self._reindex()
+
+    def add_sub_units(
+        self, component_name: str, sub_components_content: List[str]
+    ) -> None:
+        """Append the units of `sub_components_content` to a v6 symbol."""
+        if self.kicad_version != KicadVersion.v6:
+            logging.error(
+                "Multi-unit symbol insertion currently supported only for KiCad v6"
+            )
+            return
+        self._pending.append(("units", (component_name, list(sub_components_content))))
+        self._apply_sub_units(component_name, sub_components_content)
+
+    def _apply_sub_units(
+        self, component_name: str, sub_components_content: List[str]
+    ) -> None:
+        index = self.find(component_name)
+        if index is None:
+            logging.warning(
+                "Unable to locate base symbol '%s' when adding sub-units",
+                component_name,
+            )
+            return
+
+        unit_pattern = re.compile(
+            r'\(symbol "{}_0_1".*?\n\s*\)'.format(re.escape(component_name)),
+            re.DOTALL,
+        )
+        additional_units = []
+        for unit_index, component in enumerate(sub_components_content, start=1):
+            unit_match = unit_pattern.search(component)
+            if not unit_match:
+                logging.warning(
+                    "Skipping sub-symbol %s: unable to extract KiCad unit payload",
+                    unit_index,
+                )
+                continue
+            unit_block = unit_match.group(0).replace(
+                f"{component_name}_0_1", f"{component_name}_{unit_index}_1"
+            )
+            dedented_unit = textwrap.dedent(unit_block).strip("\n")
+            additional_units.append("\n" + textwrap.indent(dedented_unit, "  "))
+
+        if not additional_units:
+            return
+
+        chunk = self.chunks[index]
+        try:
+            prefix, suffix = chunk.rsplit("\n  )", 1)
+        except ValueError:
+            logging.error(
+                "Malformed symbol block encountered for '%s'; could not append sub-units",
+                component_name,
+            )
+            return
+        self.chunks[index] = prefix + "".join(additional_units) + "\n  )" + suffix
+        self._offsets = None
+
+    def discard(self, error: Optional[BaseException] = None) -> None:
+        """
+        Drop unflushed changes and go back to the file on disk.
+
+        `error` is reported on the ticket of the dropped changes.
+        """
+        if self._pending:
+            self._ticket.error = error or RuntimeError(
+                f"Unflushed changes to {self.path} were discarded"
+            )
+            self._ticket = FlushTicket()
+        self._pending = []
+        try:
+            self.load()
+        except OSError:
+            logging.warning("Unable to reload symbol library %s", self.path)
+
+    # ------------------------------------------------------------ writing
+    def flush(self) -> bool:
+        """
+        Write pending changes with one atomic replace of the library file.
+
+        Returns False when there was nothing to write.
+        """
+        if not self._pending:
+            return False
+        try:
+            self._write()
+        except BaseException as exc:
+            self.discard(exc)
+            raise
+        self._pending = []
+        self._signature = _file_signature(self.path)
+        self._ticket.written = True
+        self._ticket = FlushTicket()
+        return True
+
+    def _write(self) -> None:
+        if _file_signature(self.path) != self._signature:
+            # Modified behind our back: start again from the file on disk
+            pending = self._pending
+            self.load()
+            self._pending = pending
+            for operation, arguments in pending:
+                getattr(self, f"_apply_{_OPERATIONS[operation]}")(*arguments)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as tmp_file:
+                tmp_file.write(self.render())
+            try:
+                shutil.copymode(self.path, tmp_path)
+            except OSError:
+                pass
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+_OPERATIONS = {"add": "add", "replace": "replace", "units": "sub_units"}
+
+MAX_OPEN_LIBRARIES = 16
+
+_libraries: "OrderedDict[str, SymbolLibrary]" = OrderedDict()
+_libraries_lock = threading.Lock()
+
+
+def open_symbol_library(path: str, kicad_version: KicadVersion) -> SymbolLibrary:
+    """
+    Return the shared in-memory model of the library at `path`.
+
+    The model is reloaded when the file changed on disk (mtime or size)
+    and has no unflushed changes. Hold `library_lock(path)` while using it.
+    Only the MAX_OPEN_LIBRARIES most recently used models without unflushed
+    changes are kept.
+    """
+    key = os.path.normcase(os.path.abspath(path))
+    with _libraries_lock:
+        library = _libraries.get(key)
+    if library is None or library.kicad_version != kicad_version:
+        library = SymbolLibrary(path, kicad_version)
+    elif not library.dirty and _file_signature(path) != library._signature:
+        library.load()
+    with _libraries_lock:
+        _libraries[key] = library
+        _libraries.move_to_end(key)
+        evictable = [
+            name
+            for name, cached in _libraries.items()
+            if name != key and not cached.dirty
+        ]
+        while len(_libraries) > MAX_OPEN_LIBRARIES and evictable:
+            _libraries.pop(evictable.pop(0))
+    return library
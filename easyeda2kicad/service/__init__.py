@@ -1,5 +1,6 @@
 """Service-layer helpers for easyeda2kicad."""
 
+from .batch import BatchItemResult, BatchReport, read_bom, run_batch
 from .conversion import (
     ConversionError,
     ConversionRequest,
@@ -9,9 +10,13 @@ from .conversion import (
 )
 
 __all__ = [
+    "BatchItemResult",
+    "BatchReport",
     "ConversionError",
     "ConversionRequest",
     "ConversionResult",
     "ConversionStage",
+    "read_bom",
+    "run_batch",
     "run_conversion",
 ]
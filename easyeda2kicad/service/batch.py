@@ -0,0 +1,224 @@
+"""Convert many LCSC parts in one run (list of IDs or a BOM file)."""
+
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import re
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence
+
+from easyeda2kicad.easyeda.easyeda_api import EasyedaApi
+from easyeda2kicad.service.conversion import (
+    ConversionError,
+    ConversionJob,
+    ConversionRequest,
+    ConversionResult,
+    create_job,
+    run_conversion,
+)
+from easyeda2kicad.service.pipeline import ConversionPipeline, PipelineConfig
+
+LCSC_ID_PATTERN = re.compile(r"^C\d+$")
+
+# BOM column headers (lower case) known to hold LCSC part numbers
+_LCSC_COLUMNS = (
+    "lcsc",
+    "lcsc part",
+    "lcsc part #",
+    "lcsc part number",
+    "lcsc_id",
+    "lcsc id",
+    "jlcpcb part #",
+    "jlcpcb part",
+    "supplier part",
+)
+
+
+@dataclass
+class BatchItemResult:
+    lcsc_id: str
+    ok: bool
+    seconds: float
+    result: Optional[ConversionResult] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchReport:
+    items: List[BatchItemResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def succeeded(self) -> List[BatchItemResult]:
+        return [item for item in self.items if item.ok]
+
+    @property
+    def failed(self) -> List[BatchItemResult]:
+        return [item for item in self.items if not item.ok]
+
+
+def _normalize_ids(values: Iterable[str]) -> List[str]:
+    seen = set()
+    lcsc_ids = []
+    for value in values:
+        lcsc_id = str(value).strip().upper()
+        if LCSC_ID_PATTERN.match(lcsc_id) and lcsc_id not in seen:
+            seen.add(lcsc_id)
+            lcsc_ids.append(lcsc_id)
+    return lcsc_ids
+
+
+def _record_values(record: dict) -> List[str]:
+    for key, value in record.items():
+        if key and key.strip().lower() in _LCSC_COLUMNS and value:
+            return [str(value)]
+    # No known column: use any cell that looks like an LCSC ID
+    return [value for value in record.values() if isinstance(value, str)]
+
+
+def read_bom(path: str) -> List[str]:
+    """
+    Return the unique LCSC IDs listed in a CSV or JSON bill of materials.
+
+    CSV files are read from a known LCSC column ("LCSC Part #",
+    "JLCPCB Part #", ...) or, without one, from any cell holding an ID.
+    JSON files may be a list of IDs, a list of objects, or an object with
+    a "parts" list.
+    """
+    bom_path = Path(path)
+    text = bom_path.read_text(encoding="utf-8-sig")
+
+    if bom_path.suffix.lower() == ".json":
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get("parts", [])
+        if not isinstance(data, list):
+            raise ValueError(f"Unsupported BOM structure in {path}")
+        records = data
+    else:
+        try:
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        records = list(csv.DictReader(text.splitlines(), dialect=dialect))
+
+    values: List[str] = []
+    for record in records:
+        if isinstance(record, dict):
+            values.extend(_record_values(record))
+        elif isinstance(record, str):
+            values.append(record)
+    return _normalize_ids(values)
+
+
+def _item_result(
+    request: ConversionRequest,
+    seconds: float,
+    result: Optional[ConversionResult] = None,
+    error: Optional[BaseException] = None,
+) -> BatchItemResult:
+    if error is None:
+        return BatchItemResult(
+            lcsc_id=request.lcsc_id, ok=True, seconds=seconds, result=result
+        )
+    if isinstance(error, ConversionError):
+        message = str(error)
+    else:
+        logging.debug(
+            f"Conversion of {request.lcsc_id} failed",
+            exc_info=(type(error), error, error.__traceback__),
+        )
+        message = f"{type(error).__name__}: {error}"
+    return BatchItemResult(
+        lcsc_id=request.lcsc_id, ok=False, seconds=seconds, error=message
+    )
+
+
+def _convert_one(request: ConversionRequest) -> BatchItemResult:
+    started = time.perf_counter()
+    try:
+        result = run_conversion(request)
+    except Exception as exc:
+        return _item_result(request, time.perf_counter() - started, error=exc)
+    return _item_result(request, time.perf_counter() - started, result=result)
+
+
+def run_batch(
+    requests: Sequence[ConversionRequest],
+    workers: int = 4,
+    use_processes: bool = False,
+    api: Optional[EasyedaApi] = None,
+    on_item: Optional[Callable[[BatchItemResult], None]] = None,
+) -> BatchReport:
+    """
+    Run `requests` with `workers` parallel downloads and report each part.
+
+    By default the parts go through a ConversionPipeline sharing one
+    EasyedaApi (pooled HTTP session and caches): up to `workers` parts are
+    fetched at once while earlier ones are converted and written. With
+    `use_processes` each part is converted in a pool of worker processes
+    instead, so the CPU-bound export steps run in parallel as well. Writes
+    to a shared library are serialized in both modes. Results are returned
+    in the order of `requests`.
+    """
+    started = time.perf_counter()
+    workers = max(1, workers)
+    items: List[Optional[BatchItemResult]] = [None] * len(requests)
+
+    def finish(index: int, item: BatchItemResult) -> None:
+        items[index] = item
+        if on_item:
+            on_item(item)
+
+    if use_processes:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            indices = {
+                executor.submit(_convert_one, request): index
+                for index, request in enumerate(requests)
+            }
+            for done in as_completed(indices):
+                finish(indices[done], done.result())
+    else:
+        with ConversionPipeline(
+            PipelineConfig(fetch_workers=workers), api=api
+        ) as pipeline:
+            futures = []
+            for index, request in enumerate(requests):
+                job = create_job(request, api=pipeline.api)
+                future = pipeline.submit_job(job)
+                future.add_done_callback(partial(_on_done, finish, index, job))
+                futures.append(future)
+            wait(futures)
+
+    return BatchReport(
+        items=[item for item in items if item is not None],
+        seconds=time.perf_counter() - started,
+    )
+
+
+def _on_done(
+    finish: Callable[[int, BatchItemResult], None],
+    index: int,
+    job: ConversionJob,
+    future: Future,
+) -> None:
+    # Like _convert_one: from the start of the fetch, without the queue wait
+    finished = time.perf_counter()
+    seconds = finished - (job.started if job.started is not None else finished)
+    request = job.request
+    error = future.exception()
+    finish(
+        index,
+        _item_result(
+            request,
+            seconds,
+            result=None if error else future.result(),
+            error=error,
+        ),
+    )
@@ -2,28 +2,34 @@ from __future__ import annotations
 
 import logging
 import os
-from dataclasses import dataclass, field
+import uuid
+from dataclasses import astuple, dataclass, field, replace
 from enum import Enum, auto
 from pathlib import Path
-from typing import Callable, Dict, Iterable, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 from easyeda2kicad.easyeda.easyeda_api import EasyedaApi
 from easyeda2kicad.easyeda.easyeda_importer import (
+    MODEL_PLACEMENTS,
     Easyeda3dModelImporter,
     EasyedaFootprintImporter,
     EasyedaSymbolImporter,
 )
-from easyeda2kicad.easyeda.parameters_easyeda import EeSymbol
-from easyeda2kicad.helpers import (
-    add_component_in_symbol_lib_file,
-    add_sub_components_in_symbol_lib_file,
-    id_already_in_symbol_lib,
-    update_component_in_symbol_lib_file,
+from easyeda2kicad.easyeda.parameters_easyeda import Ee3dModel, EeSymbol, ee_footprint
+from easyeda2kicad.easyeda.obj_vertices import OBJ_PRECISION
+from easyeda2kicad.kicad.export_kicad_3d_model import Exporter3dModelKicad, WrlOptions
+from easyeda2kicad.kicad.export_kicad_footprint import (
+    ExporterFootprintKicad,
+    sanitize_model_filename,
 )
-from easyeda2kicad.kicad.export_kicad_3d_model import Exporter3dModelKicad
-from easyeda2kicad.kicad.export_kicad_footprint import ExporterFootprintKicad
 from easyeda2kicad.kicad.export_kicad_symbol import ExporterSymbolKicad
 from easyeda2kicad.kicad.parameters_kicad_symbol import KicadVersion, sanitize_fields
+from easyeda2kicad.kicad.symbol_library import (
+    FlushTicket,
+    SymbolLibrary,
+    open_symbol_library,
+)
+from easyeda2kicad.service.locks import library_lock
 
 
 class ConversionStage(Enum):
@@ -57,6 +63,12 @@ class ConversionRequest:
     project_relative: bool = False
     project_relative_path: Optional[str] = None
     model_path: Optional[str] = None
+    # Empty: "geometry" when the model is generated, else "metadata"
+    model_placement: str = ""
+    # WRL output: gzipped .wrz, decimals of the coordinates, merged points
+    compress_model: bool = False
+    model_precision: int = OBJ_PRECISION
+    merge_model_points: bool = False
 
     def __post_init__(self) -> None:
         if not self.lcsc_id or not self.lcsc_id.startswith("C"):
@@ -65,8 +77,33 @@ class ConversionRequest:
             self.generate_symbol or self.generate_footprint or self.generate_model
         ):
             raise ConversionError("At least one export target must be selected.")
+        if not self.model_placement:
+            self.model_placement = "geometry" if self.generate_model else "metadata"
+        if self.model_placement not in MODEL_PLACEMENTS:
+            raise ConversionError(
+                f"Model placement must be one of {', '.join(MODEL_PLACEMENTS)}."
+            )
+        try:
+            self.wrl_options
+        except ValueError as exc:
+            raise ConversionError(str(exc)) from exc
         self.output_prefix = str(Path(self.output_prefix))
 
+    @property
+    def wrl_options(self) -> WrlOptions:
+        return WrlOptions(
+            compress=self.compress_model,
+            precision=self.model_precision,
+            merge_points=self.merge_model_points,
+        )
+
+    def coalescing_key(self) -> Tuple:
+        """Identify requests producing the same files, whatever their spelling."""
+        output_prefix = os.path.normcase(os.path.abspath(self.output_prefix))
+        return astuple(
+            replace(self, lcsc_id=self.lcsc_id.upper(), output_prefix=output_prefix)
+        )
+
 
 @dataclass
 class ConversionResult:
@@ -74,6 +111,8 @@ class ConversionResult:
     footprint_path: Optional[str] = None
     model_paths: Dict[str, str] = field(default_factory=dict)
     messages: List[str] = field(default_factory=list)
+    # vrml_bytes / file_bytes / saved_bytes of the WRL written, if any
+    model_stats: Optional[Dict[str, int]] = None
 
 
 def _symbol_is_empty(symbol: EeSymbol) -> bool:
@@ -122,48 +161,142 @@ def _ensure_output_scaffold(
 
     symbol_extension = "kicad_sym" if request.kicad_version == KicadVersion.v6 else "lib"
     symbol_path = output_path.with_suffix(f".{symbol_extension}")
-    if request.generate_symbol and not symbol_path.exists():
-        try:
-            with open(symbol_path, "w", encoding="utf-8") as symbol_file:
-                if request.kicad_version == KicadVersion.v6:
-                    symbol_file.write(
-                        "(kicad_symbol_lib\n"
-                        "  (version 20211014)\n"
-                        "  (generator https://github.com/uPesy/easyeda2kicad.py)\n"
-                        ")"
-                    )
-                else:
-                    symbol_file.write(
-                        "EESchema-LIBRARY Version 2.4\n#encoding utf-8\n"
-                    )
-        except OSError as exc:
-            raise ConversionError(
-                f"Unable to initialize symbol library file '{symbol_path}'."
-            ) from exc
+    if request.generate_symbol:
+        with library_lock(symbol_path):
+            if not symbol_path.exists():
+                _write_empty_symbol_library(symbol_path, request.kicad_version)
 
     return output_path, str(footprint_dir), symbol_extension
 
 
+def _write_empty_symbol_library(symbol_path: Path, kicad_version: KicadVersion) -> None:
+    try:
+        with open(symbol_path, "w", encoding="utf-8") as symbol_file:
+            if kicad_version == KicadVersion.v6:
+                symbol_file.write(
+                    "(kicad_symbol_lib\n"
+                    "  (version 20211014)\n"
+                    "  (generator https://github.com/uPesy/easyeda2kicad.py)\n"
+                    ")"
+                )
+            else:
+                symbol_file.write("EESchema-LIBRARY Version 2.4\n#encoding utf-8\n")
+    except OSError as exc:
+        raise ConversionError(
+            f"Unable to initialize symbol library file '{symbol_path}'."
+        ) from exc
+
+
 def _footprint_exists(lib_path: str, package_name: str) -> bool:
     return Path(lib_path, f"{package_name}.kicad_mod").is_file()
 
 
-def run_conversion(
-    request: ConversionRequest, progress_cb: Optional[ProgressCallback] = None
-) -> ConversionResult:
-    """
-    Execute easyeda2kicad exports based on the incoming request.
-
-    Raises ConversionError on failure.
-    """
+@dataclass
+class ConversionJob:
+    """State of one conversion handed from stage to stage."""
+
+    request: ConversionRequest
+    api: EasyedaApi
+    progress_cb: Optional[ProgressCallback] = None
+    steps_total: int = 1
+    completed_steps: int = 0
+    result: ConversionResult = field(default_factory=ConversionResult)
+    # fetch
+    output_path: Path = Path()
+    footprint_dir: str = ""
+    symbol_file: Path = Path()
+    model_dir: Path = Path()
+    cad_data: dict = field(default_factory=dict)
+    # parse
+    primary_symbol: Optional[EeSymbol] = None
+    sub_symbols: List[EeSymbol] = field(default_factory=list)
+    easyeda_footprint: Optional[ee_footprint] = None
+    model_data: Optional[Ee3dModel] = None
+    # STEP file streamed under a temporary name, moved into place on commit
+    streamed_step: Optional[str] = None
+    # convert
+    symbol_name: str = ""
+    exported_symbol: str = ""
+    exported_sub_symbols: List[str] = field(default_factory=list)
+    footprint_content: Optional[str] = None
+    footprint_file: str = ""
+    model_exporter: Optional[Exporter3dModelKicad] = None
+    step_file: Path = Path()
+    model_paths: Dict[str, str] = field(default_factory=dict)
+    # commit
+    defer_flush: bool = False
+    symbol_library: Optional[SymbolLibrary] = None
+    symbol_ticket: Optional[FlushTicket] = None
+    # perf_counter() when the first stage started working on the job
+    started: Optional[float] = None
+
+    def notify(self, stage: ConversionStage, message: str, done: bool = False) -> None:
+        if done:
+            self.completed_steps += 1
+        if not self.progress_cb:
+            return
+        percent = (
+            int((self.completed_steps / self.steps_total) * 100)
+            if self.steps_total
+            else 0
+        )
+        self.progress_cb(stage, max(0, min(100, percent)), message)
+
+    @property
+    def overwrite_model(self) -> bool:
+        return self.request.overwrite_model or self.request.overwrite
+
+    def step_destination(self, model_3d: Ee3dModel) -> Optional[str]:
+        # Stream the STEP file next to the library when it will be written;
+        # commit_stage moves it into place
+        base_name = sanitize_model_filename(model_3d.name)
+        extension = self.request.wrl_options.extension
+        wrl_path = self.model_dir / f"{base_name}.{extension}"
+        step_path = self.model_dir / f"{base_name}.step"
+        if self.overwrite_model or not (wrl_path.exists() and step_path.exists()):
+            self.streamed_step = str(
+                self.model_dir / f".easyeda2kicad-{uuid.uuid4().hex}.step"
+            )
+            return self.streamed_step
+        return None
 
-    def notify(stage: ConversionStage, steps_done: int, total_steps: int, message: str):
-        if not progress_cb:
+    def place_streamed_step(self) -> None:
+        """Move the streamed STEP file to `step_file`; call with its lock held."""
+        model_data = self.model_data
+        if model_data is None:
+            return
+        streamed = model_data.step_path
+        if streamed is None or streamed != self.streamed_step:
             return
-        percent = int((steps_done / total_steps) * 100) if total_steps else 0
-        percent = max(0, min(100, percent))
-        progress_cb(stage, percent, message)
+        os.replace(streamed, self.step_file)
+        model_data.step_path = str(self.step_file)
+        self.streamed_step = None
+
+    def discard_streamed_step(self) -> None:
+        """Remove the streamed STEP file of a job that did not place it."""
+        model_3d = self.model_data or (
+            self.easyeda_footprint.model_3d if self.easyeda_footprint else None
+        )
+        if model_3d is not None:
+            # Let a download still streaming into the file finish first
+            try:
+                model_3d.payload.fetched_step_path()
+            except Exception:
+                pass
+        if self.streamed_step is None:
+            return
+        try:
+            os.unlink(self.streamed_step)
+        except OSError:
+            pass
+        self.streamed_step = None
+
 
+def create_job(
+    request: ConversionRequest,
+    progress_cb: Optional[ProgressCallback] = None,
+    api: Optional[EasyedaApi] = None,
+) -> ConversionJob:
     steps_total = 1  # Fetching counts as one step
     if request.generate_symbol:
         steps_total += 1
@@ -171,23 +304,27 @@ def run_conversion(
         steps_total += 1
     if request.generate_model:
         steps_total += 1
-
-    completed_steps = 0
-    notify(
-        ConversionStage.FETCHING,
-        completed_steps,
-        steps_total,
-        "Fetching component data from EasyEDA.",
+    return ConversionJob(
+        request=request,
+        api=api or EasyedaApi(),
+        progress_cb=progress_cb,
+        steps_total=steps_total,
     )
 
+
+def fetch_stage(job: ConversionJob) -> None:
+    """Prepare the library folders and download the component data."""
+    request = job.request
+    job.notify(ConversionStage.FETCHING, "Fetching component data from EasyEDA.")
+
     output_path, footprint_dir, symbol_ext = _ensure_output_scaffold(request)
-    symbol_file = output_path.with_suffix(f".{symbol_ext}")
-    model_dir = output_path.with_suffix(".3dshapes")
-    library_name = output_path.name
+    job.output_path = output_path
+    job.footprint_dir = footprint_dir
+    job.symbol_file = output_path.with_suffix(f".{symbol_ext}")
+    job.model_dir = output_path.with_suffix(".3dshapes")
 
-    api = EasyedaApi()
     try:
-        cad_data = api.get_cad_data_of_component(lcsc_id=request.lcsc_id)
+        cad_data = job.api.get_cad_data_of_component(lcsc_id=request.lcsc_id)
     except Exception as exc:  # pragma: no cover - network errors bubble up
         raise ConversionError(
             f"Failed to fetch data for {request.lcsc_id}: {exc}"
@@ -197,31 +334,25 @@ def run_conversion(
         raise ConversionError(
             f"No CAD data received for component {request.lcsc_id}."
         )
+    job.cad_data = cad_data
+    job.notify(ConversionStage.FETCHING, "Component data downloaded.", done=True)
 
-    completed_steps += 1
-    notify(
-        ConversionStage.FETCHING,
-        completed_steps,
-        steps_total,
-        "Component data downloaded.",
-    )
 
-    result = ConversionResult()
+def parse_stage(job: ConversionJob) -> None:
+    """
+    Turn the component data into EasyEDA models.
 
-    easyeda_footprint = None
+    3D model payloads needed later are prefetched in the background here.
+    """
+    request = job.request
+    cad_data = job.cad_data
 
     if request.generate_symbol:
-        notify(
-            ConversionStage.EXPORT_SYMBOL,
-            completed_steps,
-            steps_total,
-            "Generating symbol.",
-        )
+        job.notify(ConversionStage.EXPORT_SYMBOL, "Generating symbol.")
         importer = EasyedaSymbolImporter(easyeda_cp_cad_data=cad_data)
         primary_symbol: EeSymbol = importer.get_symbol()
 
         subparts_data = cad_data.get("subparts") or []
-        sub_symbols: List[EeSymbol] = []
         if subparts_data:
             iterable = subparts_data
             if _symbol_is_empty(primary_symbol):
@@ -232,194 +363,243 @@ def run_conversion(
                 iterable = iterable[1:]
             for subpart_data in iterable:
                 sub_importer = EasyedaSymbolImporter(easyeda_cp_cad_data=subpart_data)
-                sub_symbols.append(sub_importer.get_symbol())
+                job.sub_symbols.append(sub_importer.get_symbol())
+        job.primary_symbol = primary_symbol
 
-        sanitized_name = sanitize_fields(primary_symbol.info.name)
-        existing = id_already_in_symbol_lib(
-            lib_path=str(symbol_file),
-            component_name=sanitized_name,
-            kicad_version=request.kicad_version,
+    if request.generate_footprint:
+        job.notify(ConversionStage.EXPORT_FOOTPRINT, "Generating footprint.")
+        footprint_importer = EasyedaFootprintImporter(
+            easyeda_cp_cad_data=cad_data,
+            api=job.api,
+            step_destination=job.step_destination if request.generate_model else None,
+            model_placement=request.model_placement,
+            prefetch_3d_model=request.generate_model,
         )
-        exported_symbol = ""
-        exported_sub_symbols: List[str] = []
-        if existing and not request.overwrite:
-            result.messages.append(
-                f"Symbol '{primary_symbol.info.name}' bereits vorhanden – nicht überschrieben."
-            )
+        job.easyeda_footprint = footprint_importer.get_footprint()
+
+    if request.generate_model:
+        job.notify(ConversionStage.EXPORT_MODEL, "Generating 3D model.")
+        if job.easyeda_footprint and job.easyeda_footprint.model_3d:
+            job.model_data = job.easyeda_footprint.model_3d
         else:
-            exporter = ExporterSymbolKicad(
-                symbol=primary_symbol, kicad_version=request.kicad_version
-            )
-            exported_symbol = exporter.export(footprint_lib_name=library_name)
+            job.model_data = Easyeda3dModelImporter(
+                easyeda_cp_cad_data=cad_data,
+                download_raw_3d_model=True,
+                api=job.api,
+                step_destination=job.step_destination,
+            ).output
 
-            for sub_symbol in sub_symbols:
-                sub_exporter = ExporterSymbolKicad(
-                    symbol=sub_symbol, kicad_version=request.kicad_version
-                )
-                sub_export = sub_exporter.export(footprint_lib_name=library_name)
-                if sub_export and sub_export != exported_symbol:
-                    exported_sub_symbols.append(sub_export)
 
-            if existing:
-                update_component_in_symbol_lib_file(
-                    lib_path=str(symbol_file),
-                    component_name=sanitized_name,
-                    component_content=exported_symbol,
-                    kicad_version=request.kicad_version,
-                )
+def _footprint_model_path(job: ConversionJob) -> tuple[str, bool]:
+    request = job.request
+    model_path_override = (request.model_path or "").strip()
+    if model_path_override:
+        return model_path_override, True
+
+    output_path = job.output_path
+    model_path = str(job.model_dir).replace("\\", "/").replace("./", "/")
+    if request.project_relative:
+        relative_path = (request.project_relative_path or "").strip().replace("\\", "/")
+        if relative_path.startswith("${KIPRJMOD}"):
+            relative_path = relative_path[len("${KIPRJMOD}"):]
+        if relative_path:
+            if not relative_path.startswith("/"):
+                relative_path = f"/{relative_path}"
+            if relative_path.endswith(".3dshapes"):
+                model_path = "${KIPRJMOD}" + relative_path
             else:
-                add_component_in_symbol_lib_file(
-                    lib_path=str(symbol_file),
-                    component_content=exported_symbol,
-                    kicad_version=request.kicad_version,
-                )
-            if exported_sub_symbols and request.kicad_version == KicadVersion.v6:
-                add_sub_components_in_symbol_lib_file(
-                    lib_path=str(symbol_file),
-                    component_name=sanitized_name,
-                    sub_components_content=exported_sub_symbols,
-                    kicad_version=request.kicad_version,
-                )
-            elif exported_sub_symbols:
-                logging.warning(
-                    "Multi-unit symbols are only supported for KiCad v6 libraries; skipping"
-                    " additional units."
+                model_path = (
+                    "${KIPRJMOD}"
+                    + relative_path.rstrip("/")
+                    + f"/{output_path.name}.3dshapes"
                 )
+        else:
+            model_path = "${KIPRJMOD}/" + f"{output_path.name}.3dshapes"
+    return model_path, False
 
-        completed_steps += 1
-        notify(
-            ConversionStage.EXPORT_SYMBOL,
-            completed_steps,
-            steps_total,
-            "Symbol export completed.",
-        )
-        result.symbol_path = str(symbol_file)
 
-    if request.generate_footprint:
-        notify(
-            ConversionStage.EXPORT_FOOTPRINT,
-            completed_steps,
-            steps_total,
-            "Generating footprint.",
-        )
-        importer = EasyedaFootprintImporter(easyeda_cp_cad_data=cad_data)
-        easyeda_footprint = importer.get_footprint()
+def convert_stage(job: ConversionJob) -> None:
+    """Render the KiCad symbol / footprint text and prepare the 3D model."""
+    request = job.request
+    library_name = job.output_path.name
 
-        footprint_exists = _footprint_exists(
-            footprint_dir, easyeda_footprint.info.name
+    primary_symbol = job.primary_symbol
+    if request.generate_symbol and primary_symbol is not None:
+        job.symbol_name = sanitize_fields(primary_symbol.info.name)
+        exporter = ExporterSymbolKicad(
+            symbol=primary_symbol, kicad_version=request.kicad_version
         )
-        footprint_filename = f"{easyeda_footprint.info.name}.kicad_mod"
-        model_path_override = (request.model_path or "").strip()
-        model_path_is_explicit = False
-        if model_path_override:
-            model_path = model_path_override
-            model_path_is_explicit = True
-        else:
-            model_path = str(model_dir).replace("\\", "/").replace("./", "/")
-            if request.project_relative:
-                relative_path = (request.project_relative_path or "").strip().replace("\\", "/")
-                if relative_path.startswith("${KIPRJMOD}"):
-                    relative_path = relative_path[len("${KIPRJMOD}"):]
-                if relative_path:
-                    if not relative_path.startswith("/"):
-                        relative_path = f"/{relative_path}"
-                    if relative_path.endswith(".3dshapes"):
-                        model_path = "${KIPRJMOD}" + relative_path
-                    else:
-                        model_path = (
-                            "${KIPRJMOD}"
-                            + relative_path.rstrip("/")
-                            + f"/{output_path.name}.3dshapes"
-                        )
-                else:
-                    model_path = "${KIPRJMOD}/" + f"{output_path.name}.3dshapes"
-
-        if footprint_exists and not request.overwrite:
-            result.messages.append(
-                f"Footprint '{easyeda_footprint.info.name}' bereits vorhanden – nicht überschrieben."
+        job.exported_symbol = exporter.export(footprint_lib_name=library_name)
+        for sub_symbol in job.sub_symbols:
+            sub_exporter = ExporterSymbolKicad(
+                symbol=sub_symbol, kicad_version=request.kicad_version
             )
-        else:
-            ki_footprint = ExporterFootprintKicad(footprint=easyeda_footprint)
-            ki_footprint.export(
-                footprint_full_path=os.path.join(footprint_dir, footprint_filename),
+            sub_export = sub_exporter.export(footprint_lib_name=library_name)
+            if sub_export and sub_export != job.exported_symbol:
+                job.exported_sub_symbols.append(sub_export)
+
+    easyeda_footprint = job.easyeda_footprint
+    if request.generate_footprint and easyeda_footprint is not None:
+        job.footprint_file = os.path.join(
+            job.footprint_dir, f"{easyeda_footprint.info.name}.kicad_mod"
+        )
+        if request.overwrite or not _footprint_exists(
+            job.footprint_dir, easyeda_footprint.info.name
+        ):
+            model_path, model_path_is_explicit = _footprint_model_path(job)
+            job.footprint_content = ExporterFootprintKicad(
+                footprint=easyeda_footprint
+            ).render(
                 model_3d_path=model_path,
                 model_3d_path_is_explicit=model_path_is_explicit,
+                model_3d_extension=request.wrl_options.extension,
             )
 
-        completed_steps += 1
-        notify(
-            ConversionStage.EXPORT_FOOTPRINT,
-            completed_steps,
-            steps_total,
-            "Footprint export completed.",
-        )
-        result.footprint_path = os.path.join(footprint_dir, footprint_filename)
-
     if request.generate_model:
-        notify(
-            ConversionStage.EXPORT_MODEL,
-            completed_steps,
-            steps_total,
-            "Generating 3D model.",
-        )
-        model_data = None
-        if easyeda_footprint and easyeda_footprint.model_3d:
-            model_data = easyeda_footprint.model_3d
-        if model_data is None:
-            model_data = Easyeda3dModelImporter(
-                easyeda_cp_cad_data=cad_data, download_raw_3d_model=True
-            ).output
-
-        exporter = Exporter3dModelKicad(model_3d=model_data)
+        model_data = job.model_data
+        safe_base_name = sanitize_model_filename(model_data.name if model_data else "")
+        wrl_options = request.wrl_options
+        wrl_kind = wrl_options.extension
+        wrl_path = job.model_dir / f"{safe_base_name}.{wrl_kind}"
+        step_path = job.model_dir / f"{safe_base_name}.step"
+        job.step_file = step_path
 
-        base_name = (
-            os.path.splitext(exporter.input.name or "")[0]
-            if exporter.input
-            else ""
-        )
-        if not base_name:
-            base_name = "easyeda_model"
-        safe_base_name = base_name.replace("\\", "_").replace("/", "_")
-        wrl_path = Path(model_dir) / f"{safe_base_name}.wrl"
-        step_path = Path(model_dir) / f"{safe_base_name}.step"
-
-        overwrite_model = getattr(request, "overwrite_model", False) or request.overwrite
         existing_wrl = wrl_path.exists()
         existing_step = step_path.exists()
 
-        if overwrite_model or (not existing_wrl or not existing_step):
-            exporter.export(lib_path=str(output_path))
-            if exporter.output:
-                result.model_paths["wrl"] = str(wrl_path)
-            if exporter.output_step:
-                result.model_paths["step"] = str(step_path)
+        if job.overwrite_model or (not existing_wrl or not existing_step):
+            # Built only when exporting: the payloads are fetched on demand
+            job.model_exporter = Exporter3dModelKicad(
+                model_3d=model_data,
+                model_store=job.api.model_store,
+                options=wrl_options,
+            )
+            if job.model_exporter.output:
+                job.model_paths[wrl_kind] = str(wrl_path)
+            if job.model_exporter.has_step:
+                job.model_paths["step"] = str(step_path)
         else:
             if existing_wrl:
-                result.model_paths["wrl"] = str(wrl_path)
+                job.model_paths[wrl_kind] = str(wrl_path)
             if existing_step:
-                result.model_paths["step"] = str(step_path)
-            result.messages.append(
+                job.model_paths["step"] = str(step_path)
+            job.result.messages.append(
                 "3D-Modell bereits vorhanden – nicht überschrieben."
             )
 
+
+def commit_stage(job: ConversionJob) -> ConversionResult:
+    """Write the converted part into the library files."""
+    request = job.request
+    result = job.result
+    symbol_file = job.symbol_file
+
+    primary_symbol = job.primary_symbol
+    if request.generate_symbol and primary_symbol is not None:
+        # Other conversions may target the same library concurrently
+        with library_lock(symbol_file):
+            library = open_symbol_library(str(symbol_file), request.kicad_version)
+            existing = library.contains(job.symbol_name)
+            if existing:
+                logging.warning("This id is already in %s", symbol_file)
+            if existing and not request.overwrite:
+                result.messages.append(
+                    f"Symbol '{primary_symbol.info.name}' bereits vorhanden – nicht überschrieben."
+                )
+            else:
+                if existing:
+                    library.replace(job.symbol_name, job.exported_symbol)
+                else:
+                    library.add(job.exported_symbol, job.symbol_name)
+                if job.exported_sub_symbols and request.kicad_version == KicadVersion.v6:
+                    library.add_sub_units(job.symbol_name, job.exported_sub_symbols)
+                elif job.exported_sub_symbols:
+                    logging.warning(
+                        "Multi-unit symbols are only supported for KiCad v6 libraries;"
+                        " skipping additional units."
+                    )
+                # A pipeline flushes the library once for a whole group of parts
+                if job.defer_flush:
+                    job.symbol_library = library
+                    job.symbol_ticket = library.ticket
+                else:
+                    library.flush()
+        result.symbol_path = str(symbol_file)
+        job.notify(ConversionStage.EXPORT_SYMBOL, "Symbol export completed.", done=True)
+
+    easyeda_footprint = job.easyeda_footprint
+    if request.generate_footprint and easyeda_footprint is not None:
+        # Parts sharing a package write the same footprint file
+        with library_lock(job.footprint_file):
+            footprint_exists = _footprint_exists(
+                job.footprint_dir, easyeda_footprint.info.name
+            )
+            if job.footprint_content is None or (
+                footprint_exists and not request.overwrite
+            ):
+                result.messages.append(
+                    f"Footprint '{easyeda_footprint.info.name}' bereits vorhanden – nicht überschrieben."
+                )
+            else:
+                with open(job.footprint_file, "w", encoding="utf-8") as footprint:
+                    footprint.write(job.footprint_content)
+        result.footprint_path = job.footprint_file
+        job.notify(
+            ConversionStage.EXPORT_FOOTPRINT, "Footprint export completed.", done=True
+        )
+
+    if request.generate_model:
+        if job.model_exporter is not None:
+            # Parts sharing a model write the same files
+            with library_lock(job.step_file):
+                job.place_streamed_step()
+                job.model_exporter.export(lib_path=str(job.output_path))
+            stats = job.model_exporter.stats
+            if stats is not None:
+                result.model_stats = {
+                    "vrml_bytes": stats.vrml_bytes,
+                    "file_bytes": stats.file_bytes,
+                    "saved_bytes": stats.saved_bytes,
+                }
+        # Streamed although the model was kept, e.g. written meanwhile
+        job.discard_streamed_step()
+        result.model_paths.update(job.model_paths)
         if not result.model_paths:
             result.messages.append("Kein 3D-Modell verfügbar.")
-
-        completed_steps += 1
-        notify(
-            ConversionStage.EXPORT_MODEL,
-            completed_steps,
-            steps_total,
-            "3D model export completed.",
+        job.notify(
+            ConversionStage.EXPORT_MODEL, "3D model export completed.", done=True
         )
 
-    notify(
-        ConversionStage.FINALISING,
-        completed_steps,
-        steps_total,
-        "Finalising conversion.",
-    )
+    job.notify(ConversionStage.FINALISING, "Finalising conversion.")
+    job.completed_steps = job.steps_total
+    job.notify(ConversionStage.COMPLETED, "Conversion finished.")
+    return result
 
-    notify(ConversionStage.COMPLETED, steps_total, steps_total, "Conversion finished.")
 
-    return result
+CONVERSION_STAGES = (fetch_stage, parse_stage, convert_stage, commit_stage)
+
+
+def run_conversion(
+    request: ConversionRequest,
+    progress_cb: Optional[ProgressCallback] = None,
+    api: Optional[EasyedaApi] = None,
+) -> ConversionResult:
+    """
+    Execute easyeda2kicad exports based on the incoming request.
+
+    Runs the fetch, parse, convert and commit stages back to back; see
+    ConversionPipeline to overlap them across many parts. All HTTP traffic
+    goes through `api` (or a client bound to the shared, pooled session) so
+    keep-alive connections are reused across parts.
+
+    Raises ConversionError on failure.
+    """
+    job = create_job(request, progress_cb=progress_cb, api=api)
+    try:
+        fetch_stage(job)
+        parse_stage(job)
+        convert_stage(job)
+        return commit_stage(job)
+    except BaseException:
+        job.discard_streamed_step()
+        raise
@@ -0,0 +1,91 @@
+"""Locks serializing read-modify-write cycles on shared library files."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Union
+
+try:  # POSIX
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+try:  # Windows
+    import msvcrt
+except ImportError:
+    msvcrt = None  # type: ignore
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+_held = threading.local()
+
+
+def _lock_key(path: Union[str, os.PathLike]) -> str:
+    return os.path.normcase(os.path.abspath(os.fspath(path)))
+
+
+def _thread_lock(key: str) -> threading.Lock:
+    with _thread_locks_guard:
+        lock = _thread_locks.get(key)
+        if lock is None:
+            lock = _thread_locks[key] = threading.Lock()
+        return lock
+
+
+def _lock_file_path(key: str) -> Path:
+    # Kept out of the library folder so KiCad users never see stray lock files
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return Path(tempfile.gettempdir()) / "easyeda2kicad-locks" / f"{digest}.lock"
+
+
+@contextmanager
+def _os_file_lock(key: str) -> Iterator[None]:
+    if fcntl is None and msvcrt is None:
+        yield
+        return
+    lock_path = _lock_file_path(key)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def library_lock(path: Union[str, os.PathLike]) -> Iterator[None]:
+    """
+    Hold exclusive write access to the library file at `path`.
+
+    Threads of this process are serialized with an in-process lock, other
+    processes (batch workers, a second CLI run) with an OS file lock. The
+    lock is re-entrant within a thread.
+    """
+    key = _lock_key(path)
+    held = getattr(_held, "keys", None)
+    if held is None:
+        held = _held.keys = set()
+    if key in held:
+        yield
+        return
+    with _thread_lock(key):
+        held.add(key)
+        try:
+            with _os_file_lock(key):
+                yield
+        finally:
+            held.discard(key)
@@ -0,0 +1,218 @@
+"""Staged conversion engine overlapping downloads, exports and library writes."""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from easyeda2kicad.easyeda.easyeda_api import EasyedaApi
+from easyeda2kicad.kicad.symbol_library import SymbolLibrary
+from easyeda2kicad.service.conversion import (
+    ConversionJob,
+    ConversionRequest,
+    ConversionResult,
+    ProgressCallback,
+    commit_stage,
+    convert_stage,
+    create_job,
+    fetch_stage,
+    parse_stage,
+)
+from easyeda2kicad.service.locks import library_lock
+
+_STOP = object()
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    """Worker threads per stage and the capacity of each stage queue."""
+
+    fetch_workers: int = 8
+    parse_workers: int = 2
+    convert_workers: int = 2
+    commit_workers: int = 2
+    queue_size: int = 16
+
+
+class ConversionPipeline:
+    """
+    Runs conversions through the fetch -> parse -> convert -> commit stages.
+
+    Every stage has its own bounded queue and pool of worker threads, so
+    while one part is written to its library the next ones are already
+    being downloaded and converted. A full queue blocks the stage feeding
+    it, which keeps memory bounded when parts are submitted faster than
+    they can be written.
+
+    The commit workers write symbol libraries in groups: parts are added to
+    the in-memory library model as they arrive and each touched library is
+    flushed once, when the commit queue runs dry (or after `queue_size`
+    parts), before their futures are resolved.
+
+    `run` has the signature of run_conversion and can replace it wherever a
+    conversion runner is expected.
+    """
+
+    def __init__(
+        self,
+        config: Optional[PipelineConfig] = None,
+        api: Optional[EasyedaApi] = None,
+    ) -> None:
+        self.config = config or PipelineConfig()
+        self.api = api or EasyedaApi()
+        self._stage_threads: List[List[threading.Thread]] = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+        stages = [
+            ("fetch", fetch_stage, self.config.fetch_workers),
+            ("parse", parse_stage, self.config.parse_workers),
+            ("convert", convert_stage, self.config.convert_workers),
+            ("commit", commit_stage, self.config.commit_workers),
+        ]
+        self._queues: List[queue.Queue] = [
+            queue.Queue(maxsize=max(1, self.config.queue_size)) for _ in stages
+        ]
+        for index, (name, stage, workers) in enumerate(stages):
+            next_queue = self._queues[index + 1] if index + 1 < len(stages) else None
+            threads = []
+            worker = self._stage_worker if next_queue else self._commit_worker
+            for number in range(max(1, workers)):
+                thread = threading.Thread(
+                    target=worker,
+                    args=(stage, self._queues[index], next_queue),
+                    name=f"easyeda-{name}-{number}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+            self._stage_threads.append(threads)
+
+    @staticmethod
+    def _stage_worker(
+        stage: Callable[[ConversionJob], Optional[ConversionResult]],
+        inbox: queue.Queue,
+        outbox: Optional[queue.Queue],
+    ) -> None:
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                return
+            job, future = item
+            if job.started is None:
+                # Time spent queued before the fetch stage does not count
+                job.started = time.perf_counter()
+            try:
+                output = stage(job)
+            except BaseException as exc:
+                job.discard_streamed_step()
+                future.set_exception(exc)
+                continue
+            if outbox is None:
+                future.set_result(output)
+            else:
+                outbox.put((job, future))
+
+    def _commit_worker(
+        self,
+        stage: Callable[[ConversionJob], Optional[ConversionResult]],
+        inbox: queue.Queue,
+        outbox: None = None,
+    ) -> None:
+        group: List[Tuple[ConversionJob, Future, Optional[ConversionResult]]] = []
+        while True:
+            try:
+                item = inbox.get(block=not group)
+            except queue.Empty:
+                item = None
+            if item is None or item is _STOP:
+                self._flush_group(group)
+                group = []
+                if item is _STOP:
+                    return
+                continue
+            job, future = item
+            try:
+                output = stage(job)
+            except BaseException as exc:
+                job.discard_streamed_step()
+                future.set_exception(exc)
+                continue
+            group.append((job, future, output))
+            if len(group) >= max(1, self.config.queue_size):
+                self._flush_group(group)
+                group = []
+
+    @staticmethod
+    def _flush_group(
+        group: List[Tuple[ConversionJob, Future, Optional[ConversionResult]]]
+    ) -> None:
+        libraries: List[SymbolLibrary] = []
+        for job, _, _ in group:
+            if job.symbol_library is not None and job.symbol_library not in libraries:
+                libraries.append(job.symbol_library)
+        for library in libraries:
+            try:
+                with library_lock(library.path):
+                    library.flush()
+            except BaseException:
+                # Reported below through the tickets of the dropped changes
+                pass
+        # The library is shared by every commit worker: our changes may have
+        # been written, or dropped, by another worker's flush
+        for job, future, output in group:
+            ticket = job.symbol_ticket
+            if ticket is not None and ticket.error is not None:
+                future.set_exception(ticket.error)
+            else:
+                future.set_result(output)
+
+    def submit(
+        self,
+        request: ConversionRequest,
+        progress_cb: Optional[ProgressCallback] = None,
+    ) -> "Future[ConversionResult]":
+        """Queue `request`; blocks while the fetch queue is full."""
+        return self.submit_job(
+            create_job(request, progress_cb=progress_cb, api=self.api)
+        )
+
+    def submit_job(self, job: ConversionJob) -> "Future[ConversionResult]":
+        """Queue a job made by create_job, e.g. to read its `started` time later."""
+        if self._closed:
+            raise RuntimeError("Conversion pipeline has been closed")
+        future: "Future[ConversionResult]" = Future()
+        future.set_running_or_notify_cancel()
+        job.defer_flush = True
+        self._queues[0].put((job, future))
+        return future
+
+    def run(
+        self,
+        request: ConversionRequest,
+        progress_cb: Optional[ProgressCallback] = None,
+    ) -> ConversionResult:
+        return self.submit(request, progress_cb).result()
+
+    def close(self) -> None:
+        """Finish the queued conversions and stop the stage workers."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        # Stop stage by stage so every queued job drains into the next one
+        for stage_queue, threads in zip(self._queues, self._stage_threads):
+            for _ in threads:
+                stage_queue.put(_STOP)
+            for thread in threads:
+                thread.join()
+
+    def __enter__(self) -> "ConversionPipeline":
+        return self
+
+    def __exit__(self, *exc_info: Tuple) -> None:
+        self.close()
@@ -1,5 +1,11 @@
 import os, sys, argparse, multiprocessing
-from easyeda2kicad.api.server import create_app
+from easyeda2kicad.api.server import (
+    create_app,
+    resolve_watch_libraries,
+    resolve_worker_count,
+)
+from easyeda2kicad.api.task_registry import TaskRetention
+from easyeda2kicad.api.task_store import resolve_task_store_path
 import uvicorn
 
 
@@ -7,9 +13,74 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
     parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8087")))
+    parser.add_argument(
+        "--conversion-workers",
+        type=int,
+        default=resolve_worker_count(),
+        help="Conversions run in parallel (default: $EASYEDA2KICAD_WORKERS or 4)",
+    )
+    parser.add_argument(
+        "--watch-libraries",
+        dest="watch_libraries",
+        action="store_true",
+        default=resolve_watch_libraries(),
+        help="Keep library indexes current with a filesystem watcher"
+        " (default: $EASYEDA2KICAD_WATCH_LIBRARIES or off)",
+    )
+    parser.add_argument(
+        "--no-watch-libraries",
+        dest="watch_libraries",
+        action="store_false",
+        help="Do not watch library directories",
+    )
+    retention = TaskRetention.from_env()
+    parser.add_argument(
+        "--max-tasks",
+        type=int,
+        default=retention.max_tasks,
+        help="Tasks kept in memory; the oldest finished ones are dropped first"
+        " (default: $EASYEDA2KICAD_MAX_TASKS or 1000)",
+    )
+    parser.add_argument(
+        "--task-max-age",
+        type=float,
+        default=retention.max_age,
+        help="Seconds after creation a finished task is dropped"
+        " (default: $EASYEDA2KICAD_TASK_MAX_AGE or 86400)",
+    )
+    parser.add_argument(
+        "--completed-task-ttl",
+        type=float,
+        default=retention.completed_ttl,
+        help="Seconds a completed task is kept after finishing"
+        " (default: $EASYEDA2KICAD_COMPLETED_TASK_TTL or 3600)",
+    )
+    parser.add_argument(
+        "--task-log-limit",
+        type=int,
+        default=retention.log_limit,
+        help="Progress entries kept per task"
+        " (default: $EASYEDA2KICAD_TASK_LOG_LIMIT or 200)",
+    )
+    parser.add_argument(
+        "--task-store",
+        default=resolve_task_store_path(),
+        help="SQLite database keeping tasks across restarts"
+        " (default: $EASYEDA2KICAD_TASK_STORE or in memory only)",
+    )
     args = parser.parse_args()
 
-    app = create_app()
+    app = create_app(
+        workers=args.conversion_workers,
+        watch_libraries=args.watch_libraries,
+        retention=TaskRetention(
+            max_tasks=args.max_tasks,
+            max_age=args.task_max_age,
+            completed_ttl=args.completed_task_ttl,
+            log_limit=args.task_log_limit,
+        ),
+        task_store=args.task_store,
+    )
 
     uvicorn.run(
         app,
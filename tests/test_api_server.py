@@ -1,4 +1,5 @@
 import tempfile
+import threading
 import time
 import unittest
 from pathlib import Path
@@ -6,6 +7,7 @@ from pathlib import Path
 from fastapi.testclient import TestClient
 
 from easyeda2kicad.api.server import create_app
+from easyeda2kicad.api.task_registry import TaskRetention
 from easyeda2kicad.service import ConversionRequest, ConversionResult, ConversionStage
 
 
@@ -100,6 +102,43 @@ class TaskApiTest(unittest.TestCase):
                     break
             self.assertTrue(captured.get("overwrite_model"))
 
+    def test_workers_run_conversions_concurrently(self) -> None:
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+
+        def slow_runner(request: ConversionRequest, progress_cb) -> ConversionResult:
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.2)
+            with lock:
+                state["running"] -= 1
+            return ConversionResult()
+
+        app = create_app(conversion_runner=slow_runner, workers=3)
+        with TestClient(app) as client:
+            task_ids = [
+                client.post(
+                    "/tasks",
+                    json={
+                        "lcsc_id": f"C{index}",
+                        "output_path": "./tmp/testlib",
+                        "symbol": True,
+                    },
+                ).json()["id"]
+                for index in range(1, 7)
+            ]
+            for _ in range(40):
+                time.sleep(0.05)
+                statuses = {
+                    client.get(f"/tasks/{task_id}").json()["status"]
+                    for task_id in task_ids
+                }
+                if statuses == {"completed"}:
+                    break
+            self.assertEqual(statuses, {"completed"})
+        self.assertEqual(state["peak"], 3)
+
     def test_library_scaffold_and_validate(self) -> None:
         app = create_app(conversion_runner=_dummy_runner)
         with tempfile.TemporaryDirectory() as tmpdir, TestClient(app) as client:
@@ -161,3 +200,318 @@ class TaskApiTest(unittest.TestCase):
             data = response.json()
             self.assertTrue(data["assets"]["symbol"])
             self.assertEqual(data["counts"].get("symbol"), 2)
+
+    def test_component_lookup_counts_top_level_symbols_only(self) -> None:
+        app = create_app(conversion_runner=_dummy_runner)
+        with tempfile.TemporaryDirectory() as tmpdir, TestClient(app) as client:
+            root = Path(tmpdir) / "parts"
+            root.with_suffix(".pretty").mkdir()
+            (root.with_suffix(".pretty") / "SOT-23.kicad_mod").write_text(
+                '(footprint "SOT-23")', encoding="utf-8"
+            )
+            root.with_suffix(".kicad_sym").write_text(
+                """(kicad_symbol_lib (version 20211014) (generator test)
+  (symbol "Q1"
+    (property "Reference" "Q (bipolar)" (id 0))
+    (property "Footprint" "parts:SOT-23" (id 2))
+    (property "LCSC Part" "C8545" (id 5))
+    (symbol "Q1_0_1" (polyline (pts (xy 0 0))))
+    (symbol "Q1_1_1" (pin passive line (at 0 0 0)))
+  )
+  (symbol "D1"
+    (property "LCSC Part" "C2128" (id 5))
+    (symbol "D1_0_1")
+  )
+)""",
+                encoding="utf-8",
+            )
+
+            validation = client.post(
+                "/libraries/validate", json={"path": str(root)}
+            ).json()
+            self.assertEqual(validation["counts"]["symbol"], 2)
+
+            component = client.post(
+                "/libraries/component", json={"path": str(root), "lcsc_id": "C8545"}
+            ).json()
+            self.assertTrue(component["footprint_path"].endswith("SOT-23.kicad_mod"))
+
+            batch = client.post(
+                "/libraries/components",
+                json={"path": str(root), "lcsc_ids": ["C8545", "C2128", "C1"]},
+            ).json()["results"]
+            self.assertEqual(batch["C8545"]["messages"], [])
+            self.assertEqual(
+                batch["C2128"]["messages"], ["Component not found in library."]
+            )
+            self.assertEqual(
+                batch["C1"]["messages"], ["Component not found in library."]
+            )
+
+    def test_task_stream_sends_coalesced_diffs(self) -> None:
+        def chatty_runner(request: ConversionRequest, progress_cb) -> ConversionResult:
+            for percent in range(100):
+                progress_cb(ConversionStage.FETCHING, percent, f"step {percent}")
+            time.sleep(0.05)
+            return ConversionResult()
+
+        app = create_app(conversion_runner=chatty_runner, workers=2)
+        with TestClient(app) as client:
+            with client.websocket_connect("/ws/tasks") as stream:
+                snapshot = stream.receive_json()
+                self.assertEqual(snapshot["type"], "snapshot")
+                self.assertEqual(snapshot["tasks"], [])
+
+                task_ids = {
+                    client.post(
+                        "/tasks",
+                        json={
+                            "lcsc_id": f"C{index}",
+                            "output_path": "./tmp/testlib",
+                            "symbol": True,
+                        },
+                    ).json()["id"]
+                    for index in range(1, 5)
+                }
+                state = {}
+                messages = 0
+                while {
+                    state.get(task_id, {}).get("status") for task_id in task_ids
+                } != {"completed"}:
+                    message = stream.receive_json()
+                    messages += 1
+                    self.assertEqual(message["type"], "tasks")
+                    for change in message["changes"]:
+                        state.setdefault(change["id"], {}).update(change)
+
+        self.assertEqual(set(state), task_ids)
+        # 4 tasks x 100 progress events are coalesced into a handful of messages
+        self.assertLess(messages, 40)
+
+    def test_task_retention_and_paginated_listing(self) -> None:
+        release = threading.Event()
+
+        def runner(request: ConversionRequest, progress_cb) -> ConversionResult:
+            for percent in range(10):
+                progress_cb(ConversionStage.FETCHING, percent, f"step {percent}")
+            if request.lcsc_id == "C4":
+                release.wait(5)
+            return ConversionResult()
+
+        retention = TaskRetention(
+            max_tasks=3, max_age=None, completed_ttl=None, log_limit=4
+        )
+        app = create_app(conversion_runner=runner, workers=1, retention=retention)
+        with TestClient(app) as client:
+            task_ids = [
+                client.post(
+                    "/tasks",
+                    json={
+                        "lcsc_id": f"C{index}",
+                        "output_path": "./tmp/testlib",
+                        "symbol": True,
+                    },
+                ).json()["id"]
+                for index in range(1, 6)
+            ]
+            for _ in range(100):
+                running = client.get("/tasks", params={"status": "running"}).json()
+                if [task["id"] for task in running] == [task_ids[3]]:
+                    break
+                time.sleep(0.02)
+
+            # C1 and C2 were evicted, C3 finished, C4 runs and C5 waits
+            listing = [task["id"] for task in client.get("/tasks").json()]
+            self.assertEqual(sorted(listing), sorted(task_ids[2:]))
+            self.assertEqual(client.get(f"/tasks/{task_ids[0]}").status_code, 404)
+            detail = client.get(f"/tasks/{task_ids[2]}").json()
+            self.assertEqual(len(detail["log"]), 4)
+            self.assertEqual(detail["log"][-1]["stage"], "COMPLETED")
+
+            page = client.get("/tasks", params={"limit": 2})
+            self.assertEqual(len(page.json()), 2)
+            rest = client.get(
+                "/tasks", params={"cursor": page.headers["X-Next-Cursor"]}
+            )
+            self.assertEqual(
+                [task["id"] for task in page.json() + rest.json()], listing
+            )
+
+            cursor = rest.headers["X-Next-Cursor"]
+            self.assertEqual(client.get("/tasks", params={"cursor": cursor}).json(), [])
+            queued = client.get("/tasks", params={"status": "queued"}).json()
+            self.assertEqual([task["id"] for task in queued], [task_ids[4]])
+            self.assertEqual(queued[0]["queue_position"], 1)
+            self.assertEqual(
+                client.get("/tasks", params={"status": "done"}).status_code, 400
+            )
+
+            release.set()
+            for _ in range(100):
+                changed = client.get("/tasks", params={"cursor": cursor}).json()
+                if len(changed) == 2 and changed[-1]["status"] == "completed":
+                    break
+                time.sleep(0.02)
+            self.assertEqual(
+                [task["id"] for task in changed], [task_ids[3], task_ids[4]]
+            )
+
+    def test_batch_submission_and_aggregate_progress(self) -> None:
+        release = threading.Event()
+
+        def runner(request: ConversionRequest, progress_cb) -> ConversionResult:
+            progress_cb(ConversionStage.FETCHING, 50, "Fetching")
+            release.wait(5)
+            return ConversionResult()
+
+        def entry(lcsc_id: str) -> dict:
+            return {"lcsc_id": lcsc_id, "output_path": "./tmp/testlib", "symbol": True}
+
+        app = create_app(conversion_runner=runner, workers=2)
+        with TestClient(app) as client:
+            rejected = client.post(
+                "/tasks/batch", json={"tasks": [entry("C1"), entry("X2")]}
+            )
+            self.assertEqual(rejected.status_code, 422)
+            self.assertEqual(client.get("/tasks").json(), [])
+
+            response = client.post(
+                "/tasks/batch", json={"tasks": [entry(f"C{i}") for i in range(1, 5)]}
+            )
+            self.assertEqual(response.status_code, 202)
+            batch = response.json()
+            self.assertEqual(batch["total"], 4)
+            self.assertEqual(
+                [task["batch_id"] for task in batch["tasks"]], [batch["id"]] * 4
+            )
+            self.assertEqual(
+                [task["queue_position"] for task in batch["tasks"]], [1, 2, 3, 4]
+            )
+
+            with client.websocket_connect(f"/ws/tasks/batch/{batch['id']}") as stream:
+                summary = stream.receive_json()
+                self.assertEqual(summary["id"], batch["id"])
+                while summary["running"] < 2 or summary["progress"] < 25:
+                    summary = stream.receive_json()
+                self.assertEqual(summary["status"], "running")
+                self.assertEqual(summary["queued"], 2)
+
+                release.set()
+                while summary["status"] != "completed":
+                    summary = stream.receive_json()
+                self.assertEqual(summary["progress"], 100)
+                self.assertEqual(summary["completed"], 4)
+
+            polled = client.get(f"/tasks/batch/{batch['id']}").json()
+            self.assertEqual(polled["status"], "completed")
+            self.assertIsNotNone(polled["finished_at"])
+            self.assertEqual(client.get("/tasks/batch/unknown").status_code, 404)
+
+    def test_identical_requests_share_one_conversion(self) -> None:
+        release = threading.Event()
+        calls = []
+
+        def runner(request: ConversionRequest, progress_cb) -> ConversionResult:
+            calls.append(request.output_prefix)
+            progress_cb(ConversionStage.FETCHING, 40, "Fetching")
+            release.wait(5)
+            return ConversionResult(symbol_path=request.output_prefix + ".kicad_sym")
+
+        def submit(output_path: str) -> dict:
+            return client.post(
+                "/tasks",
+                json={"lcsc_id": "C8545", "output_path": output_path, "symbol": True},
+            ).json()
+
+        app = create_app(conversion_runner=runner, workers=2)
+        with TestClient(app) as client:
+            leader = submit("./tmp/shared")
+            follower = submit("./tmp/../tmp/shared")
+            other = submit("./tmp/other")
+            self.assertIsNone(leader["coalesced_with"])
+            self.assertEqual(follower["coalesced_with"], leader["id"])
+            self.assertIsNone(other["coalesced_with"])
+
+            for _ in range(100):
+                if client.get(f"/tasks/{follower['id']}").json()["progress"] == 40:
+                    break
+                time.sleep(0.02)
+            release.set()
+            details = {}
+            for _ in range(100):
+                details = {
+                    task["id"]: client.get(f"/tasks/{task['id']}").json()
+                    for task in (leader, follower, other)
+                }
+                if all(d["status"] == "completed" for d in details.values()):
+                    break
+                time.sleep(0.02)
+
+            self.assertEqual(len(calls), 2)
+            self.assertEqual(
+                details[follower["id"]]["result"], details[leader["id"]]["result"]
+            )
+            self.assertEqual(details[follower["id"]]["log"][-1]["stage"], "COMPLETED")
+
+            # Once finished, the same request runs again
+            submit("./tmp/shared")
+            for _ in range(100):
+                if len(calls) == 3:
+                    break
+                time.sleep(0.02)
+            self.assertEqual(len(calls), 3)
+
+    def test_interactive_tasks_and_clients_are_scheduled_fairly(self) -> None:
+        release = threading.Event()
+        order = []
+
+        def runner(request: ConversionRequest, progress_cb) -> ConversionResult:
+            order.append(request.lcsc_id)
+            if request.lcsc_id == "C1":
+                release.wait(5)
+            return ConversionResult()
+
+        def entry(lcsc_id: str) -> dict:
+            return {"lcsc_id": lcsc_id, "output_path": "./tmp/testlib", "symbol": True}
+
+        app = create_app(conversion_runner=runner, workers=1)
+        with TestClient(app) as client:
+            client.post("/tasks", json=entry("C1"))
+            for _ in range(100):
+                if order:
+                    break
+                time.sleep(0.01)
+            client.post(
+                "/tasks/batch",
+                json={"tasks": [entry(f"C1{i}") for i in range(4)]},
+                headers={"X-Client-Id": "alice"},
+            )
+            client.post(
+                "/tasks/batch",
+                json={"tasks": [entry(f"C2{i}") for i in range(2)]},
+                headers={"X-Client-Id": "bob"},
+            )
+            single = client.post(
+                "/tasks", json=entry("C30"), headers={"X-Client-Id": "carol"}
+            ).json()
+            self.assertEqual(single["priority"], "interactive")
+            self.assertEqual(single["queue_position"], 1)
+            positions = {
+                task["id"]: task["queue_position"]
+                for task in client.get("/tasks", params={"status": "queued"}).json()
+            }
+            self.assertEqual(sorted(positions.values()), list(range(1, 8)))
+
+            release.set()
+            for _ in range(100):
+                tasks = client.get("/tasks").json()
+                if all(task["status"] == "completed" for task in tasks):
+                    break
+                time.sleep(0.02)
+
+        self.assertEqual(
+            order, ["C1", "C30", "C10", "C20", "C11", "C21", "C12", "C13"]
+        )
+        first = next(task for task in tasks if task["id"] == single["id"])
+        self.assertGreater(first["queue_wait_seconds"], 0)
+        self.assertGreaterEqual(first["run_seconds"], 0)
@@ -0,0 +1,224 @@
+import json
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from easyeda2kicad.kicad.parameters_kicad_symbol import KicadVersion
+from easyeda2kicad.kicad.symbol_library import open_symbol_library
+from easyeda2kicad.service.batch import read_bom, run_batch
+from easyeda2kicad.service.conversion import (
+    ConversionError,
+    ConversionRequest,
+    ConversionResult,
+    ConversionStage,
+)
+from easyeda2kicad.service.locks import library_lock
+from easyeda2kicad.service.pipeline import ConversionPipeline, PipelineConfig
+
+
+class ReadBomTest(unittest.TestCase):
+    def _write(self, name: str, content: str) -> str:
+        tmpdir = tempfile.mkdtemp()
+        path = Path(tmpdir) / name
+        path.write_text(content, encoding="utf-8")
+        return str(path)
+
+    def test_csv_with_lcsc_column(self) -> None:
+        path = self._write(
+            "bom.csv",
+            "Comment,Designator,LCSC Part #\n"
+            "100nF,C1,C1525\n"
+            "10k,R1,c25744\n"
+            "100nF,C2,C1525\n"
+            "DNP,J1,\n",
+        )
+        self.assertEqual(read_bom(path), ["C1525", "C25744"])
+
+    def test_csv_without_known_column(self) -> None:
+        path = self._write("bom.csv", "Ref;Part\nR1;C25744\nU1;C8733\n")
+        self.assertEqual(read_bom(path), ["C25744", "C8733"])
+
+    def test_json_variants(self) -> None:
+        path = self._write(
+            "bom.json",
+            json.dumps({"parts": ["C2040", {"lcsc": "C8733", "qty": 2}, "nope"]}),
+        )
+        self.assertEqual(read_bom(path), ["C2040", "C8733"])
+
+
+class RunBatchTest(unittest.TestCase):
+    def _requests(self, *lcsc_ids: str):
+        return [
+            ConversionRequest(
+                lcsc_id=lcsc_id, output_prefix="/tmp/lib", generate_symbol=True
+            )
+            for lcsc_id in lcsc_ids
+        ]
+
+    def test_runs_in_parallel_and_keeps_order(self) -> None:
+        def slow_fetch(job):
+            time.sleep(0.2)
+            if job.request.lcsc_id == "C2":
+                raise ConversionError("No CAD data received for component C2.")
+
+        seen = []
+        with mock.patch(
+            "easyeda2kicad.service.pipeline.fetch_stage", side_effect=slow_fetch
+        ), mock.patch("easyeda2kicad.service.pipeline.parse_stage"), mock.patch(
+            "easyeda2kicad.service.pipeline.convert_stage"
+        ), mock.patch(
+            "easyeda2kicad.service.pipeline.commit_stage",
+            side_effect=lambda job: ConversionResult(symbol_path="/tmp/lib.kicad_sym"),
+        ):
+            report = run_batch(
+                self._requests("C1", "C2", "C3", "C4"),
+                workers=4,
+                api=object(),
+                on_item=lambda item: seen.append(item.lcsc_id),
+            )
+
+        self.assertLess(report.seconds, 0.6)
+        self.assertEqual([item.lcsc_id for item in report.items], ["C1", "C2", "C3", "C4"])
+        self.assertEqual(sorted(seen), ["C1", "C2", "C3", "C4"])
+        self.assertEqual([item.lcsc_id for item in report.failed], ["C2"])
+        self.assertIn("No CAD data", report.failed[0].error)
+
+    def test_part_times_exclude_the_queue_wait(self) -> None:
+        with mock.patch(
+            "easyeda2kicad.service.pipeline.fetch_stage",
+            side_effect=lambda job: time.sleep(0.1),
+        ), mock.patch("easyeda2kicad.service.pipeline.parse_stage"), mock.patch(
+            "easyeda2kicad.service.pipeline.convert_stage"
+        ), mock.patch(
+            "easyeda2kicad.service.pipeline.commit_stage",
+            side_effect=lambda job: ConversionResult(),
+        ):
+            report = run_batch(
+                self._requests("C1", "C2", "C3", "C4"), workers=1, api=object()
+            )
+
+        # One fetch at a time: the last part waited 0.3s before its own 0.1s
+        self.assertGreaterEqual(report.seconds, 0.4)
+        for item in report.items:
+            self.assertGreaterEqual(item.seconds, 0.1)
+            self.assertLess(item.seconds, 0.25)
+
+
+class ConversionPipelineTest(unittest.TestCase):
+    def test_stages_overlap_across_parts(self) -> None:
+        events = []
+        lock = threading.Lock()
+
+        def record(name):
+            def stage(job):
+                with lock:
+                    events.append((name, job.request.lcsc_id))
+                time.sleep(0.05)
+                job.notify(ConversionStage.FETCHING, name)
+                return ConversionResult(messages=[name]) if name == "commit" else None
+
+            return stage
+
+        progress = []
+        with mock.patch(
+            "easyeda2kicad.service.pipeline.fetch_stage", side_effect=record("fetch")
+        ), mock.patch(
+            "easyeda2kicad.service.pipeline.parse_stage", side_effect=record("parse")
+        ), mock.patch(
+            "easyeda2kicad.service.pipeline.convert_stage", side_effect=record("convert")
+        ), mock.patch(
+            "easyeda2kicad.service.pipeline.commit_stage", side_effect=record("commit")
+        ):
+            config = PipelineConfig(
+                fetch_workers=4,
+                parse_workers=1,
+                convert_workers=1,
+                commit_workers=1,
+                queue_size=2,
+            )
+            started = time.perf_counter()
+            with ConversionPipeline(config, api=object()) as pipeline:
+                futures = [
+                    pipeline.submit(
+                        request,
+                        progress_cb=lambda stage, percent, message: progress.append(
+                            message
+                        ),
+                    )
+                    for request in self._requests("C1", "C2", "C3", "C4")
+                ]
+                results = [future.result() for future in futures]
+            elapsed = time.perf_counter() - started
+
+        # Sequential runs would take 4 parts x 4 stages x 50 ms
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual([result.messages for result in results], [["commit"]] * 4)
+        self.assertEqual(len(events), 16)
+        self.assertEqual(progress.count("commit"), 4)
+
+    def test_failed_flush_fails_the_parts_of_every_commit_worker(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            lib_path = Path(tmpdir) / "lib.kicad_sym"
+            original = "(kicad_symbol_lib\n  (version 20211014)\n  (generator x)\n)"
+            lib_path.write_text(original, encoding="utf-8")
+            # Both workers add their part before either of them flushes
+            both_added = threading.Barrier(2, timeout=5)
+
+            def commit(job):
+                with library_lock(lib_path):
+                    library = open_symbol_library(str(lib_path), KicadVersion.v6)
+                    name = job.request.lcsc_id
+                    library.add(f'(symbol "{name}"\n)', name)
+                    job.symbol_library = library
+                    job.symbol_ticket = library.ticket
+                both_added.wait()
+                return ConversionResult(symbol_path=str(lib_path))
+
+            with mock.patch("easyeda2kicad.service.pipeline.fetch_stage"), mock.patch(
+                "easyeda2kicad.service.pipeline.parse_stage"
+            ), mock.patch("easyeda2kicad.service.pipeline.convert_stage"), mock.patch(
+                "easyeda2kicad.service.pipeline.commit_stage", side_effect=commit
+            ), mock.patch(
+                "easyeda2kicad.kicad.symbol_library.os.replace",
+                side_effect=OSError("disk full"),
+            ):
+                config = PipelineConfig(commit_workers=2)
+                with ConversionPipeline(config, api=object()) as pipeline:
+                    futures = [
+                        pipeline.submit(request)
+                        for request in self._requests("C1", "C2")
+                    ]
+                    errors = [future.exception(timeout=5) for future in futures]
+
+            self.assertTrue(all(isinstance(error, OSError) for error in errors))
+            self.assertEqual(lib_path.read_text(encoding="utf-8"), original)
+
+    _requests = RunBatchTest._requests
+
+
+class LibraryLockTest(unittest.TestCase):
+    def test_writers_are_serialized_and_lock_is_reentrant(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            lib_path = Path(tmpdir) / "lib.kicad_sym"
+            active = []
+            overlaps = []
+
+            def writer() -> None:
+                with library_lock(lib_path):
+                    with library_lock(str(lib_path)):
+                        active.append(1)
+                        if len(active) > 1:
+                            overlaps.append(1)
+                        time.sleep(0.02)
+                        active.pop()
+
+            threads = [threading.Thread(target=writer) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(overlaps, [])
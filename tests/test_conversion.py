@@ -0,0 +1,91 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from easyeda2kicad.easyeda.parameters_easyeda import Ee3dModel, Ee3dModelBase
+from easyeda2kicad.service.conversion import (
+    ConversionError,
+    ConversionRequest,
+    create_job,
+    run_conversion,
+)
+
+
+def _model() -> Ee3dModel:
+    return Ee3dModel(
+        name="part",
+        uuid="uuid-part",
+        translation=Ee3dModelBase(),
+        rotation=Ee3dModelBase(),
+    )
+
+
+class StreamedStepTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.model_dir = Path(self._tmp.name) / "lib.3dshapes"
+        self.model_dir.mkdir()
+        self.request = ConversionRequest(
+            lcsc_id="C1",
+            output_prefix=str(Path(self._tmp.name) / "lib"),
+            generate_model=True,
+        )
+
+    def _stream(self, job, model_3d: Ee3dModel) -> str:
+        destination = job.step_destination(model_3d)
+        Path(destination).write_bytes(b"ISO-10303-21;")
+        model_3d.step_path = destination
+        return destination
+
+    def test_step_is_streamed_aside_and_placed_on_commit(self) -> None:
+        job = create_job(self.request, api=object())
+        job.model_dir = self.model_dir
+        job.model_data = _model()
+        streamed = self._stream(job, job.model_data)
+        self.assertNotEqual(Path(streamed).name, "part.step")
+
+        job.step_file = self.model_dir / "part.step"
+        job.place_streamed_step()
+        self.assertEqual(
+            [path.name for path in self.model_dir.iterdir()], ["part.step"]
+        )
+        self.assertEqual(job.model_data.step_path, str(job.step_file))
+
+    def test_failed_job_removes_the_streamed_step(self) -> None:
+        def failing_parse(job) -> None:
+            job.model_data = _model()
+            self._stream(job, job.model_data)
+            raise ConversionError("Broken footprint data.")
+
+        def fetch(job) -> None:
+            job.model_dir = self.model_dir
+
+        with mock.patch(
+            "easyeda2kicad.service.conversion.fetch_stage", side_effect=fetch
+        ), mock.patch(
+            "easyeda2kicad.service.conversion.parse_stage", side_effect=failing_parse
+        ):
+            with self.assertRaises(ConversionError):
+                run_conversion(self.request, api=object())
+        self.assertEqual(list(self.model_dir.iterdir()), [])
+
+
+class ModelPlacementTest(unittest.TestCase):
+    def _request(self, **kwargs) -> ConversionRequest:
+        return ConversionRequest(lcsc_id="C1", output_prefix="lib", **kwargs)
+
+    def test_default_follows_the_model_export(self) -> None:
+        footprint_only = self._request(generate_footprint=True)
+        self.assertEqual(footprint_only.model_placement, "metadata")
+        with_model = self._request(generate_footprint=True, generate_model=True)
+        self.assertEqual(with_model.model_placement, "geometry")
+
+    def test_explicit_placement_is_kept(self) -> None:
+        request = self._request(generate_footprint=True, model_placement="geometry")
+        self.assertEqual(request.model_placement, "geometry")
+
+
+if __name__ == "__main__":
+    unittest.main()
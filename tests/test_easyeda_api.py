@@ -0,0 +1,259 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from easyeda2kicad.easyeda.cache import ResponseCache
+from easyeda2kicad.easyeda.easyeda_api import EasyedaApi
+from easyeda2kicad.easyeda.http_session import HttpSessionConfig, PooledHttpSession
+from easyeda2kicad.easyeda.model_store import ModelBlobStore
+
+
+class _FakeResponse:
+    def __init__(
+        self,
+        payload=None,
+        content: bytes = b"",
+        status_code: int = 200,
+        headers=None,
+    ):
+        self._payload = payload
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self):
+        if isinstance(self._payload, Exception):
+            raise self._payload
+        return self._payload
+
+
+class _FakeSession:
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    def get(self, url: str, **kwargs):
+        self.calls.append((url, kwargs))
+        response = self.responses[url]
+        return response.pop(0) if isinstance(response, list) else response
+
+
+class PooledSessionTest(unittest.TestCase):
+    def test_threads_share_adapter_but_not_sessions(self) -> None:
+        pooled = PooledHttpSession(
+            config=HttpSessionConfig(pool_connections=2, pool_maxsize=3)
+        )
+        sessions = []
+
+        def grab() -> None:
+            sessions.append(pooled._session())
+
+        threads = [threading.Thread(target=grab) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({id(session) for session in sessions}), 3)
+        adapters = {id(session.get_adapter("https://easyeda.com")) for session in sessions}
+        self.assertEqual(len(adapters), 1)
+        self.assertEqual(pooled._adapter._pool_maxsize, 3)
+        self.assertIn("gzip", sessions[0].headers["Accept-Encoding"])
+        pooled.close()
+
+
+class EasyedaApiTest(unittest.TestCase):
+    def test_cad_data_uses_injected_session(self) -> None:
+        url = "https://easyeda.com/api/products/C1/components?version=6.4.19.5"
+        session = _FakeSession({url: _FakeResponse(payload={"result": {"a": 1}})})
+        api = EasyedaApi(session=session, use_cache=False)
+        self.assertEqual(api.get_cad_data_of_component("C1"), {"a": 1})
+        self.assertEqual(len(session.calls), 1)
+
+    def test_missing_model_returns_none(self) -> None:
+        url = "https://modules.easyeda.com/3dmodel/abc"
+        session = _FakeSession({url: _FakeResponse(status_code=404)})
+        api = EasyedaApi(session=session, use_cache=False)
+        with self.assertLogs(level="ERROR"):
+            self.assertIsNone(api.get_raw_3d_model_obj("abc"))
+
+    def test_concurrent_fetches_share_one_request(self) -> None:
+        url = "https://easyeda.com/api/products/C2/components?version=6.4.19.5"
+        release = threading.Event()
+
+        class SlowSession(_FakeSession):
+            def get(self, url: str, **kwargs):
+                release.wait(5)
+                return super().get(url, **kwargs)
+
+        session = SlowSession({url: _FakeResponse(payload={"result": {"pins": []}})})
+        api = EasyedaApi(session=session, use_cache=False)
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(api.get_cad_data_of_component("C2"))
+            )
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        while api.flights.in_flight() == 0:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(session.calls), 1)
+        self.assertEqual(results, [{"pins": []}] * 4)
+        # Callers do not share the parsed response
+        self.assertEqual(len({id(result) for result in results}), 4)
+
+
+API_URL = "https://easyeda.com/api/products/C1/components?version=6.4.19.5"
+API_BODY = b'{"success": true, "result": {"title": "R"}}'
+
+
+def _api_response(**kwargs) -> _FakeResponse:
+    return _FakeResponse(
+        payload={"success": True, "result": {"title": "R"}},
+        content=API_BODY,
+        **kwargs,
+    )
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.directory = self._tmpdir.name
+
+    def tearDown(self) -> None:
+        self._tmpdir.cleanup()
+
+    def test_fresh_entry_skips_network(self) -> None:
+        session = _FakeSession({API_URL: [_api_response()]})
+        cache = ResponseCache(directory=self.directory)
+        api = EasyedaApi(session=session, cache=cache)
+
+        self.assertEqual(api.get_cad_data_of_component("C1"), {"title": "R"})
+        self.assertEqual(api.get_cad_data_of_component("C1"), {"title": "R"})
+        self.assertEqual(len(session.calls), 1)
+        self.assertEqual(cache.stats.misses, 1)
+        self.assertEqual(cache.stats.hits, 1)
+
+    def test_expired_entry_is_revalidated(self) -> None:
+        session = _FakeSession(
+            {
+                API_URL: [
+                    _api_response(headers={"ETag": '"v1"'}),
+                    _FakeResponse(status_code=304),
+                ]
+            }
+        )
+        cache = ResponseCache(directory=self.directory, ttl=0)
+        api = EasyedaApi(session=session, cache=cache)
+
+        api.get_cad_data_of_component("C1")
+        self.assertEqual(api.get_cad_data_of_component("C1"), {"title": "R"})
+        self.assertEqual(session.calls[1][1]["headers"]["If-None-Match"], '"v1"')
+        self.assertEqual(cache.stats.revalidated, 1)
+
+    def test_error_responses_fall_back_to_stale_entries(self) -> None:
+        session = _FakeSession(
+            {
+                API_URL: [
+                    _api_response(),
+                    _FakeResponse(payload=ValueError("HTML"), status_code=503),
+                    _FakeResponse(payload=ValueError("HTML"), content=b"<html>"),
+                    _FakeResponse(payload={"success": False, "code": 500}),
+                ]
+            }
+        )
+        cache = ResponseCache(directory=self.directory, ttl=0)
+        api = EasyedaApi(session=session, cache=cache)
+
+        api.get_cad_data_of_component("C1")
+        for _ in range(3):
+            with self.assertLogs(level="WARNING"):
+                self.assertEqual(api.get_cad_data_of_component("C1"), {"title": "R"})
+        self.assertEqual(cache.stats.stale_hits, 3)
+        self.assertEqual(cache.lookup(API_URL).body, API_BODY)
+
+    def test_offline_serves_stale_entries(self) -> None:
+        session = _FakeSession({API_URL: [_api_response()]})
+        EasyedaApi(
+            session=session, cache=ResponseCache(directory=self.directory)
+        ).get_cad_data_of_component("C1")
+
+        offline = ResponseCache(directory=self.directory, ttl=0, offline=True)
+        api = EasyedaApi(session=_FakeSession({}), cache=offline)
+        self.assertEqual(api.get_cad_data_of_component("C1"), {"title": "R"})
+        self.assertEqual(offline.stats.stale_hits, 1)
+        with self.assertLogs(level="ERROR"):
+            self.assertEqual(api.get_cad_data_of_component("C2"), {})
+
+    def test_least_recently_used_entries_are_evicted(self) -> None:
+        cache = ResponseCache(directory=self.directory, max_bytes=20)
+        cache.store("https://a", b"a" * 10, {})
+        time.sleep(0.01)
+        cache.store("https://b", b"b" * 10, {})
+        cache.mark_used(cache.lookup("https://a"))
+        cache.store("https://c", b"c" * 10, {})
+
+        self.assertIsNotNone(cache.lookup("https://a"))
+        self.assertIsNone(cache.lookup("https://b"))
+        self.assertIsNotNone(cache.lookup("https://c"))
+        self.assertEqual(cache.stats.evictions, 1)
+
+
+class ModelBlobStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmpdir.name)
+
+    def tearDown(self) -> None:
+        self._tmpdir.cleanup()
+
+    def test_repeat_downloads_are_served_from_store(self) -> None:
+        url = "https://modules.easyeda.com/3dmodel/uuid-1"
+        session = _FakeSession({url: [_FakeResponse(content=b"v 1 2 3\n")]})
+        store = ModelBlobStore(directory=self.directory / "models")
+        api = EasyedaApi(session=session, use_cache=False, model_store=store)
+
+        self.assertEqual(api.get_raw_3d_model_obj("uuid-1"), "v 1 2 3\n")
+        self.assertEqual(api.get_raw_3d_model_obj("uuid-1"), "v 1 2 3\n")
+        self.assertEqual(len(session.calls), 1)
+        self.assertEqual(store.stats.hits, 1)
+
+    def test_identical_payloads_are_stored_once(self) -> None:
+        store = ModelBlobStore(directory=self.directory / "models")
+        first = store.put("uuid-a", "step", b"STEP")
+        second = store.put("uuid-b", "step", b"STEP")
+        self.assertEqual(first, second)
+        objects = [p for p in (self.directory / "models" / "objects").rglob("*") if p.is_file()]
+        self.assertEqual(len(objects), 1)
+
+    def test_corrupted_objects_are_discarded(self) -> None:
+        store = ModelBlobStore(directory=self.directory / "models")
+        digest = store.put("uuid-a", "obj", b"payload")
+        store._object_path(digest).write_bytes(b"tampered")
+        with self.assertLogs(level="WARNING"):
+            self.assertIsNone(store.get("uuid-a", "obj"))
+
+    def test_materialize_hardlinks_into_library(self) -> None:
+        store = ModelBlobStore(directory=self.directory / "models", link_mode="hardlink")
+        store.put("uuid-a", "wrl", b"#VRML V2.0 utf8\n")
+        target = self.directory / "lib.3dshapes" / "part.wrl"
+        target.parent.mkdir()
+
+        self.assertTrue(store.materialize("uuid-a", "wrl", str(target)))
+        self.assertEqual(target.read_bytes(), b"#VRML V2.0 utf8\n")
+        self.assertGreaterEqual(os.stat(target).st_nlink, 2)
+        self.assertFalse(store.materialize("uuid-b", "wrl", str(target)))
@@ -0,0 +1,153 @@
+import json
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from easyeda2kicad.easyeda.easyeda_importer import Easyeda3dModelImporter
+from easyeda2kicad.easyeda.model_store import ModelBlobStore
+
+SAMPLE_OBJ = """newmtl mat1
+Ka 0.2 0.2 0.2
+Kd 0.8 0.1 0.1
+Ks 0.5 0.5 0.5
+d 1
+endmtl
+v 0 0 0
+v 2.54 0 0
+v 2.54 2.54 2.54
+v 0 2.54 0
+usemtl mat1
+f 1// 2// 3//
+f 1// 3// 4//
+"""
+
+SVGNODE_LINE = "SVGNODE~" + json.dumps(
+    {
+        "attrs": {
+            "title": "R0402",
+            "uuid": "model-uuid",
+            "c_origin": "4000,3000",
+            "z": "0",
+            "c_rotation": "0,0,0",
+        }
+    }
+)
+
+
+class _SlowApi:
+    """Fake EasyedaApi whose downloads take `delay` seconds each."""
+
+    def __init__(self, delay: float = 0.2) -> None:
+        self.delay = delay
+        self.model_store = None
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _record(self, name: str) -> None:
+        with self.lock:
+            self.calls.append(name)
+        time.sleep(self.delay)
+
+    def get_raw_3d_model_obj(self, uuid: str) -> str:
+        self._record("obj")
+        return SAMPLE_OBJ
+
+    def get_step_3d_model(self, uuid: str) -> bytes:
+        self._record("step")
+        return b"STEP"
+
+    def download_step_3d_model(self, uuid: str, destination: str) -> bool:
+        self._record("step-stream")
+        Path(destination).write_bytes(b"STEP")
+        return True
+
+
+class Easyeda3dModelImporterTest(unittest.TestCase):
+    def test_obj_and_step_are_downloaded_concurrently(self) -> None:
+        api = _SlowApi(delay=0.3)
+        started = time.perf_counter()
+        model = Easyeda3dModelImporter(
+            easyeda_cp_cad_data=[SVGNODE_LINE], download_raw_3d_model=True, api=api
+        ).output
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.55)
+        self.assertEqual(sorted(api.calls), ["obj", "step"])
+        self.assertEqual(model.step, b"STEP")
+        self.assertEqual(model.size, (1.0, 1.0, 1.0))
+
+    def test_step_is_streamed_to_destination(self) -> None:
+        api = _SlowApi(delay=0)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            target = Path(tmpdir) / "R0402.step"
+            model = Easyeda3dModelImporter(
+                easyeda_cp_cad_data=[SVGNODE_LINE],
+                download_raw_3d_model=True,
+                api=api,
+                step_destination=lambda model_3d: str(target),
+            ).output
+            self.assertIsNone(model.step)
+            self.assertEqual(model.step_path, str(target))
+            self.assertEqual(target.read_bytes(), b"STEP")
+
+    def test_payloads_are_fetched_on_first_access_only(self) -> None:
+        api = _SlowApi(delay=0)
+        model = Easyeda3dModelImporter(
+            easyeda_cp_cad_data=[SVGNODE_LINE],
+            download_raw_3d_model=False,
+            api=api,
+            model_placement="metadata",
+        ).output
+
+        self.assertEqual(api.calls, [])
+        self.assertIsNone(model.center)
+        self.assertEqual(model.step, b"STEP")
+        self.assertEqual(model.step, b"STEP")
+        self.assertEqual(api.calls, ["step"])
+
+    def test_geometry_placement_fetches_obj_only(self) -> None:
+        api = _SlowApi(delay=0)
+        model = Easyeda3dModelImporter(
+            easyeda_cp_cad_data=[SVGNODE_LINE],
+            download_raw_3d_model=False,
+            api=api,
+        ).output
+
+        self.assertEqual(api.calls, ["obj"])
+        self.assertEqual(model.size, (1.0, 1.0, 1.0))
+
+    def test_concurrent_readers_share_one_download(self) -> None:
+        api = _SlowApi(delay=0.1)
+        model = Easyeda3dModelImporter(
+            easyeda_cp_cad_data=[SVGNODE_LINE],
+            download_raw_3d_model=False,
+            api=api,
+            model_placement="metadata",
+        ).output
+
+        readers = [threading.Thread(target=lambda: model.raw_obj) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        self.assertEqual(api.calls, ["obj"])
+
+    def test_parsed_obj_is_cached_in_model_store(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            api = _SlowApi(delay=0)
+            api.model_store = ModelBlobStore(directory=Path(tmpdir))
+            first = Easyeda3dModelImporter(
+                easyeda_cp_cad_data=[SVGNODE_LINE], download_raw_3d_model=False, api=api
+            ).output
+            self.assertIs(first.obj_model, first.obj_model)
+            self.assertEqual(api.calls, ["obj"])
+
+            second = Easyeda3dModelImporter(
+                easyeda_cp_cad_data=[SVGNODE_LINE], download_raw_3d_model=True, api=api
+            ).output
+            self.assertEqual(second.size, (1.0, 1.0, 1.0))
+            self.assertEqual(second.obj_model.shapes, first.obj_model.shapes)
+            # Placed from the stored model: the OBJ was not downloaded again
+            self.assertEqual(sorted(api.calls), ["obj", "step"])
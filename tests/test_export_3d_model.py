@@ -0,0 +1,212 @@
+import gzip
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from easyeda2kicad.easyeda.model_store import ModelBlobStore
+from easyeda2kicad.easyeda.obj_model import ObjModel
+from easyeda2kicad.easyeda.obj_vertices import iter_obj_chunks
+from easyeda2kicad.easyeda.parameters_easyeda import (
+    Ee3dModel,
+    Ee3dModelBase,
+    Ee3dModelPayload,
+)
+from easyeda2kicad.kicad.export_kicad_3d_model import (
+    VRML_HEADER,
+    Exporter3dModelKicad,
+    WrlOptions,
+    generate_wrl_model,
+    write_wrl_model,
+)
+
+TWO_SHAPES_OBJ = """newmtl mat1
+Ka 0.2 0.2 0.2
+Kd 0.8 0.1 0.1
+Ks 0.5 0.5 0.5
+d 1
+endmtl
+newmtl mat2
+Kd 0.1 0.1 0.1
+Ks 0 0 0
+endmtl
+v 0 0 0
+v 2.54 0 0
+v 2.54 2.54 2.54
+v 0 2.54 0
+usemtl mat1
+f 1// 2// 3//
+usemtl mat2
+f 1// 3// 4//
+"""
+
+
+def _shape(diffuse: str, specular: str, points: str) -> str:
+    return (
+        "\nShape{\n    appearance Appearance {\n        material  Material \t{\n"
+        f"            diffuseColor {diffuse}\n"
+        f"            specularColor {specular}\n"
+        "            ambientIntensity 0.2\n            transparency 0\n"
+        "            shininess 0.5\n        }\n    }\n"
+        "    geometry IndexedFaceSet {\n        ccw TRUE\n        solid FALSE\n"
+        "        coord DEF co Coordinate {\n            point [\n"
+        f"                {points}\n            ]\n        }}\n"
+        "        coordIndex [\n            0,1,2,-1,\n        ]\n    }\n}"
+    )
+
+
+# Output of the previous, non-streaming exporter for TWO_SHAPES_OBJ
+EXPECTED_WRL = (
+    VRML_HEADER
+    + _shape(
+        "0.8 0.1 0.1",
+        "0.5 0.5 0.5",
+        "0.0 0.0 0.0, 1.0 0.0 0.0, 1.0 1.0 1.0, 1.0 1.0 1.0",
+    )
+    + _shape("0.1 0.1 0.1", "0 0 0", "0.0 0.0 0.0, 1.0 1.0 1.0, 0.0 1.0 0.0, 0.0 1.0 0.0")
+)
+
+
+def _model(raw_obj: str) -> Ee3dModel:
+    return Ee3dModel(
+        name="R0402.wrl",
+        uuid="model-uuid",
+        translation=Ee3dModelBase(),
+        rotation=Ee3dModelBase(),
+        payload=Ee3dModelPayload(raw_obj=raw_obj),
+    )
+
+
+class WrlWriterTest(unittest.TestCase):
+    def test_output_matches_previous_exporter(self) -> None:
+        self.assertEqual(generate_wrl_model(_model(TWO_SHAPES_OBJ)).raw_wrl, EXPECTED_WRL)
+
+    def test_no_model_without_obj_data(self) -> None:
+        self.assertIsNone(generate_wrl_model(_model("")))
+
+    def test_crlf_and_chunked_file_input(self) -> None:
+        out = io.StringIO()
+        write_wrl_model(io.StringIO(TWO_SHAPES_OBJ.replace("\n", "\r\n")), out)
+        self.assertEqual(out.getvalue(), EXPECTED_WRL)
+
+    def test_chunks_end_on_line_boundaries(self) -> None:
+        for source in (TWO_SHAPES_OBJ, io.StringIO(TWO_SHAPES_OBJ)):
+            chunks = list(iter_obj_chunks(source, size=16))
+            self.assertEqual("".join(chunks), TWO_SHAPES_OBJ)
+            self.assertTrue(all(chunk.endswith("\n") for chunk in chunks))
+
+    def test_precision_and_merged_points(self) -> None:
+        # Vertices 1 and 4 are 0.01 apart: the same point with 1 decimal
+        obj = TWO_SHAPES_OBJ.replace("v 0 2.54 0", "v 0.0254 0 0")
+        out = io.StringIO()
+        write_wrl_model(obj, out, WrlOptions(precision=1, merge_points=True))
+        shape = out.getvalue().split("Shape{")[2]
+        self.assertIn("                0.0 0.0 0.0, 1.0 1.0 1.0, 1.0 1.0 1.0\n", shape)
+        self.assertIn("            0,1,0,-1,\n", shape)
+
+        with self.assertRaises(ValueError):
+            WrlOptions(precision=12)
+
+
+class ObjModelTest(unittest.TestCase):
+    def test_faces_are_grouped_by_material(self) -> None:
+        obj_model = ObjModel.parse(TWO_SHAPES_OBJ)
+        self.assertEqual([shape.material_id for shape in obj_model.shapes], ["mat1", "mat2"])
+        self.assertEqual(list(obj_model.shapes[1].indices), [1, 3, 4])
+        self.assertEqual(list(obj_model.shapes[1].face_ends), [3])
+        self.assertEqual(obj_model.materials["mat2"]["specular_color"], ["0", "0", "0"])
+        self.assertEqual(obj_model.metrics(), (0.5, 0.5, 0.5, 1.0, 1.0, 1.0))
+
+    def test_remap_keeps_first_use_order(self) -> None:
+        shape = ObjModel.parse(TWO_SHAPES_OBJ.replace("f 1// 3// 4//", "f 4 3 1\nf 3 4 2 1")).shapes[1]
+        self.assertEqual(list(shape.face_ends), [3, 7])
+        vertices, positions = shape.remap()
+        self.assertEqual(list(vertices), [4, 3, 1, 2])
+        self.assertEqual(list(positions), [0, 1, 2, 1, 0, 3, 2])
+
+    def test_malformed_faces_are_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            ObjModel.parse(TWO_SHAPES_OBJ.replace("f 1// 3// 4//", "f 1 x 4"))
+
+    def test_serialized_form_round_trips(self) -> None:
+        data = ObjModel.parse(TWO_SHAPES_OBJ).to_bytes()
+        restored = ObjModel.from_bytes(data)
+        self.assertEqual(restored.materials, ObjModel.parse(TWO_SHAPES_OBJ).materials)
+        out = io.StringIO()
+        write_wrl_model(restored, out)
+        self.assertEqual(out.getvalue(), EXPECTED_WRL)
+
+        self.assertIsNone(ObjModel.from_bytes(data[:-4]))
+        self.assertIsNone(ObjModel.from_bytes(b"not a model"))
+
+
+class Exporter3dModelKicadTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp.name)
+        (self.directory / "lib.3dshapes").mkdir()
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_export_streams_wrl_and_stores_it(self) -> None:
+        store = ModelBlobStore(directory=self.directory / "models")
+        exporter = Exporter3dModelKicad(_model(TWO_SHAPES_OBJ), model_store=store)
+        self.assertTrue(exporter.output)
+        exporter.export(lib_path=str(self.directory / "lib"))
+
+        wrl_path = self.directory / "lib.3dshapes" / "R0402.wrl"
+        self.assertEqual(wrl_path.read_bytes(), EXPECTED_WRL.encode("utf-8"))
+        self.assertEqual(store.get("model-uuid", "wrl"), EXPECTED_WRL.encode("utf-8"))
+
+        # A second part with the same model reuses the stored file
+        reused = Exporter3dModelKicad(_model(""), model_store=store)
+        self.assertTrue(reused.reuse_stored)
+        wrl_path.unlink()
+        reused.export(lib_path=str(self.directory / "lib"))
+        self.assertEqual(wrl_path.read_bytes(), EXPECTED_WRL.encode("utf-8"))
+
+    def test_streamed_step_is_copied_into_the_library(self) -> None:
+        streamed = self.directory / "download.step"
+        streamed.write_bytes(b"ISO-10303-21;")
+        model = _model(TWO_SHAPES_OBJ)
+        model.step_path = str(streamed)
+        Exporter3dModelKicad(model).export(lib_path=str(self.directory / "lib"))
+
+        shapes = self.directory / "lib.3dshapes"
+        self.assertEqual((shapes / "R0402.step").read_bytes(), b"ISO-10303-21;")
+        self.assertEqual(
+            sorted(path.name for path in shapes.iterdir()), ["R0402.step", "R0402.wrl"]
+        )
+
+    def test_compressed_export_reports_saved_bytes(self) -> None:
+        store = ModelBlobStore(directory=self.directory / "models")
+        options = WrlOptions(compress=True)
+        exporter = Exporter3dModelKicad(
+            _model(TWO_SHAPES_OBJ), model_store=store, options=options
+        )
+        exporter.export(lib_path=str(self.directory / "lib"))
+
+        wrz_path = self.directory / "lib.3dshapes" / "R0402.wrz"
+        data = wrz_path.read_bytes()
+        self.assertEqual(gzip.decompress(data), EXPECTED_WRL.encode("utf-8"))
+        self.assertEqual(exporter.stats.vrml_bytes, len(EXPECTED_WRL))
+        self.assertEqual(exporter.stats.file_bytes, len(data))
+        self.assertGreater(exporter.stats.saved_bytes, 0)
+        self.assertFalse((self.directory / "lib.3dshapes" / "R0402.wrl").exists())
+
+        # Stored per output format, and written identically every time
+        self.assertEqual(store.get("model-uuid", options.store_kind), data)
+        self.assertIsNone(store.get("model-uuid", "wrl"))
+        self.assertTrue(
+            Exporter3dModelKicad(_model(""), model_store=store, options=options).reuse_stored
+        )
+        wrz_path.unlink()
+        Exporter3dModelKicad(_model(TWO_SHAPES_OBJ), options=options).export(
+            lib_path=str(self.directory / "lib")
+        )
+        self.assertEqual(wrz_path.read_bytes(), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from easyeda2kicad.api.library_index import LibraryIndexCache
+from easyeda2kicad.api.watcher import InotifyWatcher, PollingWatcher
+
+
+def _symbol(name: str, lcsc_id: str, footprint: str) -> str:
+    return (
+        f'  (symbol "{name}"\n'
+        f'    (property "Footprint" "parts:{footprint}" (id 2))\n'
+        f'    (property "LCSC Part" "{lcsc_id}" (id 5))\n'
+        "  )\n"
+    )
+
+
+def _library(*symbols: str) -> str:
+    return "(kicad_symbol_lib (version 20211014) (generator test)\n" + "".join(symbols) + ")"
+
+
+class _LibraryTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name) / "parts"
+        self.symbol_path = self.root.with_suffix(".kicad_sym")
+        self.footprint_dir = self.root.with_suffix(".pretty")
+        self.model_dir = self.root.with_suffix(".3dshapes")
+        self.footprint_dir.mkdir()
+        self.model_dir.mkdir()
+        (self.model_dir / "SOT-23.wrl").write_text("#VRML", encoding="utf-8")
+        (self.footprint_dir / "SOT-23.kicad_mod").write_text(
+            '(footprint "SOT-23"\n  (model "${KIPRJMOD}/parts.3dshapes/SOT-23.wrl")\n)',
+            encoding="utf-8",
+        )
+        self.symbol_path.write_text(
+            _library(_symbol("Q1", "C8545", "SOT-23")), encoding="utf-8"
+        )
+        self.cache = LibraryIndexCache()
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def _lookup(self, lcsc_id: str):
+        return self.cache.get(self.symbol_path, self.root).lookup(lcsc_id)
+
+
+class LibraryIndexCacheTest(_LibraryTestCase):
+    def test_lookup_resolves_footprint_and_models(self) -> None:
+        component = self._lookup("c8545")
+        self.assertEqual(component.symbol_name, "Q1")
+        self.assertEqual(
+            component.footprint_path, str(self.footprint_dir / "SOT-23.kicad_mod")
+        )
+        self.assertEqual(list(component.model_paths), ["SOT-23.wrl"])
+        self.assertIsNone(self._lookup("C1"))
+
+    def test_repeated_lookups_do_not_reread_files(self) -> None:
+        self._lookup("C8545")
+        with mock.patch.object(Path, "read_text") as read_text:
+            for _ in range(10):
+                self.assertIsNotNone(self._lookup("C8545"))
+        read_text.assert_not_called()
+
+    def test_duplicate_lcsc_ids_resolve_to_the_first_symbol(self) -> None:
+        self.symbol_path.write_text(
+            _library(_symbol("Q1", "C8545", "SOT-23"), _symbol("Q2", "C8545", "SOT-89")),
+            encoding="utf-8",
+        )
+        self.assertEqual(self._lookup("C8545").symbol_name, "Q1")
+
+    def test_changes_on_disk_are_picked_up(self) -> None:
+        self.assertIsNone(self._lookup("C2128"))
+
+        time.sleep(0.01)
+        self.symbol_path.write_text(
+            _library(_symbol("Q1", "C8545", "SOT-23"), _symbol("D1", "C2128", "SOD-123")),
+            encoding="utf-8",
+        )
+        self.assertIsNone(self._lookup("C2128").footprint_path)
+
+        (self.footprint_dir / "SOD-123.kicad_mod").write_text(
+            '(footprint "SOD-123")', encoding="utf-8"
+        )
+        self.assertEqual(
+            self._lookup("C2128").footprint_path,
+            str(self.footprint_dir / "SOD-123.kicad_mod"),
+        )
+
+        (self.footprint_dir / "SOT-23.kicad_mod").write_text(
+            '(footprint "SOT-23")', encoding="utf-8"
+        )
+        self.assertEqual(self._lookup("C8545").model_paths, {})
+
+
+class WatchedLibraryIndexTest(_LibraryTestCase):
+    def _wait_for(self, condition) -> None:
+        deadline = time.monotonic() + 3
+        while time.monotonic() < deadline:
+            if condition():
+                return
+            time.sleep(0.02)
+        self.fail("Library change was not picked up by the watcher")
+
+    def _footprint_path(self, lcsc_id: str):
+        component = self._lookup(lcsc_id)
+        return component.footprint_path if component else None
+
+    def _check_watching(self, backend: str) -> None:
+        self.cache.start()
+        self.addCleanup(self.cache.stop)
+        self.assertEqual(self.cache.watcher.backend, backend)
+        self.cache.watch_library(self.symbol_path, self.root)
+        index = self.cache.get(self.symbol_path, self.root)
+        self._wait_for(lambda: "SOT-23" in index.known_footprints())
+
+        with mock.patch(
+            "easyeda2kicad.api.library_index.os.stat", side_effect=AssertionError
+        ), mock.patch.object(Path, "read_text", side_effect=AssertionError):
+            self.assertEqual(list(self._lookup("C8545").model_paths), ["SOT-23.wrl"])
+
+        self.symbol_path.write_text(
+            _library(_symbol("Q1", "C8545", "SOT-23"), _symbol("D1", "C2128", "SOD-123")),
+            encoding="utf-8",
+        )
+        (self.footprint_dir / "SOD-123.kicad_mod").write_text(
+            '(footprint "SOD-123")', encoding="utf-8"
+        )
+        self._wait_for(lambda: self._footprint_path("C2128"))
+
+        (self.footprint_dir / "SOT-23.kicad_mod").write_text(
+            '(footprint "SOT-23")', encoding="utf-8"
+        )
+        self._wait_for(lambda: self._lookup("C8545").model_paths == {})
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+    def test_inotify_watcher(self) -> None:
+        self.cache = LibraryIndexCache(watch=True)
+        self._check_watching("inotify")
+
+    def test_polling_watcher(self) -> None:
+        self.cache = LibraryIndexCache(watch=True)
+        with mock.patch(
+            "easyeda2kicad.api.library_index.create_library_watcher",
+            side_effect=lambda on_change: PollingWatcher(on_change, interval=0.05),
+        ):
+            self._check_watching("polling")
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+    def test_inotify_descriptor_outlives_a_stuck_thread(self) -> None:
+        watcher = InotifyWatcher(lambda changes: None)
+        watcher.start()
+        with mock.patch("threading.Thread.is_alive", return_value=True):
+            watcher.stop()
+        # The thread still owns the descriptor; it closes it when it exits
+        self.assertIsNotNone(watcher._thread)
+        watcher._thread.join(timeout=5)
+        self.assertEqual(watcher._fd, -1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from easyeda2kicad.easyeda.easyeda_importer import compute_obj_center
+from easyeda2kicad.easyeda.obj_vertices import ObjVertices, np, parse_obj_vertices
+
+CUBE_OBJ = """v 0 0 0
+v 5.08 0 0
+v 5.08 2.54 0
+v 0 2.54 7.62
+f 1// 2// 3//
+"""
+
+
+class ObjVerticesTest(unittest.TestCase):
+    def test_metrics_are_in_wrl_units(self) -> None:
+        vertices = parse_obj_vertices(CUBE_OBJ, use_numpy=False)
+        self.assertEqual(len(vertices), 4)
+        self.assertEqual(vertices.metrics(), (1.0, 0.5, 1.5, 2.0, 1.0, 3.0))
+        self.assertEqual(compute_obj_center(CUBE_OBJ), (1.0, 0.5, 1.5, 2.0, 1.0, 3.0))
+
+    def test_format_rounds_like_the_original_exporter(self) -> None:
+        vertices = ObjVertices(use_numpy=False)
+        vertices.extend(["1 2 3", "0.1 0.2 0.3"])
+        self.assertEqual(
+            vertices.format_points([1, 2, 0]),
+            "0.3937 0.7874 1.1811, 0.0394 0.0787 0.1181, 0.0394 0.0787 0.1181",
+        )
+        self.assertEqual(vertices.format_points([]), "")
+
+    def test_vertices_that_are_not_3d(self) -> None:
+        vertices = ObjVertices(use_numpy=False)
+        vertices.extend(["2.54 2.54 2.54"])
+        vertices.extend(["2.54 5.08", "0 0 0"])
+        self.assertEqual(vertices.format_points([1, 2]), "1.0 1.0 1.0, 1.0 2.0")
+        # Only 3D vertices count for the bounds
+        self.assertEqual(vertices.metrics(), (0.5, 0.5, 0.5, 1.0, 1.0, 1.0))
+
+    def test_merged_points(self) -> None:
+        for use_numpy in (False, True) if np is not None else (False,):
+            vertices = ObjVertices(use_numpy=use_numpy)
+            vertices.extend(["0 0 0", "2.54 0 0", "0.0254 0 0", "2.5654 0 0"])
+            points, positions = vertices.merge_points([4, 3, 2, 1], [0, 1, 2, 3, 1], 1)
+            self.assertEqual(list(points), [4, 3])
+            self.assertEqual(list(positions), [0, 1, 0, 1, 1])
+            self.assertEqual(vertices.format_points(points, 1), "1.0 0.0 0.0, 0.0 0.0 0.0")
+
+    def test_empty_and_malformed_meshes(self) -> None:
+        self.assertIsNone(parse_obj_vertices("f 1// 2// 3//\n").metrics())
+        with self.assertLogs(level="WARNING"):
+            self.assertIsNone(compute_obj_center("v 1 x 3\n"))
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_numpy_matches_pure_python(self) -> None:
+        text = "".join(
+            f"v {i * 0.37 - 11:.6f} {i * 1.3 % 7:.6f} {-i * 0.011:.6f}\n"
+            for i in range(1, 500)
+        )
+        fast = parse_obj_vertices(text, use_numpy=True)
+        slow = parse_obj_vertices(text, use_numpy=False)
+        self.assertTrue(fast.use_numpy)
+        self.assertEqual(fast.metrics(), slow.metrics())
+        indices = list(range(1, 500, 7))
+        self.assertEqual(fast.format_points(indices), slow.format_points(indices))
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_rounding_ties_match_round(self) -> None:
+        # Values whose scaled product lands next to a half step
+        values = [f"{i * 2.54 / 1e4 + 1.27e-4:.9f}" for i in range(2000)]
+        fast = ObjVertices(use_numpy=True)
+        slow = ObjVertices(use_numpy=False)
+        for vertices in (fast, slow):
+            vertices.extend([f"{value} {value} 0" for value in values])
+        indices = range(1, len(values) + 1)
+        self.assertEqual(fast.format_points(indices), slow.format_points(indices))
+
+
+if __name__ == "__main__":
+    unittest.main()
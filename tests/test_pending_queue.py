@@ -0,0 +1,50 @@
+import random
+import unittest
+
+from easyeda2kicad.api.pending_queue import PendingQueue
+
+
+class PendingQueueTest(unittest.TestCase):
+    def test_positions_follow_dequeues(self) -> None:
+        queue = PendingQueue()
+        for task_id in "abcd":
+            queue.append(task_id)
+        self.assertEqual([queue.position(t) for t in "abcd"], [1, 2, 3, 4])
+
+        self.assertTrue(queue.remove("a"))
+        self.assertIsNone(queue.position("a"))
+        self.assertFalse(queue.remove("a"))
+        self.assertEqual([queue.position(t) for t in "bcd"], [1, 2, 3])
+
+        self.assertTrue(queue.remove("c"))
+        self.assertEqual([queue.position(t) for t in "bd"], [1, 2])
+        queue.remove("b")
+        self.assertEqual(queue.position("d"), 1)
+        self.assertEqual(list(queue), ["d"])
+
+    def test_matches_list_index_under_random_removals(self) -> None:
+        rng = random.Random(15)
+        queue = PendingQueue()
+        expected = []
+        for step in range(2000):
+            if expected and rng.random() < 0.45:
+                task_id = expected[0] if rng.random() < 0.7 else rng.choice(expected)
+                expected.remove(task_id)
+                queue.remove(task_id)
+            else:
+                task_id = f"task-{step}"
+                expected.append(task_id)
+                queue.append(task_id)
+            self.assertEqual(len(queue), len(expected))
+            for task_id in rng.sample(expected, min(5, len(expected))):
+                self.assertEqual(queue.position(task_id), expected.index(task_id) + 1)
+        self.assertEqual(list(queue), expected)
+        drained = []
+        while queue:
+            drained.append(queue.popleft())
+        self.assertEqual(drained, expected)
+        self.assertIsNone(queue.popleft())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import random
+import unittest
+
+from easyeda2kicad.api.scheduler import (
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    TaskScheduler,
+)
+
+
+class TaskSchedulerTest(unittest.TestCase):
+    def test_weighted_round_robin_between_classes(self) -> None:
+        scheduler = TaskScheduler()
+        for index in range(6):
+            scheduler.push(f"i{index}", PRIORITY_INTERACTIVE)
+            scheduler.push(f"b{index}", PRIORITY_BULK)
+        order = [scheduler.pop() for _ in range(12)]
+        self.assertEqual(order[:6], ["i0", "i1", "i2", "i3", "b0", "i4"])
+        self.assertIsNone(scheduler.pop())
+
+    def test_positions_match_dispatch_order_mid_round(self) -> None:
+        rng = random.Random(20)
+        for _ in range(200):
+            scheduler = TaskScheduler()
+            for index in range(rng.randrange(1, 30)):
+                priority = rng.choice([PRIORITY_INTERACTIVE, PRIORITY_BULK])
+                scheduler.push(f"{priority}-{index}", priority)
+            # Stop anywhere inside a round
+            for _ in range(rng.randrange(len(scheduler))):
+                scheduler.pop()
+            positions = {task_id: scheduler.position(task_id) for task_id in scheduler}
+            order = []
+            while scheduler:
+                order.append(scheduler.pop())
+            self.assertEqual(
+                positions, {task_id: index + 1 for index, task_id in enumerate(order)}
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
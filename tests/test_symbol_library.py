@@ -0,0 +1,196 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from easyeda2kicad.helpers import (
+    add_component_in_symbol_lib_file,
+    id_already_in_symbol_lib,
+    update_component_in_symbol_lib_file,
+)
+from easyeda2kicad.kicad.parameters_kicad_symbol import KicadVersion
+from easyeda2kicad.kicad import symbol_library
+from easyeda2kicad.kicad.symbol_library import SymbolLibrary, open_symbol_library
+
+KICAD_LIBRARY = """(kicad_symbol_lib (version 20211014) (generator kicad_symbol_editor)
+\t(symbol "Existing" (in_bom yes) (on_board yes)
+\t\t(property "Value" "(not a list" (id 1) (at 0 0 0))
+\t\t(symbol "Existing_0_1"
+\t\t\t(rectangle (start 0 0) (end 1 1))
+\t\t)
+\t)
+
+\t(symbol "Other:Part" (in_bom yes) (on_board yes)
+\t)
+)
+"""
+
+
+def symbol(name: str, value: str = "R") -> str:
+    return (
+        f'(symbol "{name}"\n'
+        f'  (property "Value" "{value}")\n'
+        f'  (symbol "{name}_0_1"\n'
+        "    (rectangle (start 0 0) (end 1 1))\n"
+        "  )\n"
+        ")"
+    )
+
+
+class SymbolLibraryTest(unittest.TestCase):
+    def _library_file(self, content: str, name: str = "lib.kicad_sym") -> Path:
+        path = Path(tempfile.mkdtemp()) / name
+        path.write_text(content, encoding="utf-8")
+        return path
+
+    def test_unmodified_library_renders_identically(self) -> None:
+        path = self._library_file(KICAD_LIBRARY)
+        library = SymbolLibrary(str(path), KicadVersion.v6)
+
+        self.assertEqual(library.names, ["Existing", "Other:Part"])
+        self.assertEqual(
+            library.prefix + "".join(library.chunks) + library.suffix, KICAD_LIBRARY
+        )
+        self.assertTrue(library.contains("Other{colon}Part"))
+        self.assertFalse(library.flush())
+
+    def test_replace_keeps_position_and_neighbours(self) -> None:
+        path = self._library_file(KICAD_LIBRARY)
+        library = SymbolLibrary(str(path), KicadVersion.v6)
+        library.replace("Existing", symbol("Existing", "new"))
+        library.add(symbol("Added"))
+        library.add_sub_units("Added", [symbol("Added", "unit")])
+        self.assertTrue(library.flush())
+
+        content = path.read_text(encoding="utf-8")
+        self.assertEqual(
+            SymbolLibrary(str(path), KicadVersion.v6).names,
+            ["Existing", "Other:Part", "Added"],
+        )
+        self.assertIn('(property "Value" "new")', content)
+        self.assertNotIn("(not a list", content)
+        self.assertIn('\n\n\t(symbol "Other:Part"', content)
+        self.assertIn('(symbol "Added_1_1"', content)
+        self.assertIn("(generator https://github.com/uPesy/easyeda2kicad.py)", content)
+
+    def test_replace_drops_every_other_block_of_that_name(self) -> None:
+        path = self._library_file(
+            KICAD_LIBRARY.replace(
+                "\n)\n", '\n\t(symbol "Other{colon}Part" (in_bom yes)\n\t)\n)\n'
+            )
+        )
+        library = SymbolLibrary(str(path), KicadVersion.v6)
+        library.replace("Other{colon}Part", symbol("Other{colon}Part", "new"))
+        library.flush()
+
+        reloaded = SymbolLibrary(str(path), KicadVersion.v6)
+        self.assertEqual(reloaded.names, ["Existing", "Other{colon}Part"])
+        self.assertIn('(property "Value" "new")', path.read_text(encoding="utf-8"))
+
+    def test_pending_changes_are_replayed_after_external_edit(self) -> None:
+        path = self._library_file(KICAD_LIBRARY)
+        library = SymbolLibrary(str(path), KicadVersion.v6)
+        library.add(symbol("Mine"))
+
+        time.sleep(0.01)
+        external = KICAD_LIBRARY.replace(
+            "\n)\n", '\n\t(symbol "Theirs" (in_bom yes)\n\t)\n)\n'
+        )
+        path.write_text(external, encoding="utf-8")
+        library.flush()
+
+        reloaded = SymbolLibrary(str(path), KicadVersion.v6)
+        self.assertEqual(reloaded.names, ["Existing", "Other:Part", "Theirs", "Mine"])
+
+    def test_batch_is_written_once(self) -> None:
+        path = self._library_file(
+            "(kicad_symbol_lib\n  (version 20211014)\n  (generator x)\n)"
+        )
+        library = SymbolLibrary(str(path), KicadVersion.v6)
+        with mock.patch(
+            "easyeda2kicad.kicad.symbol_library.os.replace",
+            wraps=__import__("os").replace,
+        ) as replace:
+            for index in range(20):
+                library.add(symbol(f"Part{index}"))
+            library.flush()
+
+        self.assertEqual(replace.call_count, 1)
+        self.assertEqual(len(SymbolLibrary(str(path), KicadVersion.v6).names), 20)
+
+    def test_index_by_lcsc_id_and_span(self) -> None:
+        content = KICAD_LIBRARY.replace(
+            '(property "Value" "(not a list"',
+            '(property "LCSC Part" "C1525" (id 5))\n\t\t(property "Value" "10 kΩ"',
+        )
+        path = self._library_file(content)
+        library = open_symbol_library(str(path), KicadVersion.v6)
+
+        self.assertEqual(library.find_lcsc_id("c1525"), "Existing")
+        start, end = library.span("Other:Part")
+        rendered = library.render().encode("utf-8")
+        self.assertTrue(rendered[start:end].lstrip().startswith(b'(symbol "Other:Part"'))
+        self.assertEqual(rendered[end:], b"\n)\n")
+
+        library.replace(
+            "Existing",
+            symbol("Existing").replace('"Value" "R"', '"LCSC Part" "C8733"'),
+        )
+        self.assertIsNone(library.find_lcsc_id("C1525"))
+        self.assertEqual(library.find_lcsc_id("C8733"), "Existing")
+        library.flush()
+        self.assertIs(open_symbol_library(str(path), KicadVersion.v6), library)
+
+        # An external change to the file invalidates the cached index
+        time.sleep(0.01)
+        path.write_text(content, encoding="utf-8")
+        reopened = open_symbol_library(str(path), KicadVersion.v6)
+        self.assertEqual(reopened.find_lcsc_id("C1525"), "Existing")
+
+    def test_open_libraries_are_bounded(self) -> None:
+        dirty_path = self._library_file(KICAD_LIBRARY)
+        dirty = open_symbol_library(str(dirty_path), KicadVersion.v6)
+        dirty.add(symbol("Pending"))
+        paths = [self._library_file(KICAD_LIBRARY) for _ in range(3)]
+        with mock.patch.object(symbol_library, "MAX_OPEN_LIBRARIES", 2):
+            opened = [open_symbol_library(str(path), KicadVersion.v6) for path in paths]
+
+            # The model with unflushed changes is never dropped
+            self.assertIs(open_symbol_library(str(dirty_path), KicadVersion.v6), dirty)
+            self.assertIs(
+                open_symbol_library(str(paths[2]), KicadVersion.v6), opened[2]
+            )
+            self.assertIsNot(
+                open_symbol_library(str(paths[0]), KicadVersion.v6), opened[0]
+            )
+        dirty.discard()
+
+    def test_v5_helpers(self) -> None:
+        path = self._library_file(
+            "EESchema-LIBRARY Version 2.4\n#encoding utf-8\n", "lib.lib"
+        )
+
+        def component(name: str, value: str) -> str:
+            return f'#\n# {name}\n#\nDEF {name} U 0 40 Y Y 1 F N\nF1 "{value}"\nENDDEF\n'
+
+        add_component_in_symbol_lib_file(str(path), component("A", "a"), KicadVersion.v5)
+        add_component_in_symbol_lib_file(str(path), component("B", "b"), KicadVersion.v5)
+        self.assertTrue(id_already_in_symbol_lib(str(path), "A", KicadVersion.v5))
+        update_component_in_symbol_lib_file(
+            str(path), "A", component("A", "a2"), KicadVersion.v5
+        )
+
+        self.assertEqual(
+            path.read_text(encoding="utf-8"),
+            "EESchema-LIBRARY Version 2.4\n#encoding utf-8\n"
+            + component("A", "a2")
+            + component("B", "b"),
+        )
+        self.assertEqual(
+            open_symbol_library(str(path), KicadVersion.v5).names, ["A", "B"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
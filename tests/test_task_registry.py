@@ -0,0 +1,57 @@
+import unittest
+
+from easyeda2kicad.api.task_registry import TaskJournal, TaskRetention
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TaskJournalTest(unittest.TestCase):
+    def test_expiry_by_age_ttl_and_count(self) -> None:
+        clock = _Clock()
+        journal = TaskJournal(
+            TaskRetention(max_tasks=3, max_age=100, completed_ttl=10), clock=clock
+        )
+        for task_id in "abcd":
+            journal.add(task_id)
+        journal.finish("a", completed=True)
+        journal.finish("b", completed=False)
+        # Four tasks but only two finished: the oldest finished one goes
+        self.assertEqual(journal.expired(), ["a"])
+
+        journal.finish("c", completed=True)
+        clock.now = 11
+        self.assertEqual(journal.expired(), ["c"])
+        clock.now = 99
+        self.assertEqual(journal.expired(), [])
+        clock.now = 100
+        self.assertEqual(journal.expired(), ["b"])
+        # Unfinished tasks are never dropped
+        clock.now = 1000
+        self.assertEqual(journal.expired(), [])
+        self.assertEqual(len(journal), 1)
+
+    def test_changed_since_skips_superseded_entries(self) -> None:
+        journal = TaskJournal(TaskRetention(max_tasks=None))
+        for task_id in "abc":
+            journal.add(task_id)
+        cursor = journal.revision
+        journal.touch("a")
+        journal.touch("b")
+        journal.touch("a")
+        self.assertEqual([t for _, t in journal.changed_since(cursor)], ["b", "a"])
+        self.assertEqual([t for _, t in journal.changed_since()], ["c", "b", "a"])
+
+        for _ in range(500):
+            journal.touch("c")
+        self.assertLess(len(journal._entry_ids), 80)
+        self.assertEqual([t for _, t in journal.changed_since()], ["b", "a", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
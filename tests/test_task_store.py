@@ -0,0 +1,172 @@
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from easyeda2kicad.api.server import create_app
+from easyeda2kicad.api.task_manager import TaskRecord, _record_to_row
+from easyeda2kicad.api.task_registry import TaskRetention
+from easyeda2kicad.api.task_store import TaskStore
+from easyeda2kicad.service import ConversionRequest, ConversionResult, ConversionStage
+
+
+def _record(lcsc_id: str, status: str) -> TaskRecord:
+    record = TaskRecord(
+        id=f"task-{lcsc_id}",
+        request=ConversionRequest(
+            lcsc_id=lcsc_id, output_prefix="./tmp/testlib", generate_symbol=True
+        ),
+        status=status,
+    )
+    if status == "running":
+        record.progress = 40
+    if status == "completed":
+        record.progress = 100
+        record.result = ConversionResult(symbol_path="lib.kicad_sym")
+    return record
+
+
+class TaskStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / "tasks.sqlite3"
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_rows_are_upserted_and_deleted_in_order(self) -> None:
+        store = TaskStore(self.path)
+        journal_mode = store._connection.execute("PRAGMA journal_mode").fetchone()
+        self.assertEqual(journal_mode[0], "wal")
+        first, second = _record("C1", "queued"), _record("C2", "queued")
+        store.write({second.id: _record_to_row(second)})
+        store.write({first.id: _record_to_row(first)}, {"b": {"id": "b"}})
+        second.status = "completed"
+        store.write({second.id: _record_to_row(second)})
+        store.close()
+
+        tasks, batches = TaskStore(self.path).load()
+        self.assertEqual([row["id"] for row in tasks], [first.id, second.id])
+        self.assertEqual(tasks[1]["status"], "completed")
+        self.assertEqual(batches, [{"id": "b"}])
+
+    def test_unfinished_tasks_resume_after_restart(self) -> None:
+        # State left behind by a server that stopped abruptly
+        records = [
+            _record("C1", "completed"),
+            _record("C2", "running"),
+            _record("C3", "queued"),
+        ]
+        store = TaskStore(self.path)
+        store.write({record.id: _record_to_row(record) for record in records})
+        store.close()
+
+        converted = []
+
+        def runner(request: ConversionRequest, progress_cb) -> ConversionResult:
+            converted.append(request.lcsc_id)
+            progress_cb(ConversionStage.COMPLETED, 100, "Done")
+            return ConversionResult(symbol_path=request.lcsc_id)
+
+        app = create_app(conversion_runner=runner, workers=1, task_store=str(self.path))
+        with TestClient(app) as client:
+            for _ in range(100):
+                statuses = {task["id"]: task["status"] for task in client.get("/tasks").json()}
+                if set(statuses.values()) == {"completed"}:
+                    break
+                time.sleep(0.02)
+            self.assertEqual(converted, ["C2", "C3"])
+            detail = client.get("/tasks/task-C1").json()
+            self.assertEqual(detail["result"]["symbol_path"], "lib.kicad_sym")
+            resumed = client.get("/tasks/task-C2").json()
+            self.assertIn("Resumed after restart.", [e["message"] for e in resumed["log"]])
+
+            added = client.post(
+                "/tasks",
+                json={"lcsc_id": "C4", "output_path": "./tmp/testlib", "symbol": True},
+            ).json()
+
+        tasks, _ = TaskStore(self.path).load()
+        self.assertEqual(
+            {row["id"]: row["status"] for row in tasks},
+            {
+                "task-C1": "completed",
+                "task-C2": "completed",
+                "task-C3": "completed",
+                added["id"]: "completed",
+            },
+        )
+
+    def test_finished_tasks_keep_their_age_after_restart(self) -> None:
+        now = datetime.now(timezone.utc)
+        recent, stale = _record("C1", "completed"), _record("C2", "completed")
+        recent.created_at = recent.finished_at = now - timedelta(minutes=10)
+        stale.created_at = stale.finished_at = now - timedelta(hours=2)
+        store = TaskStore(self.path)
+        store.write({record.id: _record_to_row(record) for record in (recent, stale)})
+        store.close()
+
+        app = create_app(
+            retention=TaskRetention(completed_ttl=3600), task_store=str(self.path)
+        )
+        with TestClient(app) as client:
+            # Completed two hours ago: past its one hour TTL
+            listed = client.get("/tasks").json()
+            self.assertEqual([task["id"] for task in listed], ["task-C1"])
+            with client.websocket_connect("/ws/tasks") as stream:
+                snapshot = stream.receive_json()
+                self.assertEqual(
+                    [task["id"] for task in snapshot["tasks"]], ["task-C1"]
+                )
+            with client.websocket_connect("/ws/tasks/task-C1") as stream:
+                self.assertEqual(stream.receive_json()["status"], "completed")
+
+    def test_progress_events_are_written_in_batches(self) -> None:
+        def chatty_runner(request: ConversionRequest, progress_cb) -> ConversionResult:
+            for percent in range(200):
+                progress_cb(ConversionStage.FETCHING, percent // 2, "step")
+            return ConversionResult()
+
+        app = create_app(conversion_runner=chatty_runner, task_store=str(self.path))
+        with mock.patch.object(TaskStore, "write", wraps=app.state.task_manager.store.write) as write:
+            with TestClient(app) as client:
+                task_id = client.post(
+                    "/tasks",
+                    json={"lcsc_id": "C1", "output_path": "./tmp/testlib", "symbol": True},
+                ).json()["id"]
+                for _ in range(100):
+                    if client.get(f"/tasks/{task_id}").json()["status"] == "completed":
+                        break
+                    time.sleep(0.02)
+
+        self.assertLess(write.call_count, 10)
+        tasks, _ = TaskStore(self.path).load()
+        self.assertEqual(tasks[0]["status"], "completed")
+
+    def test_rows_without_timestamps_are_dropped(self) -> None:
+        valid, broken = _record("C1", "completed"), _record("C2", "queued")
+        broken_row = _record_to_row(broken)
+        broken_row["updated_at"] = None
+        store = TaskStore(self.path)
+        store.write({valid.id: _record_to_row(valid), broken.id: broken_row})
+        store.close()
+
+        app = create_app(task_store=str(self.path))
+        with TestClient(app) as client:
+            listed = client.get("/tasks").json()
+            self.assertEqual([task["id"] for task in listed], ["task-C1"])
+        # Stopping the manager closes the store once everything is written
+        with self.assertRaises(sqlite3.ProgrammingError):
+            app.state.task_manager.store.load()
+
+        tasks, _ = TaskStore(self.path).load()
+        self.assertEqual([row["id"] for row in tasks], ["task-C1"])
+
+
+if __name__ == "__main__":
+    unittest.main()